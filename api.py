@@ -0,0 +1,300 @@
+import gzip
+from datetime import datetime, timezone
+from flask import Blueprint, abort, current_app, jsonify, request
+from werkzeug.exceptions import HTTPException
+from database import db
+from models import Artist, ArtistLink, GenreArtist, GenreVenue, Location, PostalCode, Show, Venue, VenueLink
+from pagination import paginate, page_url
+from queries import (
+    SHOW_ORDER,
+    genres_by_owner,
+    links_by_owner,
+    search_results,
+    upcoming_shows_by_owner,
+)
+from search import search_artist_ids, search_venue_ids
+from typeahead import complete
+
+# Optional dependency: without it responses are only gzip compressed
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# ----------------------------------------------------------------------------#
+# JSON API (v1).
+# ----------------------------------------------------------------------------#
+
+# Read-only JSON endpoints for the mobile client and the partners, built on
+# the same query layer and keyset pagination as the HTML pages.
+#
+# - fields=id,name,city selects only those columns, and the joins they need.
+# - include=genres,links,shows adds the related rows, with one extra query per
+#   kind for the whole page.
+# - Listings return {"data": [...], "links": {"next": ..., "prev": ...}}.
+# - Large responses are compressed with brotli or gzip.
+
+api = Blueprint("api_v1", __name__, url_prefix="/api/v1")
+
+
+# Public field name -> column. The columns are labelled with the field name.
+VENUE_FIELDS = {
+    "id": Venue.id,
+    "name": Venue.name,
+    "address": Location.address,
+    "city": PostalCode.city,
+    "state": PostalCode.state,
+    "phone": Venue.phone,
+    "image_link": Venue.image_link,
+    "seeking_talent": Venue.seeking_talent,
+    "seeking_description": Venue.seeking_description,
+}
+# Fields that need venues -> locations -> postal_codes
+VENUE_LOCATION_FIELDS = {"address", "city", "state"}
+
+ARTIST_FIELDS = {
+    "id": Artist.id,
+    "name": Artist.name,
+    "image_link": Artist.image_link,
+    "seeking_venue": Artist.seeking_venue,
+    "seeking_description": Artist.seeking_description,
+}
+
+SHOW_FIELDS = {
+    "id": Show.id,
+    "start_time": Show.start_time,
+    "venue_id": Show.venue_id,
+    "venue_name": Venue.name,
+    "venue_image_link": Venue.image_link,
+    "artist_id": Show.artist_id,
+    "artist_name": Artist.name,
+    "artist_image_link": Artist.image_link,
+}
+
+INCLUDES = ("genres", "links", "shows")
+
+
+def _plain(value):
+    # ISO 8601 instead of the HTTP date format jsonify uses for datetimes
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return {key: _plain(item) for key, item in value.items()}
+    return value
+
+
+def _parse_list(name, allowed, default):
+    value = request.args.get(name)
+    if not value:
+        return list(default)
+    items = list(dict.fromkeys(item.strip() for item in value.split(",") if item.strip()))
+    unknown = [item for item in items if item not in allowed]
+    if unknown:
+        abort(400, f"Unknown {name}: {', '.join(unknown)}")
+    return items
+
+
+def _select(fields, available, required):
+    # Requested columns plus the ones needed for the sort key and includes
+    names = list(dict.fromkeys(list(required) + fields))
+    return db.session.query(*[available[name].label(name) for name in names])
+
+
+def _serialize(rows, fields, includes, loaders):
+    items = [{name: _plain(getattr(row, name)) for name in fields} for row in rows]
+    ids = [row.id for row in rows]
+    for include in includes:
+        related = loaders[include](ids) if ids else {}
+        for item, row in zip(items, rows):
+            item[include] = [_plain(entry) for entry in related.get(row.id, [])]
+    return items
+
+
+def _listing(page, items):
+    return jsonify(
+        {
+            "data": items,
+            "links": {
+                "next": page_url(after=page.next_cursor) if page.has_next else None,
+                "prev": page_url(before=page.prev_cursor) if page.has_prev else None,
+            },
+        }
+    )
+
+
+def _venue_loaders():
+    now = datetime.now(timezone.utc)
+    return {
+        "genres": lambda ids: genres_by_owner(GenreVenue.venue_id, ids),
+        "links": lambda ids: links_by_owner(VenueLink.venue_id, ids),
+        "shows": lambda ids: upcoming_shows_by_owner(Show.venue_id, ids, now),
+    }
+
+
+def _artist_loaders():
+    now = datetime.now(timezone.utc)
+    return {
+        "genres": lambda ids: genres_by_owner(GenreArtist.artist_id, ids),
+        "links": lambda ids: links_by_owner(ArtistLink.artist_id, ids),
+        "shows": lambda ids: upcoming_shows_by_owner(Show.artist_id, ids, now),
+    }
+
+
+def _venue_query(fields, city=None, state=None):
+    query = _select(fields, VENUE_FIELDS, ["id", "name"])
+    if VENUE_LOCATION_FIELDS.intersection(fields) or city or state:
+        query = query.join(Location, Venue.location_id == Location.id).join(
+            PostalCode, Location.postal_code_id == PostalCode.id
+        )
+    if city:
+        query = query.filter(PostalCode.city == city)
+    if state:
+        query = query.filter(PostalCode.state == state)
+    return query
+
+
+def _artist_query(fields):
+    return _select(fields, ARTIST_FIELDS, ["id", "name"])
+
+
+#  Venues
+#  ----------------------------------------------------------------
+
+
+@api.route("/venues")
+def venues():
+    fields = _parse_list("fields", VENUE_FIELDS, VENUE_FIELDS)
+    includes = _parse_list("include", INCLUDES, ())
+    query = _venue_query(fields, request.args.get("city"), request.args.get("state"))
+    page = paginate(query, [Venue.name, Venue.id])
+    return _listing(page, _serialize(page.items, fields, includes, _venue_loaders()))
+
+
+@api.route("/venues/<int:venue_id>")
+def venue(venue_id):
+    fields = _parse_list("fields", VENUE_FIELDS, VENUE_FIELDS)
+    includes = _parse_list("include", INCLUDES, ())
+    row = _venue_query(fields).filter(Venue.id == venue_id).first()
+    if row is None:
+        abort(404)
+    return jsonify({"data": _serialize([row], fields, includes, _venue_loaders())[0]})
+
+
+#  Artists
+#  ----------------------------------------------------------------
+
+
+@api.route("/artists")
+def artists():
+    fields = _parse_list("fields", ARTIST_FIELDS, ARTIST_FIELDS)
+    includes = _parse_list("include", INCLUDES, ())
+    page = paginate(_artist_query(fields), [Artist.name, Artist.id])
+    return _listing(page, _serialize(page.items, fields, includes, _artist_loaders()))
+
+
+@api.route("/artists/<int:artist_id>")
+def artist(artist_id):
+    fields = _parse_list("fields", ARTIST_FIELDS, ARTIST_FIELDS)
+    includes = _parse_list("include", INCLUDES, ())
+    row = _artist_query(fields).filter(Artist.id == artist_id).first()
+    if row is None:
+        abort(404)
+    return jsonify({"data": _serialize([row], fields, includes, _artist_loaders())[0]})
+
+
+#  Shows
+#  ----------------------------------------------------------------
+
+
+@api.route("/shows")
+def shows():
+    fields = _parse_list("fields", SHOW_FIELDS, SHOW_FIELDS)
+    query = _select(fields, SHOW_FIELDS, ["id", "start_time"])
+
+    # Join venues/artists only for their fields
+    if any(name.startswith("venue_") and name != "venue_id" for name in fields):
+        query = query.join(Venue, Show.venue_id == Venue.id)
+    if any(name.startswith("artist_") and name != "artist_id" for name in fields):
+        query = query.join(Artist, Show.artist_id == Artist.id)
+
+    venue_id = request.args.get("venue_id", type=int)
+    artist_id = request.args.get("artist_id", type=int)
+    if venue_id is not None:
+        query = query.filter(Show.venue_id == venue_id)
+    if artist_id is not None:
+        query = query.filter(Show.artist_id == artist_id)
+    if request.args.get("upcoming") in ("1", "true"):
+        query = query.filter(Show.start_time > datetime.now(timezone.utc))
+
+    page = paginate(query, SHOW_ORDER)
+    return _listing(page, _serialize(page.items, fields, (), {}))
+
+
+#  Search
+#  ----------------------------------------------------------------
+
+
+@api.route("/search")
+def search():
+    search_term = request.args.get("q", "")
+    kinds = _parse_list("type", ("venues", "artists"), ("venues", "artists"))
+    # Best matches of each kind, at most SEARCH_MAX_RESULTS
+    maximum = current_app.config["SEARCH_MAX_RESULTS"]
+    limit = max(1, min(request.args.get("limit", maximum, type=int), maximum))
+
+    data = {}
+    if "venues" in kinds:
+        data["venues"] = search_results(
+            Venue, Show.venue_id, search_venue_ids(search_term, limit)
+        )
+    if "artists" in kinds:
+        data["artists"] = search_results(
+            Artist, Show.artist_id, search_artist_ids(search_term, limit)
+        )
+    return jsonify({"data": data})
+
+
+@api.route("/typeahead")
+def typeahead():
+    # Names starting with q (or with a word starting with q), for the
+    # autocomplete of the search boxes
+    prefix = request.args.get("q", "")
+    kinds = _parse_list("type", ("venues", "artists"), ("venues", "artists"))
+    config = current_app.config
+    limit = request.args.get("limit", config.get("TYPEAHEAD_LIMIT", 8), type=int)
+    limit = max(1, min(limit, config.get("TYPEAHEAD_MAX_LIMIT", 20)))
+    sync_seconds = config.get("TYPEAHEAD_SYNC_SECONDS", 5)
+    return jsonify({"data": {kind: complete(kind, prefix, limit, sync_seconds) for kind in kinds}})
+
+
+#  Errors and compression
+#  ----------------------------------------------------------------
+
+
+@api.errorhandler(HTTPException)
+# The app's 404/500 pages are registered by code, which wins over a class
+@api.errorhandler(404)
+@api.errorhandler(500)
+def http_error(error):
+    # JSON errors instead of the HTML error pages
+    return jsonify({"error": {"status": error.code, "message": error.description}}), error.code
+
+
+@api.after_request
+def compress(response):
+    minimum = current_app.config.get("API_COMPRESS_MIN_SIZE", 1024)
+    if response.direct_passthrough or "Content-Encoding" in response.headers:
+        return response
+    if response.content_length is None or response.content_length < minimum:
+        return response
+
+    # The body depends on Accept-Encoding from here on
+    response.vary.add("Accept-Encoding")
+    accepted = request.accept_encodings
+    if brotli is not None and accepted["br"]:
+        response.set_data(brotli.compress(response.get_data(), quality=5))
+        response.headers["Content-Encoding"] = "br"
+    elif accepted["gzip"]:
+        response.set_data(gzip.compress(response.get_data(), compresslevel=6))
+        response.headers["Content-Encoding"] = "gzip"
+    return response
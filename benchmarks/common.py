@@ -0,0 +1,26 @@
+"""Shared set-up of the benchmark scripts."""
+import os
+import sys
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCHMARKS_DIR)
+DEFAULT_DATABASE = "sqlite:///" + os.path.join(BENCHMARKS_DIR, "fyyur-bench.db")
+
+sys.path.insert(0, ROOT_DIR)
+
+
+def load_app(database, **settings):
+    """Create the app against the benchmark database.
+
+    config.py is read when it is first imported, so the database URL and the
+    settings are applied to it before create_app() loads it.
+    """
+    os.environ["DATABASE_URL"] = database
+    import config
+
+    for name, value in settings.items():
+        setattr(config, name, value)
+
+    from app import create_app
+
+    return create_app()
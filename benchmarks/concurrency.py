@@ -0,0 +1,182 @@
+"""Throughput of the threaded and cooperative serving modes.
+
+Starts the app in a child process, either on a server with a fixed pool of
+worker threads (like gunicorn's gthread workers) or in the cooperative
+(gevent) mode of cooperative.py, and sends it --requests read requests
+(listings, detail pages, JSON API) from --concurrency clients at a time.
+
+The database round-trip time of a production setup is simulated by a
+--db-latency-ms sleep before every statement. SQLite itself is local and
+does not yield, but with PostgreSQL the waits are cooperative through
+psycogreen like this sleep.
+
+    python benchmarks/generate.py --shows 10000 --reset
+    python benchmarks/concurrency.py --concurrency 50 --db-latency-ms 20
+"""
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from common import DEFAULT_DATABASE, ROOT_DIR
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(percent / 100 * len(ordered)) - 1)]
+
+
+# ----------------------------------------------------------------------------#
+# Server (child process).
+# ----------------------------------------------------------------------------#
+
+
+def serve(args):
+    if args.serve == "cooperative":
+        sys.path.insert(0, ROOT_DIR)
+        from cooperative import patch
+
+        patch()
+
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+    from common import load_app
+
+    app = load_app(
+        args.database,
+        VIEW_CACHE_BACKEND="null",
+        INSTRUMENTATION=False,
+        DATABASE_POOL_SIZE=args.pool_size,
+        DATABASE_MAX_OVERFLOW=0,
+    )
+    latency = args.db_latency_ms / 1000
+
+    @event.listens_for(Engine, "before_cursor_execute")
+    def _network_round_trip(conn, cursor, statement, parameters, context, executemany):
+        time.sleep(latency)
+
+    if args.serve == "cooperative":
+        from cooperative import serve as serve_cooperatively
+
+        serve_cooperatively(app, port=args.port)
+    else:
+        from concurrent.futures import ThreadPoolExecutor as Executor
+        from werkzeug.serving import BaseWSGIServer
+
+        class PooledWSGIServer(BaseWSGIServer):
+            # A fixed number of threads handle the connections
+            def __init__(self, host, port, app, threads):
+                super().__init__(host, port, app)
+                self.executor = Executor(threads)
+
+            def process_request(self, request, client_address):
+                self.executor.submit(self._handle, request, client_address)
+
+            def _handle(self, request, client_address):
+                try:
+                    self.finish_request(request, client_address)
+                except Exception:
+                    self.handle_error(request, client_address)
+                finally:
+                    self.shutdown_request(request)
+
+        PooledWSGIServer("127.0.0.1", args.port, app, args.threads).serve_forever()
+
+
+# ----------------------------------------------------------------------------#
+# Load (parent process).
+# ----------------------------------------------------------------------------#
+
+
+def fetch(url):
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=60) as response:
+            response.read()
+            ok = response.status < 500
+    except urllib.error.HTTPError as error:
+        ok = error.code < 500
+    except OSError:
+        ok = False
+    return time.perf_counter() - started, ok
+
+
+def start_server(mode, args):
+    command = [
+        sys.executable, os.path.abspath(__file__), "--serve", mode, "--port", str(args.port),
+        "--database", args.database, "--db-latency-ms", str(args.db_latency_ms),
+        "--threads", str(args.threads), "--pool-size", str(args.pool_size),
+    ]
+    server = subprocess.Popen(command, stderr=subprocess.DEVNULL)
+    base = f"http://127.0.0.1:{args.port}"
+    for _ in range(200):
+        try:
+            urllib.request.urlopen(base + "/metrics", timeout=1).read()
+            return server, base
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    sys.exit(f"The {mode} server did not start.")
+
+
+def run_load(base, args):
+    venues = json.load(urllib.request.urlopen(base + "/api/v1/venues?fields=id&per_page=20"))["data"]
+    artists = json.load(urllib.request.urlopen(base + "/api/v1/artists?fields=id&per_page=20"))["data"]
+    paths = ["/venues", "/artists", "/shows", "/api/v1/venues", "/api/v1/shows?upcoming=1", "/api/v1/search?q=blue"]
+    paths += [f"/venues/{venue['id']}" for venue in venues[:5]] + [f"/artists/{artist['id']}" for artist in artists[:5]]
+    paths += [f"/api/v1/venues/{venue['id']}?include=genres,links,shows" for venue in venues[5:10]]
+    urls = [base + paths[number % len(paths)] for number in range(args.requests)]
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as executor:
+        results = list(executor.map(fetch, urls))
+    elapsed = time.perf_counter() - started
+
+    latencies = [seconds * 1000 for seconds, _ in results]
+    return {
+        "requests_per_second": round(len(results) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p95_ms": round(percentile(latencies, 95), 1),
+        "errors": sum(1 for _, ok in results if not ok),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database", default=os.environ.get("DATABASE_URL") or DEFAULT_DATABASE)
+    parser.add_argument("--modes", default="threaded,cooperative")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50, help="Concurrent clients.")
+    parser.add_argument("--threads", type=int, default=8, help="Worker threads of the threaded mode.")
+    parser.add_argument("--pool-size", type=int, default=50, help="Database connections of the server.")
+    parser.add_argument("--db-latency-ms", type=float, default=20.0, help="Simulated database round trip.")
+    parser.add_argument("--port", type=int, default=5077)
+    parser.add_argument("--serve", choices=("threaded", "cooperative"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+
+    print(
+        f"{args.requests} requests, {args.concurrency} concurrent clients, "
+        f"{args.db_latency_ms:g} ms per statement, {args.threads} threads in the threaded mode"
+    )
+    print(f"{'mode':<12} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7}")
+    for mode in args.modes.split(","):
+        server, base = start_server(mode, args)
+        try:
+            result = run_load(base, args)
+        finally:
+            server.terminate()
+            server.wait()
+        print(f"{mode:<12} {result['requests_per_second']:>8} {result['p50_ms']:>8} {result['p95_ms']:>8} {result['errors']:>7}")
+
+
+if __name__ == "__main__":
+    main()
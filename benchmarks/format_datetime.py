@@ -0,0 +1,68 @@
+"""Micro-benchmark of the "datetime" template filter.
+
+Formats the start times of a 500-show page the way the templates do, with
+the original filter (ISO string -> dateutil -> babel.dates.format_datetime)
+and with formatting.format_datetime, cold (empty LRU) and warm (the page is
+rendered again).
+
+    python benchmarks/format_datetime.py
+"""
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta, timezone
+import babel.dates
+import dateutil.parser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from formatting import _format, format_datetime  # noqa: E402
+
+SHOWS = 500
+ROUNDS = 20
+
+
+def original_format_datetime(value, format="medium"):
+    # The filter as it was in app.py
+    if isinstance(value, str):
+        date = dateutil.parser.parse(value)
+    else:
+        date = value
+    if format == "full":
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == "medium":
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format, locale="en")
+
+
+def main():
+    start = datetime(2026, 10, 17, 20, tzinfo=timezone.utc)
+    times = [start + timedelta(hours=7 * i) for i in range(SHOWS)]
+    iso_strings = [time.isoformat() for time in times]
+
+    def original():
+        for value in iso_strings:
+            original_format_datetime(value, "full")
+
+    def cold():
+        _format.cache_clear()
+        for value in times:
+            format_datetime(value, "full")
+
+    def warm():
+        for value in times:
+            format_datetime(value, "full")
+
+    results = {}
+    for name, page in (("original (ISO strings)", original), ("cached, cold LRU", cold), ("cached, warm LRU", warm)):
+        page()
+        results[name] = min(timeit.repeat(page, number=1, repeat=ROUNDS))
+
+    baseline = results["original (ISO strings)"]
+    print(f"{SHOWS} show tiles, best of {ROUNDS}")
+    for name, seconds in results.items():
+        print(f"  {name:<24} {seconds * 1000:8.2f} ms  {baseline / seconds:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""Synthetic data for the benchmarks.
+
+Fills the schema of models.py with a given number of shows and a
+proportional number of venues (1 per 25 shows) and artists (1 per 12 shows).
+The distributions are skewed the way real listings are: a few cities, genres,
+venues and artists get most of the rows (Zipf-like weights), owners have 1-3
+genres and 0-3 links, 2% of the venues/artists and 1% of the shows are
+soft-deleted, and 30% of the shows are upcoming. The same --seed gives the
+same data.
+
+    python benchmarks/generate.py --shows 10000 --reset
+    DATABASE_URL=postgresql://... python benchmarks/generate.py --shows 1000000
+
+On PostgreSQL, run "flask db upgrade" on the database first. On SQLite the
+tables are created when missing.
+"""
+import argparse
+import itertools
+import os
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import func, insert, select
+from common import DEFAULT_DATABASE, load_app
+
+STATES = ["CA", "NY", "TX", "IL", "WA", "LA", "TN", "GA", "FL", "OR", "CO", "MA", "MN", "PA", "NV"]
+CITY_WORDS = ["Spring", "River", "Oak", "Lake", "Mill", "Cedar", "Fair", "Green", "Port", "Rock", "Salem", "Union"]
+CITY_SUFFIXES = ["field", "ton", "ville", " City", " Heights", "wood", "burg", " Falls"]
+GENRES = [
+    "Rock n Roll", "Pop", "Jazz", "Hip-Hop", "Electronic", "Folk", "Blues", "Country", "Alternative",
+    "R&B", "Soul", "Punk", "Classical", "Reggae", "Funk", "Heavy Metal", "Instrumental",
+    "Musical Theatre", "Other",
+]
+ADJECTIVES = ["Blue", "Golden", "Velvet", "Electric", "Silent", "Wild", "Crimson", "Lucky", "Neon", "Rusty", "Hollow", "Midnight"]
+NOUNS = ["Owl", "Lantern", "Anchor", "Fox", "Harbor", "Garden", "Echo", "Tiger", "Mirror", "Bridge", "Comet", "Whistle"]
+VENUE_KINDS = ["Hall", "Club", "Lounge", "Theatre", "Bar", "Room", "Tavern", "Arena"]
+ARTIST_KINDS = ["Band", "Trio", "Collective", "Orchestra", "Project", "Quartet", ""]
+LINK_KINDS = [
+    ("Website", "https://www.{slug}.com", 40),
+    ("Instagram", "https://instagram.com/{slug}", 30),
+    ("Facebook", "https://facebook.com/{slug}", 15),
+    ("YouTube", "https://youtube.com/@{slug}", 8),
+    ("X", "https://x.com/{slug}", 5),
+    ("TikTok", "https://tiktok.com/@{slug}", 2),
+]
+
+
+def zipf_weights(count, exponent=0.9):
+    # Cumulative weights: the first items are picked the most
+    return list(itertools.accumulate(1 / (rank ** exponent) for rank in range(1, count + 1)))
+
+
+def insert_returning(connection, model, rows, batch_size):
+    # executemany INSERT ... RETURNING id, in the order of the rows
+    ids = []
+    statement = insert(model).returning(model.id, sort_by_parameter_order=True)
+    for start in range(0, len(rows), batch_size):
+        ids.extend(connection.execute(statement, rows[start : start + batch_size]).scalars())
+    return ids
+
+
+def insert_plain(connection, model, rows, batch_size):
+    for start in range(0, len(rows), batch_size):
+        connection.execute(insert(model), rows[start : start + batch_size])
+
+
+def slug(name, number):
+    return "".join(char for char in name.lower() if char.isalnum()) + str(number)
+
+
+def generate(connection, shows, seed=1, batch_size=5000):
+    from models import (
+        Artist, ArtistLink, Genre, GenreArtist, GenreVenue, Link, LinkType, Location, PostalCode, Show, Venue,
+        VenueLink,
+    )
+
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    venue_count = max(10, shows // 25)
+    artist_count = max(10, shows // 12)
+    city_count = min(300, max(10, venue_count // 4))
+
+    cities = {}
+    while len(cities) < city_count:
+        city = rng.choice(CITY_WORDS) + rng.choice(CITY_SUFFIXES)
+        cities.setdefault((city, rng.choice(STATES)), None)
+    postal_code_ids = insert_returning(
+        connection,
+        PostalCode,
+        [{"city": city, "state": state, "code": f"{rng.randrange(10000, 99999)}"} for city, state in cities],
+        batch_size,
+    )
+    genre_ids = insert_returning(connection, Genre, [{"genre_name": name} for name in GENRES], batch_size)
+    link_type_ids = insert_returning(connection, LinkType, [{"type_name": kind[0]} for kind in LINK_KINDS], batch_size)
+
+    # Addresses are unique per postal code
+    city_weights = zipf_weights(len(postal_code_ids))
+    addresses = set()
+    while len(addresses) < venue_count:
+        addresses.add(
+            (f"{rng.randrange(1, 9999)} {rng.choice(NOUNS)} St", rng.choices(postal_code_ids, cum_weights=city_weights)[0])
+        )
+    location_ids = insert_returning(
+        connection,
+        Location,
+        [{"address": address, "postal_code_id": postal_code_id} for address, postal_code_id in sorted(addresses)],
+        batch_size,
+    )
+
+    def deleted(share):
+        return now - timedelta(days=rng.randrange(1, 365)) if rng.random() < share else None
+
+    venue_rows = []
+    for number, location_id in enumerate(location_ids):
+        name = f"The {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {rng.choice(VENUE_KINDS)}"
+        seeking = rng.random() < 0.3
+        venue_rows.append(
+            {
+                "name": name,
+                "location_id": location_id,
+                "phone": f"{rng.randrange(200, 999)}-{rng.randrange(200, 999)}-{rng.randrange(1000, 9999)}",
+                "image_link": f"https://images.example.com/venues/{number}.jpg",
+                "seeking_talent": seeking,
+                "seeking_description": "Looking for local acts" if seeking else None,
+                "deleted_at": deleted(0.02),
+            }
+        )
+    venue_ids = insert_returning(connection, Venue, venue_rows, batch_size)
+
+    artist_rows = []
+    for number in range(artist_count):
+        name = f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)}s {rng.choice(ARTIST_KINDS)}".strip()
+        seeking = rng.random() < 0.3
+        artist_rows.append(
+            {
+                "name": name,
+                "image_link": f"https://images.example.com/artists/{number}.jpg",
+                "seeking_venue": seeking,
+                "seeking_description": "Touring next season" if seeking else None,
+                "deleted_at": deleted(0.02),
+            }
+        )
+    artist_ids = insert_returning(connection, Artist, artist_rows, batch_size)
+
+    # Genres and links
+    genre_weights = zipf_weights(len(genre_ids))
+    link_weights = list(itertools.accumulate(kind[2] for kind in LINK_KINDS))
+
+    def owner_genres(owner_ids, column):
+        rows = []
+        for owner_id in owner_ids:
+            picked = set(rng.choices(genre_ids, cum_weights=genre_weights, k=rng.randint(1, 3)))
+            rows.extend({column: owner_id, "genre_id": genre_id} for genre_id in picked)
+        return rows
+
+    insert_plain(connection, GenreVenue, owner_genres(venue_ids, "venue_id"), batch_size)
+    insert_plain(connection, GenreArtist, owner_genres(artist_ids, "artist_id"), batch_size)
+
+    def owner_links(owner_ids, names, model, column):
+        links = []
+        owners = []
+        for owner_id, name in zip(owner_ids, names):
+            kinds = {rng.choices(range(len(LINK_KINDS)), cum_weights=link_weights)[0] for _ in range(rng.randint(0, 3))}
+            for position, kind in enumerate(sorted(kinds)):
+                links.append({"url": LINK_KINDS[kind][1].format(slug=slug(name, owner_id)), "link_type_id": link_type_ids[kind]})
+                owners.append({column: owner_id, "is_primary": position == 0})
+        for owner, link_id in zip(owners, insert_returning(connection, Link, links, batch_size)):
+            owner["link_id"] = link_id
+        insert_plain(connection, model, owners, batch_size)
+
+    owner_links(venue_ids, [row["name"] for row in venue_rows], VenueLink, "venue_id")
+    owner_links(artist_ids, [row["name"] for row in artist_rows], ArtistLink, "artist_id")
+
+    # Shows: busy venues and popular artists get most of them, 30% upcoming,
+    # in the evening
+    venue_weights = zipf_weights(len(venue_ids), 0.7)
+    artist_weights = zipf_weights(len(artist_ids), 0.7)
+    seen = set()
+    show_rows = []
+    while len(show_rows) < shows:
+        day = rng.randrange(1, 365) if rng.random() < 0.3 else -rng.randrange(1, 730)
+        start_time = now + timedelta(days=day) - timedelta(hours=now.hour) + timedelta(hours=rng.randint(18, 23))
+        key = (
+            rng.choices(artist_ids, cum_weights=artist_weights)[0],
+            rng.choices(venue_ids, cum_weights=venue_weights)[0],
+            start_time,
+        )
+        if key in seen:
+            continue
+        seen.add(key)
+        show_rows.append({"artist_id": key[0], "venue_id": key[1], "start_time": start_time, "deleted_at": deleted(0.01)})
+    insert_plain(connection, Show, show_rows, batch_size)
+
+    return {"venues": venue_count, "artists": artist_count, "shows": shows, "cities": city_count}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--shows", type=int, default=1000, help="Number of shows (1000 to 1000000).")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--database", default=None, help=f"Database URL (default: $DATABASE_URL or {DEFAULT_DATABASE}).")
+    parser.add_argument("--reset", action="store_true", help="Drop and recreate all the tables first.")
+    args = parser.parse_args()
+
+    app = load_app(args.database or os.environ.get("DATABASE_URL") or DEFAULT_DATABASE)
+
+    from database import db
+    from feed import rebuild_upcoming_shows
+    from models import Show
+    from show_counters import rebuild_show_counters
+
+    with app.app_context():
+        if args.reset:
+            db.drop_all()
+        db.create_all()
+        if db.session.scalar(select(func.count()).select_from(Show)):
+            parser.error("the database already has shows, use --reset to replace them")
+        db.session.close()
+
+        started = time.perf_counter()
+        with db.engine.begin() as connection:
+            counts = generate(connection, args.shows, args.seed, args.batch_size)
+            feed = rebuild_upcoming_shows(connection)
+            rebuild_show_counters(connection)
+        elapsed = time.perf_counter() - started
+
+    print(
+        f"{counts['shows']} shows, {counts['venues']} venues, {counts['artists']} artists in "
+        f"{counts['cities']} cities ({feed} upcoming) generated in {elapsed:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""Startup time of the app, measured with python -X importtime.
+
+Runs each stage --runs times in a fresh interpreter and reports the median
+time spent importing modules and the median wall time of the stage:
+
+- import: "import app" (the module only, no app is built),
+- create_app: "create_app()" (what "flask <command>" and every worker pay).
+
+It then lists the packages that take the most import time, and checks that
+the heavy modules the app loads on first use (--lazy: Babel, dateutil,
+WTForms, Alembic) are not imported by create_app().
+
+    python benchmarks/importtime.py
+    python benchmarks/importtime.py --baseline benchmarks/importtime.json
+
+Set FYYUR_ENV=production to measure the production profile, which also
+compiles the templates in create_app(). Against a baseline, a stage
+regresses when its median is more than --tolerance slower (and by at least
+--min-delta-ms). The exit status is 1 when a stage regressed or a lazy
+module was imported. A missing baseline file is created from the run.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from common import DEFAULT_DATABASE, ROOT_DIR
+
+STAGES = {
+    "import": "import app",
+    "create_app": "from app import create_app; create_app()",
+}
+
+LAZY_MODULES = "babel,dateutil,wtforms,flask_wtf,alembic,flask_migrate"
+
+# Run in the child: the marker separates the interpreter's own start-up
+# imports from the stage's
+CHILD = """
+import sys, time
+print("-- stage", file=sys.stderr, flush=True)
+started = time.perf_counter()
+{statement}
+seconds = time.perf_counter() - started
+import json
+print(json.dumps({{"seconds": seconds, "modules": sorted(sys.modules)}}))
+"""
+
+
+def parse_importtime(stderr):
+    # "import time: self [us] | cumulative | imported package", indented by
+    # nesting level. Returns (name, self us, cumulative us, top level) tuples.
+    entries = []
+    lines = stderr.splitlines()
+    if "-- stage" in lines:
+        lines = lines[lines.index("-- stage") + 1:]
+    for line in lines:
+        if not line.startswith("import time:"):
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        if not own.strip().isdigit():
+            # Header line
+            continue
+        entries.append((name.strip(), int(own), int(cumulative), not name[1:].startswith(" ")))
+    return entries
+
+
+def run_stage(statement, database):
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", database)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD.format(statement=statement)],
+        cwd=ROOT_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode:
+        sys.exit(result.stderr.strip().splitlines()[-1])
+    entries = parse_importtime(result.stderr)
+    output = json.loads(result.stdout.strip().splitlines()[-1])
+    return {
+        "import_ms": sum(cumulative for _, _, cumulative, top in entries if top) / 1000,
+        "wall_ms": output["seconds"] * 1000,
+        "entries": entries,
+        "modules": output["modules"],
+    }
+
+
+def top_packages(entries, count):
+    # Import time of each top-level package, summed over its own modules
+    totals = {}
+    for name, own, _, _ in entries:
+        package = name.split(".")[0]
+        totals[package] = totals.get(package, 0) + own
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)[:count]
+
+
+def compare(results, baseline, tolerance, min_delta_ms):
+    regressions = []
+    for name, result in results.items():
+        before = baseline["stages"].get(name)
+        if not before:
+            continue
+        slower = result["import_ms"] - before["import_ms"]
+        if slower > min_delta_ms and result["import_ms"] > before["import_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: imports take {before['import_ms']} -> {result['import_ms']} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database", default=os.environ.get("DATABASE_URL") or DEFAULT_DATABASE)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=12, help="Packages listed by import time.")
+    parser.add_argument("--lazy", default=LAZY_MODULES, help="Modules create_app() must not import.")
+    parser.add_argument("--baseline", help="Compare with the results in this JSON file.")
+    parser.add_argument("--save-baseline", metavar="PATH", help="Write the results as the new baseline.")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown (0.25 = 25%%).")
+    parser.add_argument("--min-delta-ms", type=float, default=50.0, help="Ignore slowdowns smaller than this.")
+    args = parser.parse_args()
+
+    results = {}
+    runs = {}
+    print(f"{'stage':<12} {'imports ms':>11} {'wall ms':>9}")
+    for name, statement in STAGES.items():
+        runs[name] = [run_stage(statement, args.database) for _ in range(args.runs)]
+        results[name] = {
+            "import_ms": round(statistics.median(run["import_ms"] for run in runs[name]), 1),
+            "wall_ms": round(statistics.median(run["wall_ms"] for run in runs[name]), 1),
+        }
+        print(f"{name:<12} {results[name]['import_ms']:>11} {results[name]['wall_ms']:>9}")
+
+    # The last create_app run stands for all of them
+    last = runs["create_app"][-1]
+    print("\nImport time by package (create_app):")
+    for package, own in top_packages(last["entries"], args.top):
+        print(f"  {package:<24} {own / 1000:>8.1f} ms")
+
+    failed = False
+    lazy = {name for name in args.lazy.split(",") if name}
+    imported = sorted(name for name in last["modules"] if name.split(".")[0] in lazy)
+    if imported:
+        failed = True
+        print(f"\ncreate_app() imported modules that should load on first use: {', '.join(imported)}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as output:
+            json.dump({"stages": results}, output, indent=2, sort_keys=True)
+    if args.baseline and not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}, saving these results as the baseline.")
+        with open(args.baseline, "w") as output:
+            json.dump({"stages": results}, output, indent=2, sort_keys=True)
+    elif args.baseline:
+        with open(args.baseline) as baseline:
+            regressions = compare(results, json.load(baseline), args.tolerance, args.min_delta_ms)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            failed = True
+        else:
+            print("\nNo regression against the baseline.")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
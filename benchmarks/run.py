@@ -0,0 +1,259 @@
+"""Benchmark of every route through the Flask test client.
+
+Runs each scenario --requests times (after --warmup runs) against a database
+filled by generate.py, with random ids of active venues/artists picked with
+a fixed seed, and reports per scenario the p50/p95/p99 latency, the SQL
+statements per request and the growth of the peak RSS of the process.
+
+The view cache is off (each request does the full work) unless --cache is
+given. Write scenarios (create/edit/delete forms) only run with --writes,
+since they change the data: regenerate the database afterwards.
+
+    python benchmarks/generate.py --shows 10000 --reset
+    python benchmarks/run.py --save-baseline benchmarks/baseline.json
+    python benchmarks/run.py --baseline benchmarks/baseline.json
+
+Against a baseline, a scenario regresses when it runs more SQL statements
+per request, or when its p95 is more than --tolerance slower (and by at
+least --min-delta-ms). The exit status is 1 when something regressed. A
+missing baseline file is created from the run.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import resource
+import sys
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import event, select
+from sqlalchemy.engine import Engine
+from common import DEFAULT_DATABASE, load_app
+
+SEARCH_TERMS = ["blue", "the owl", "club", "jazz", "golden fox", "xyz"]
+
+
+class Sample:
+    # Random ids of the generated data
+    def __init__(self, seed):
+        from database import db
+        from models import Artist, ArtistLink, Venue, VenueLink
+
+        self.rng = random.Random(seed)
+        self.venue_ids = db.session.scalars(select(Venue.id)).all()
+        self.artist_ids = db.session.scalars(select(Artist.id)).all()
+        self.venue_links = db.session.execute(select(VenueLink.venue_id, VenueLink.link_id)).all()
+        self.artist_links = db.session.execute(select(ArtistLink.artist_id, ArtistLink.link_id)).all()
+        self.created = 0
+        db.session.close()
+        if not self.venue_ids or not self.artist_ids:
+            sys.exit("The database is empty, fill it with benchmarks/generate.py first.")
+
+    def venue(self):
+        return self.rng.choice(self.venue_ids)
+
+    def artist(self):
+        return self.rng.choice(self.artist_ids)
+
+    def term(self):
+        return self.rng.choice(SEARCH_TERMS)
+
+    def name(self, kind):
+        self.created += 1
+        return f"Benchmark {kind} {os.getpid()}-{self.created}"
+
+    def venue_form(self):
+        return {
+            "name": self.name("Venue"),
+            "city": "Benchmark City",
+            "state": "CA",
+            "address": f"{self.rng.randrange(1, 9999)} Test St",
+            "phone": "555-555-5555",
+            "image_link": "https://images.example.com/venue.jpg",
+            "genres": ["Jazz", "Folk"],
+            "social_link": f"https://instagram.com/bench{self.created}",
+            "seeking_description": "",
+        }
+
+    def artist_form(self):
+        return {
+            "name": self.name("Artist"),
+            "image_link": "https://images.example.com/artist.jpg",
+            "genres": ["Rock n Roll"],
+            "social_link": f"https://www.bench{self.created}.com",
+            "seeking_description": "",
+        }
+
+    def show_form(self):
+        start_time = datetime.now() + timedelta(days=self.rng.randrange(1, 365), minutes=self.rng.randrange(100000))
+        return {"artist_id": self.artist(), "venue_id": self.venue(), "start_time": start_time.strftime("%Y-%m-%d %H:%M:%S")}
+
+
+# Scenario name -> (method, function of the sample returning (path, form data))
+READS = {
+    "index": ("GET", lambda s: ("/", None)),
+    "venues": ("GET", lambda s: ("/venues", None)),
+    "venue": ("GET", lambda s: (f"/venues/{s.venue()}", None)),
+    "venue_search": ("POST", lambda s: ("/venues/search", {"search_term": s.term()})),
+    "venue_create_form": ("GET", lambda s: ("/venues/create", None)),
+    "venue_edit_form": ("GET", lambda s: (f"/venues/{s.venue()}/edit", None)),
+    "artists": ("GET", lambda s: ("/artists", None)),
+    "artist": ("GET", lambda s: (f"/artists/{s.artist()}", None)),
+    "artist_search": ("POST", lambda s: ("/artists/search", {"search_term": s.term()})),
+    "artist_create_form": ("GET", lambda s: ("/artists/create", None)),
+    "artist_edit_form": ("GET", lambda s: (f"/artists/{s.artist()}/edit", None)),
+    "shows": ("GET", lambda s: ("/shows", None)),
+    "show_create_form": ("GET", lambda s: ("/shows/create", None)),
+    "metrics": ("GET", lambda s: ("/metrics", None)),
+    "api_venues": ("GET", lambda s: ("/api/v1/venues", None)),
+    "api_venues_include": ("GET", lambda s: ("/api/v1/venues?include=genres,links,shows", None)),
+    "api_venue": ("GET", lambda s: (f"/api/v1/venues/{s.venue()}?include=genres,links,shows", None)),
+    "api_artists": ("GET", lambda s: ("/api/v1/artists", None)),
+    "api_artist": ("GET", lambda s: (f"/api/v1/artists/{s.artist()}?include=genres,links,shows", None)),
+    "api_shows": ("GET", lambda s: ("/api/v1/shows?upcoming=1", None)),
+    "api_search": ("GET", lambda s: (f"/api/v1/search?q={s.term()}", None)),
+    "api_typeahead": ("GET", lambda s: (f"/api/v1/typeahead?q={s.term()[:s.rng.randint(1, 4)]}", None)),
+}
+
+WRITES = {
+    "venue_create": ("POST", lambda s: ("/venues/create", s.venue_form())),
+    "venue_edit": ("POST", lambda s: (f"/venues/{s.venue()}/edit", s.venue_form())),
+    "venue_make_primary": ("POST", lambda s: ("/venues/{}/links/{}/make-primary".format(*s.rng.choice(s.venue_links)), None)),
+    "artist_create": ("POST", lambda s: ("/artists/create", s.artist_form())),
+    "artist_edit": ("POST", lambda s: (f"/artists/{s.artist()}/edit", s.artist_form())),
+    "artist_make_primary": ("POST", lambda s: ("/artists/{}/links/{}/make-primary".format(*s.rng.choice(s.artist_links)), None)),
+    "show_create": ("POST", lambda s: ("/shows/create", s.show_form())),
+    "venue_delete": ("DELETE", lambda s: (f"/venues/{s.venue_ids.pop()}/delete", None)),
+    "artist_delete": ("DELETE", lambda s: (f"/artists/{s.artist_ids.pop()}/delete", None)),
+}
+
+
+def percentile(values, percent):
+    # Nearest-rank percentile
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(percent / 100 * len(ordered)) - 1)]
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def run_scenario(client, sample, method, request, requests, warmup, queries):
+    latencies = []
+    counts = []
+    statuses = set()
+    rss_before = peak_rss_mb()
+    for number in range(warmup + requests):
+        path, data = request(sample)
+        queries.clear()
+        started = time.perf_counter()
+        response = client.open(path, method=method, data=data)
+        elapsed = time.perf_counter() - started
+        statuses.add(response.status_code)
+        if number >= warmup:
+            latencies.append(elapsed * 1000)
+            counts.append(len(queries))
+    return {
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "queries": round(sum(counts) / len(counts), 2),
+        "max_queries": max(counts),
+        "rss_growth_mb": round(peak_rss_mb() - rss_before, 2),
+        "status": sorted(statuses),
+    }
+
+
+def compare(results, baseline, tolerance, min_delta_ms):
+    regressions = []
+    for name, result in results["scenarios"].items():
+        before = baseline["scenarios"].get(name)
+        if before is None:
+            continue
+        if result["queries"] > before["queries"]:
+            regressions.append(f"{name}: {before['queries']} -> {result['queries']} queries per request")
+        slower = result["p95_ms"] - before["p95_ms"]
+        if slower > min_delta_ms and result["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {before['p95_ms']:.2f} -> {result['p95_ms']:.2f} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database", default=None, help=f"Database URL (default: $DATABASE_URL or {DEFAULT_DATABASE}).")
+    parser.add_argument("--requests", type=int, default=50, help="Measured requests per scenario.")
+    parser.add_argument("--warmup", type=int, default=5, help="Unmeasured requests per scenario.")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--only", action="append", default=[], help="Run the scenarios containing this text.")
+    parser.add_argument("--writes", action="store_true", help="Also run the write scenarios.")
+    parser.add_argument("--cache", action="store_true", help="Keep the view cache on.")
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+    parser.add_argument("--baseline", help="Compare with the results in this JSON file.")
+    parser.add_argument("--save-baseline", metavar="PATH", help="Write the results as the new baseline.")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed p95 slowdown (0.25 = 25%%).")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="Ignore p95 slowdowns below this.")
+    args = parser.parse_args()
+
+    settings = {"PROFILING": False}
+    if not args.cache:
+        settings["VIEW_CACHE_BACKEND"] = "null"
+    app = load_app(args.database or os.environ.get("DATABASE_URL") or DEFAULT_DATABASE, **settings)
+    app.config["WTF_CSRF_ENABLED"] = False
+
+    queries = []
+
+    @event.listens_for(Engine, "before_cursor_execute")
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        queries.append(statement)
+
+    scenarios = dict(READS, **WRITES) if args.writes else dict(READS)
+    if args.only:
+        scenarios = {name: scenario for name, scenario in scenarios.items() if any(text in name for text in args.only)}
+
+    with app.app_context():
+        sample = Sample(args.seed)
+        database = app.extensions["sqlalchemy"].engine.url.render_as_string(hide_password=True)
+
+    results = {
+        "database": database,
+        "python": platform.python_version(),
+        "requests": args.requests,
+        "scenarios": {},
+    }
+    client = app.test_client()
+    print(f"{'scenario':<22} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8} {'rss +MB':>8}  status")
+    for name, (method, request) in scenarios.items():
+        result = run_scenario(client, sample, method, request, args.requests, args.warmup, queries)
+        results["scenarios"][name] = result
+        print(
+            f"{name:<22} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} {result['p99_ms']:>8.2f} "
+            f"{result['queries']:>8} {result['rss_growth_mb']:>8.2f}  {','.join(map(str, result['status']))}"
+        )
+    results["peak_rss_mb"] = round(peak_rss_mb(), 1)
+    print(f"Peak RSS: {results['peak_rss_mb']} MB")
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as output:
+                json.dump(results, output, indent=2)
+
+    if args.baseline and not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}, saving these results as the baseline.")
+        with open(args.baseline, "w") as output:
+            json.dump(results, output, indent=2)
+    elif args.baseline:
+        with open(args.baseline) as baseline:
+            regressions = compare(results, json.load(baseline), args.tolerance, args.min_delta_ms)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No regression against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
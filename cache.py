@@ -0,0 +1,324 @@
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlencode
+from flask import g, has_request_context, request
+
+# ----------------------------------------------------------------------------#
+# View cache.
+# ----------------------------------------------------------------------------#
+
+# Read-through cache for the view models (the dicts handed to the templates)
+# of the most visited pages. Entries are grouped in namespaces such as
+# "venues" or "venue:12". Every namespace has a generation number that is part
+# of the cache key, so invalidating a namespace is just bumping its generation:
+# the old entries are never read again and age out of the backend.
+#
+# Backends:
+# - "memory": in-process LRU with TTL (default). Each worker has its own.
+# - "filesystem": pickled entries in a directory shared by the workers, at
+#   most VIEW_CACHE_MAX_ENTRIES of them.
+# - "redis": shared Redis server (needs the redis package).
+# - "null": caching disabled.
+
+_MISSING = object()
+
+
+def request_key(*arg_names):
+    # Cache key of the current page: its path and only the query arguments
+    # the view reads. Arguments it ignores (?x=1, ?x=2...) would otherwise
+    # each create an entry.
+    args = [(name, request.args[name]) for name in sorted(arg_names) if name in request.args]
+    return f"{request.path}?{urlencode(args)}"
+
+
+class MemoryBackend:
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        # Generations are kept apart from the LRU: evicting one would reset it
+        # and bring back entries that were invalidated
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return _MISSING
+            # Most recently used entries live at the end
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_counter(self, key):
+        return self._counters.get(key, 0)
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class FileSystemBackend:
+    # Every SWEEP_INTERVAL writes of a process, the expired entries are
+    # deleted and, past max_entries, the least recently used ones (a hit
+    # touches the file's mtime).
+    SWEEP_INTERVAL = 100
+
+    def __init__(self, directory, max_entries=1024):
+        self.directory = directory
+        # Generations are kept apart from the entries, the sweep never
+        # deletes them
+        self.counters_directory = os.path.join(directory, "generations")
+        os.makedirs(self.counters_directory, exist_ok=True)
+        self.max_entries = max_entries
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def _path(self, key, directory=None):
+        return os.path.join(directory or self.directory, hashlib.sha1(key.encode("utf-8")).hexdigest())
+
+    def _load(self, path):
+        # The expiry time is pickled first, so that the sweep reads only it
+        try:
+            with open(path, "rb") as cache_file:
+                expires_at = pickle.load(cache_file)
+                # Wall clock, the file may have been written by another process
+                if expires_at is not None and expires_at <= time.time():
+                    _remove(path)
+                    return _MISSING
+                return pickle.load(cache_file)
+        except (OSError, EOFError, TypeError, pickle.UnpicklingError):
+            return _MISSING
+
+    def _store(self, path, value, ttl=None):
+        expires_at = time.time() + ttl if ttl else None
+        # Write to a temporary file and rename it so that readers in other
+        # workers never see a partially written entry
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp")
+        with os.fdopen(fd, "wb") as cache_file:
+            pickle.dump(expires_at, cache_file, pickle.HIGHEST_PROTOCOL)
+            pickle.dump(value, cache_file, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def get(self, key):
+        path = self._path(key)
+        value = self._load(path)
+        if value is not _MISSING:
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+        return value
+
+    def set(self, key, value, ttl=None):
+        self._store(self._path(key), value, ttl)
+        with self._lock:
+            self._writes += 1
+            sweep = self._writes % self.SWEEP_INTERVAL == 0
+        if sweep:
+            self.sweep()
+
+    def sweep(self):
+        entries = []
+        now = time.time()
+        for entry in os.scandir(self.directory):
+            if not entry.is_file() or entry.name.startswith(".tmp"):
+                continue
+            try:
+                with open(entry.path, "rb") as cache_file:
+                    expires_at = pickle.load(cache_file)
+                mtime = entry.stat().st_mtime
+            except (OSError, EOFError, pickle.UnpicklingError):
+                continue
+            if not isinstance(expires_at, (int, float, type(None))) or (expires_at is not None and expires_at <= now):
+                _remove(entry.path)
+            else:
+                entries.append((mtime, entry.path))
+        # Least recently used first
+        entries.sort()
+        for _, path in entries[: max(0, len(entries) - self.max_entries)]:
+            _remove(path)
+
+    def get_counter(self, key):
+        value = self._load(self._path(key, self.counters_directory))
+        return 0 if value is _MISSING else value
+
+    def incr(self, key):
+        # Generations only need to change, not to be exact, so a unique
+        # value avoids a cross-process read-modify-write race
+        value = time.time_ns()
+        self._store(self._path(key, self.counters_directory), value)
+        return value
+
+    def clear(self):
+        for directory in (self.directory, self.counters_directory):
+            for entry in os.scandir(directory):
+                if entry.is_file():
+                    _remove(entry.path)
+
+
+def _remove(path):
+    # Another worker may have removed it already
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class RedisBackend:
+    def __init__(self, url, prefix="fyyur:view:"):
+        # Optional dependency, only needed for this backend
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("VIEW_CACHE_BACKEND 'redis' needs the redis package installed")
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        data = self.client.get(self.prefix + key)
+        if data is None:
+            return _MISSING
+        return pickle.loads(data)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), ex=ttl or None)
+
+    def get_counter(self, key):
+        # Counters are stored as raw integers so that INCR can be used
+        value = self.client.get(self.prefix + key)
+        return int(value) if value is not None else 0
+
+    def incr(self, key):
+        return self.client.incr(self.prefix + key)
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + "*"):
+            self.client.delete(key)
+
+
+class NullBackend:
+    def get(self, key):
+        return _MISSING
+
+    def set(self, key, value, ttl=None):
+        pass
+
+    def get_counter(self, key):
+        return 0
+
+    def incr(self, key):
+        return 0
+
+    def clear(self):
+        pass
+
+
+class ViewCache:
+    def __init__(self):
+        self.backend = MemoryBackend()
+        self.ttl = 60
+        self.hits = {}
+        self.misses = {}
+        self._stats_lock = threading.Lock()
+
+    def init_app(self, app):
+        name = app.config.get("VIEW_CACHE_BACKEND", "memory")
+        if name == "memory":
+            self.backend = MemoryBackend(app.config.get("VIEW_CACHE_MAX_ENTRIES", 1024))
+        elif name == "filesystem":
+            self.backend = FileSystemBackend(
+                app.config.get("VIEW_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "fyyur-view-cache"),
+                app.config.get("VIEW_CACHE_MAX_ENTRIES", 1024),
+            )
+        elif name == "redis":
+            self.backend = RedisBackend(app.config["VIEW_CACHE_URL"])
+        elif name == "null":
+            self.backend = NullBackend()
+        else:
+            raise ValueError(f"Unknown VIEW_CACHE_BACKEND {name!r}")
+        self.ttl = app.config.get("VIEW_CACHE_TTL", 60)
+
+    def _generation(self, namespace):
+        return self.backend.get_counter("gen:" + namespace)
+
+    def _key(self, namespaces, key):
+        generations = ",".join(f"{namespace}@{self._generation(namespace)}" for namespace in namespaces)
+        return f"{generations}|{key}"
+
+    def _count(self, counters, namespaces):
+        # Stats are kept per kind of page ("venue", "venues", ...), not per id
+        kind = namespaces[0].split(":", 1)[0]
+        with self._stats_lock:
+            counters[kind] = counters.get(kind, 0) + 1
+
+    def get_or_set(self, namespaces, key, builder):
+        # Return the cached value for key, or build it, store it and return it.
+        # A builder returning None (e.g. a missing venue) is not cached.
+        cache_key = self._key(namespaces, key)
+
+        # Within a request the same value is returned every time, so that the
+        # conditional GET validators and the page come from one snapshot
+        # (see conditional.py)
+        request_values = g.setdefault("view_cache", {}) if has_request_context() else {}
+        if cache_key in request_values:
+            return request_values[cache_key]
+
+        value = self.backend.get(cache_key)
+        if value is not _MISSING:
+            self._count(self.hits, namespaces)
+        else:
+            self._count(self.misses, namespaces)
+            value = builder()
+            if value is not None:
+                self.backend.set(cache_key, value, self.ttl)
+
+        request_values[cache_key] = value
+        return value
+
+    def invalidate(self, *namespaces):
+        for namespace in namespaces:
+            self.backend.incr("gen:" + namespace)
+
+    def clear(self):
+        self.backend.clear()
+
+    def prometheus_text(self):
+        lines = [
+            "# HELP fyyur_view_cache_hits_total View cache hits.",
+            "# TYPE fyyur_view_cache_hits_total counter",
+        ]
+        with self._stats_lock:
+            for kind, count in sorted(self.hits.items()):
+                lines.append(f'fyyur_view_cache_hits_total{{page="{kind}"}} {count}')
+            lines += [
+                "# HELP fyyur_view_cache_misses_total View cache misses.",
+                "# TYPE fyyur_view_cache_misses_total counter",
+            ]
+            for kind, count in sorted(self.misses.items()):
+                lines.append(f'fyyur_view_cache_misses_total{{page="{kind}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+view_cache = ViewCache()
@@ -0,0 +1,67 @@
+import importlib
+import click
+from flask import current_app
+from database import db
+from exporter import export_command
+from feed import feed_cli
+from show_counters import counters_cli
+from templating import templates_cli
+
+# ----------------------------------------------------------------------------#
+# CLI commands.
+# ----------------------------------------------------------------------------#
+
+# The "db" (Flask-Migrate, which loads Alembic) and "import" (which loads the
+# WTForms forms) groups are only imported when one of their commands runs:
+# the app itself, and every other command, start without them.
+
+
+class LazyGroup(click.Group):
+    # A command group given as "module:attribute", imported on first use
+    def __init__(self, name, import_name, on_load=None, **kwargs):
+        super().__init__(name, **kwargs)
+        self.import_name = import_name
+        self.on_load = on_load
+        self._group = None
+
+    def _load(self):
+        if self._group is None:
+            module_name, attribute = self.import_name.split(":")
+            group = getattr(importlib.import_module(module_name), attribute)
+            if self.on_load:
+                self.on_load(current_app)
+            # The group's own options and callback (e.g. "flask db -d DIR")
+            self.params = group.params
+            self.callback = group.callback
+            self._group = group
+        return self._group
+
+    def parse_args(self, ctx, args):
+        self._load()
+        return super().parse_args(ctx, args)
+
+    def list_commands(self, ctx):
+        return self._load().list_commands(ctx)
+
+    def get_command(self, ctx, name):
+        return self._load().get_command(ctx, name)
+
+
+def _init_migrate(app):
+    # Flask-Migrate reads its settings from app.extensions["migrate"]
+    from flask_migrate import Migrate
+
+    Migrate(app, db)
+
+
+def init_commands(app):
+    app.cli.add_command(
+        LazyGroup("db", "flask_migrate.cli:db", on_load=_init_migrate, help="Perform database migrations.")
+    )
+    app.cli.add_command(
+        LazyGroup("import", "importer:import_cli", help="Bulk import venues, artists and shows from CSV or JSONL files.")
+    )
+    app.cli.add_command(export_command)
+    app.cli.add_command(feed_cli)
+    app.cli.add_command(counters_cli)
+    app.cli.add_command(templates_cli)
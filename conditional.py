@@ -0,0 +1,122 @@
+import hashlib
+import os
+from datetime import timezone
+from functools import wraps
+from flask import current_app, make_response, request, session
+
+# ----------------------------------------------------------------------------#
+# Conditional GET.
+# ----------------------------------------------------------------------------#
+
+# Pages get an ETag and a Last-Modified header derived from the latest
+# updated_at of the rows they display. When the client already has that
+# version, a 304 is returned without running the view or rendering the
+# template.
+#
+# Pages served from the view cache must take the timestamps from the cached
+# view model (see cached_last_modified), not from the database: with the
+# per-process memory backend a worker that did not see a write keeps its old
+# copy until the TTL expires, and fresh validators on that copy would let
+# clients revalidate the stale page (304) until the next change.
+
+
+def _code_version():
+    # The markup depends on the templates and the code too, so a deploy must
+    # change the validators even if the data did not. The version has to be
+    # the same in every worker and on every host: the deploy can set
+    # CODE_VERSION (e.g. the git commit), otherwise it is a hash of the
+    # contents of the templates and of the application's Python files (top
+    # level modules and packages such as views/).
+    version = os.environ.get("CODE_VERSION")
+    if version:
+        return version
+
+    basedir = os.path.abspath(os.path.dirname(__file__))
+    paths = []
+    for root, dirs, files in os.walk(os.path.join(basedir, "templates")):
+        paths += [os.path.join(root, name) for name in files]
+    for name in os.listdir(basedir):
+        path = os.path.join(basedir, name)
+        if name.endswith(".py"):
+            paths.append(path)
+        elif os.path.isfile(os.path.join(path, "__init__.py")):
+            for root, dirs, files in os.walk(path):
+                paths += [os.path.join(root, name) for name in files if name.endswith(".py")]
+
+    digest = hashlib.sha1()
+    # Sorted by relative path, so that the hash doesn't depend on the
+    # checkout directory or the order of the directory listing
+    for path in sorted(paths, key=lambda path: os.path.relpath(path, basedir)):
+        digest.update(os.path.relpath(path, basedir).replace(os.sep, "/").encode("utf-8"))
+        with open(path, "rb") as source:
+            digest.update(source.read())
+    return digest.hexdigest()
+
+
+CODE_VERSION = _code_version()
+
+
+def _as_utc(value):
+    # SQLite returns naive datetimes even for timezone-aware columns
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def cached_last_modified(view):
+    # Timestamps stored in a cached view model by its builder, read before
+    # the rows it displays
+    return view["last_modified"] if view else ()
+
+
+def conditional_get(last_modified):
+    # last_modified(**view_args) returns the timestamps of the rows shown by
+    # the page. If they are all None (e.g. the venue doesn't exist) the view
+    # runs normally.
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # Pending flash messages are rendered by the layout, they must
+            # not be swallowed by a 304
+            if (
+                request.method != "GET"
+                or not current_app.config.get("CONDITIONAL_GET", True)
+                or "_flashes" in session
+            ):
+                return view(*args, **kwargs)
+
+            timestamps = [_as_utc(value) for value in last_modified(**kwargs) if value is not None]
+            if not timestamps:
+                return view(*args, **kwargs)
+
+            # The ETag keeps the full precision, so that two edits within
+            # the same second give two versions. HTTP dates have a one
+            # second resolution, only Last-Modified is rounded.
+            modified = max(timestamps)
+            http_modified = modified.replace(microsecond=0)
+            etag = hashlib.sha1(
+                f"{CODE_VERSION}|{request.full_path}|{modified.isoformat()}".encode("utf-8")
+            ).hexdigest()
+
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains(etag)
+            else:
+                since = request.if_modified_since
+                not_modified = since is not None and http_modified <= since
+
+            if not_modified:
+                response = make_response("", 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            response.last_modified = http_modified
+            # Let browsers keep the page but revalidate it on every use
+            response.cache_control.no_cache = True
+            return response
+
+        return wrapper
+
+    return decorator
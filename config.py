@@ -1,10 +1,121 @@
 import os
-SECRET_KEY = os.urandom(32)
+
+# Configuration profile: "development" (default) or "production"
+FYYUR_ENV = os.environ.get('FYYUR_ENV', 'development')
+PRODUCTION = FYYUR_ENV == 'production'
+
+# Set it in production: the workers must share the key to read each other's
+# session cookies
+SECRET_KEY = os.environ.get('SECRET_KEY') or os.urandom(32)
 # Grabs the folder where the script runs.
 basedir = os.path.abspath(os.path.dirname(__file__))
 
 # Enable debug mode.
-DEBUG = True
+DEBUG = not PRODUCTION
+
+# Templates (see templating.py). In production the compiled templates are
+# cached on disk and shared by the workers, they are all compiled at startup
+# and the files are not checked for changes on every render.
+TEMPLATES_AUTO_RELOAD = not PRODUCTION
+TEMPLATE_BYTECODE_CACHE_DIR = (
+    os.environ.get('TEMPLATE_BYTECODE_CACHE_DIR', os.path.join(basedir, '.jinja-cache')) if PRODUCTION else None
+)
+PRECOMPILE_TEMPLATES = PRODUCTION
 
 # TODO IMPLEMENT DATABASE URL
-SQLALCHEMY_DATABASE_URI = 'postgresql://postgres@localhost:5432/fyyur'
+SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'postgresql://postgres@localhost:5432/fyyur')
+
+# Engine and connection pool, see pool.py. Every worker process has its own
+# pool, so the database sees up to workers * (pool size + overflow)
+# connections.
+DATABASE_POOL_SIZE = int(os.environ.get('DATABASE_POOL_SIZE', 5))
+DATABASE_MAX_OVERFLOW = int(os.environ.get('DATABASE_MAX_OVERFLOW', 5))
+# Seconds to wait for a free connection before failing the request
+DATABASE_POOL_TIMEOUT = float(os.environ.get('DATABASE_POOL_TIMEOUT', 10))
+# Replace connections older than this many seconds (-1 to never)
+DATABASE_POOL_RECYCLE = int(os.environ.get('DATABASE_POOL_RECYCLE', 1800))
+# Test connections on checkout so that stale ones are replaced transparently
+DATABASE_POOL_PRE_PING = os.environ.get('DATABASE_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes')
+# Cancel statements running longer than this many milliseconds (0 to disable)
+DATABASE_STATEMENT_TIMEOUT_MS = int(os.environ.get('DATABASE_STATEMENT_TIMEOUT_MS', 0))
+# Set when connecting through PgBouncer (or another pooler) in transaction
+# mode: no pool in the app and no prepared statements
+DATABASE_EXTERNAL_POOLER = os.environ.get('DATABASE_EXTERNAL_POOLER', 'false').lower() in ('1', 'true', 'yes')
+
+# Read replicas (comma separated URLs) for the GET requests, see replicas.py.
+# After a write, the same client reads from the primary for
+# READ_YOUR_WRITES_SECONDS so that it sees its own changes.
+SQLALCHEMY_REPLICA_URIS = [url for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url]
+READ_YOUR_WRITES_SECONDS = int(os.environ.get('READ_YOUR_WRITES_SECONDS', 5))
+
+# Listing pages (/venues, /artists, /shows) are paginated with cursors.
+# Clients may ask for a different page size with ?per_page=, up to MAX_PAGE_SIZE.
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# Search engine backend: "sql" uses the pg_trgm indexes (PostgreSQL only),
+# "memory" an in-process inverted index, "auto" picks by database dialect.
+SEARCH_BACKEND = "auto"
+# The in-process index picks up the changes made by other processes (and
+# the bulk importer) at most this many seconds later.
+SEARCH_SYNC_SECONDS = 5
+# Results shown by the search forms, and most returned by /api/v1/search
+# (which takes a smaller ?limit=).
+SEARCH_MAX_RESULTS = 50
+
+# Number of upcoming/past shows displayed per section on the venue and
+# artist pages. Each section has its own "load more" cursor.
+DETAIL_SHOWS_PAGE_SIZE = 6
+
+# Read-through cache of the venue/artist pages, the venue directory and the
+# shows listing. Backends: "memory" (per-process LRU), "filesystem" (shared
+# by the workers through VIEW_CACHE_DIR), "redis" (VIEW_CACHE_URL) or "null".
+VIEW_CACHE_BACKEND = "memory"
+VIEW_CACHE_TTL = 60
+VIEW_CACHE_MAX_ENTRIES = 1024  # memory and filesystem backends
+VIEW_CACHE_DIR = None
+VIEW_CACHE_URL = None
+
+# Send ETag/Last-Modified on the listing and detail pages and answer
+# conditional requests with 304 Not Modified. The ETags include the code
+# version, the CODE_VERSION environment variable (e.g. the deployed commit)
+# or else a hash of the templates and Python files (see conditional.py).
+CONDITIONAL_GET = True
+
+# JSON API responses of at least this many bytes are compressed (brotli when
+# installed and accepted by the client, gzip otherwise)
+API_COMPRESS_MIN_SIZE = 1024
+
+# Concurrent connections per process in the cooperative (gevent) mode, see
+# cooperative.py
+COOPERATIVE_MAX_CONNECTIONS = int(os.environ.get('COOPERATIVE_MAX_CONNECTIONS', 1000))
+
+# Autocomplete of the search boxes (/api/v1/typeahead): default and maximum
+# number of names per kind, and how often each process reads the changes
+# made by the others
+TYPEAHEAD_LIMIT = 8
+TYPEAHEAD_MAX_LIMIT = 20
+TYPEAHEAD_SYNC_SECONDS = 5
+
+# Per-request instrumentation: SQL statements, database and template time in a
+# Server-Timing header, a JSON line in requests.log and /metrics. A statement
+# run N_PLUS_ONE_THRESHOLD times in one request is logged as a likely N+1
+# (0 disables the check).
+INSTRUMENTATION = True
+SERVER_TIMING_HEADER = True
+N_PLUS_ONE_THRESHOLD = int(os.environ.get('N_PLUS_ONE_THRESHOLD', 5))
+SLOWEST_QUERIES_LOGGED = 3
+
+# Sampling profiler (see profiling.py). When on, requests with an X-Profile
+# header or a _profile query argument (equal to PROFILING_SECRET if set) and
+# a PROFILING_SAMPLE_RATE fraction of the others are profiled, at most
+# PROFILING_MAX_PER_MINUTE per process. The profiles are written to
+# PROFILING_DIR/<endpoint>/ as collapsed stacks or speedscope JSON. Outside
+# debug mode, profiling stays off unless PROFILING_SECRET is set.
+PROFILING = os.environ.get('PROFILING', '').lower() in ('1', 'true', 'yes')
+PROFILING_SECRET = os.environ.get('PROFILING_SECRET')
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 0))
+PROFILING_MAX_PER_MINUTE = 6
+PROFILING_INTERVAL_MS = 5
+PROFILING_FORMAT = os.environ.get('PROFILING_FORMAT', 'collapsed')
+PROFILING_DIR = os.environ.get('PROFILING_DIR', 'profiles')
@@ -0,0 +1,73 @@
+import os
+import sys
+
+# ----------------------------------------------------------------------------#
+# Cooperative serving mode (gevent).
+# ----------------------------------------------------------------------------#
+
+# In the threaded mode every request holds a worker thread for its whole
+# duration, including the time spent waiting on the database, so a handful
+# of slow queries exhaust the threads. In the cooperative mode each request
+# runs in a greenlet: the standard library is patched by gevent and psycopg2
+# by psycogreen, so waiting on a socket or a query hands the worker over to
+# the other requests. The listings, detail pages, searches and JSON API can
+# then serve many concurrent requests per process, and the views (reads and
+# writes alike) stay the same synchronous code.
+#
+# Start it with "python cooperative.py" (or gunicorn's gevent worker class).
+# patch() must run before anything else is imported. Size the connection
+# pool (DATABASE_POOL_SIZE/DATABASE_MAX_OVERFLOW) for the number of
+# concurrent requests that hit the database, or they wait for a connection.
+#
+# Optional dependencies: gevent and psycogreen, pinned in
+# requirements-gevent.txt.
+
+
+def patch():
+    try:
+        from gevent import monkey
+    except ImportError:
+        raise RuntimeError("The cooperative mode needs gevent: pip install -r requirements-gevent.txt")
+
+    monkey.patch_all()
+    try:
+        import psycopg2  # noqa: F401
+    except ImportError:
+        # No PostgreSQL driver to patch (SQLite development database)
+        return
+    try:
+        from psycogreen.gevent import patch_psycopg
+    except ImportError:
+        # Without it every query blocks the whole process
+        raise RuntimeError(
+            "The cooperative mode needs psycogreen to make psycopg2 cooperative: pip install -r requirements-gevent.txt"
+        )
+    patch_psycopg()
+
+
+def is_patched():
+    # True in the cooperative mode, where threads are greenlets
+    monkey = sys.modules.get("gevent.monkey")
+    return monkey is not None and monkey.is_module_patched("threading")
+
+
+def serve(app, host="127.0.0.1", port=5000, max_connections=1000):
+    from gevent.pool import Pool
+    from gevent.pywsgi import WSGIServer
+
+    server = WSGIServer((host, port), app, spawn=Pool(max_connections), log=None)
+    app.logger.info("Serving cooperatively on http://%s:%s", host, port)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    patch()
+    from app import create_app
+
+    app = create_app()
+    serve(
+        app,
+        host=os.environ.get("HOST", "127.0.0.1"),
+        port=int(os.environ.get("PORT", 5000)),
+        max_connections=app.config.get("COOPERATIVE_MAX_CONNECTIONS", 1000),
+    )
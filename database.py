@@ -1,2 +1,17 @@
 from flask_sqlalchemy import SQLAlchemy
-db = SQLAlchemy()
\ No newline at end of file
+from sqlalchemy.dialects import postgresql, sqlite
+from replicas import RoutingSession
+
+# Sessions pick the primary database or a read replica, see replicas.py
+db = SQLAlchemy(session_options={"class_": RoutingSession})
+
+
+def dialect_insert(model):
+    # INSERT construct of the database in use, which supports
+    # ON CONFLICT DO NOTHING. None on databases without it.
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(model)
+    if dialect == "sqlite":
+        return sqlite.insert(model)
+    return None
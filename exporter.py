@@ -0,0 +1,278 @@
+import csv
+import gzip
+import json
+import os
+from datetime import datetime, timedelta, timezone
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func, select
+from database import db
+from models import (
+    Artist,
+    ArtistLink,
+    Genre,
+    GenreArtist,
+    GenreVenue,
+    Link,
+    LinkType,
+    Location,
+    PostalCode,
+    Show,
+    Venue,
+    VenueLink,
+)
+
+# ----------------------------------------------------------------------------#
+# Export.
+# ----------------------------------------------------------------------------#
+
+# flask export [DATASET ...] --output DIR --format jsonl|csv|columns
+#
+# Dumps the tables for analytics. Every dataset is a plain SELECT read with a
+# server-side cursor (yield_per turns on stream_results) and written batch by
+# batch, so memory does not grow with the size of the tables. Soft-deleted
+# rows are exported too, with their deleted_at.
+#
+# Every dataset ends with a changed_at column (when the row, or the venue /
+# artist an association belongs to, was last written). With --incremental
+# only rows changed since the watermark of the previous run are exported,
+# and the new watermarks are saved in DIR/watermarks.json once all the files
+# are written. Rows are stamped with the start time of their transaction, so
+# a slow one can commit rows older than the watermark: every run re-reads
+# EXPORT_OVERLAP before it. A row can therefore appear in two consecutive
+# files, consumers keep the last one per id (per pair of ids for genres and
+# links).
+#
+# "columns" is a compact columnar format: gzipped JSON lines, a header with
+# the column names followed by one line per batch holding a list of values
+# per column.
+
+
+EXPORT_OVERLAP = timedelta(minutes=1)
+
+
+def _changed_at(model):
+    return func.coalesce(model.updated_at, model.created_at).label("changed_at")
+
+
+def _venues():
+    return (
+        select(
+            Venue.id,
+            Venue.name,
+            Location.address,
+            PostalCode.city,
+            PostalCode.state,
+            Venue.phone,
+            Venue.image_link,
+            Venue.seeking_talent,
+            Venue.seeking_description,
+            Venue.created_at,
+            Venue.deleted_at,
+            _changed_at(Venue),
+        )
+        .join(Location, Venue.location_id == Location.id)
+        .join(PostalCode, Location.postal_code_id == PostalCode.id)
+        .order_by(Venue.id)
+    )
+
+
+def _artists():
+    return select(
+        Artist.id,
+        Artist.name,
+        Artist.image_link,
+        Artist.seeking_venue,
+        Artist.seeking_description,
+        Artist.created_at,
+        Artist.deleted_at,
+        _changed_at(Artist),
+    ).order_by(Artist.id)
+
+
+def _shows():
+    return select(
+        Show.id,
+        Show.artist_id,
+        Show.venue_id,
+        Show.start_time,
+        Show.created_at,
+        Show.deleted_at,
+        _changed_at(Show),
+    ).order_by(Show.id)
+
+
+def _venue_genres():
+    return (
+        select(GenreVenue.venue_id, Genre.genre_name.label("genre"), _changed_at(Venue))
+        .join(Genre, GenreVenue.genre_id == Genre.id)
+        .join(Venue, GenreVenue.venue_id == Venue.id)
+        .order_by(GenreVenue.venue_id, Genre.genre_name)
+    )
+
+
+def _artist_genres():
+    return (
+        select(GenreArtist.artist_id, Genre.genre_name.label("genre"), _changed_at(Artist))
+        .join(Genre, GenreArtist.genre_id == Genre.id)
+        .join(Artist, GenreArtist.artist_id == Artist.id)
+        .order_by(GenreArtist.artist_id, Genre.genre_name)
+    )
+
+
+def _venue_links():
+    return (
+        select(
+            VenueLink.venue_id,
+            Link.url,
+            LinkType.type_name.label("link_type"),
+            VenueLink.is_primary,
+            _changed_at(Venue),
+        )
+        .join(Link, VenueLink.link_id == Link.id)
+        .join(LinkType, Link.link_type_id == LinkType.id)
+        .join(Venue, VenueLink.venue_id == Venue.id)
+        .order_by(VenueLink.venue_id, Link.id)
+    )
+
+
+def _artist_links():
+    return (
+        select(
+            ArtistLink.artist_id,
+            Link.url,
+            LinkType.type_name.label("link_type"),
+            ArtistLink.is_primary,
+            _changed_at(Artist),
+        )
+        .join(Link, ArtistLink.link_id == Link.id)
+        .join(LinkType, Link.link_type_id == LinkType.id)
+        .join(Artist, ArtistLink.artist_id == Artist.id)
+        .order_by(ArtistLink.artist_id, Link.id)
+    )
+
+
+# Dataset name -> (SELECT builder, model whose changes drive the watermark)
+DATASETS = {
+    "venues": (_venues, Venue),
+    "artists": (_artists, Artist),
+    "shows": (_shows, Show),
+    "venue_genres": (_venue_genres, Venue),
+    "artist_genres": (_artist_genres, Artist),
+    "venue_links": (_venue_links, Venue),
+    "artist_links": (_artist_links, Artist),
+}
+
+EXTENSIONS = {"jsonl": "jsonl", "csv": "csv", "columns": "columns.json.gz"}
+
+
+def _plain(value):
+    # Datetimes as ISO strings, everything else is already JSON/CSV friendly
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _write_jsonl(path, columns, batches):
+    with open(path, "w", encoding="utf-8") as out:
+        for batch in batches:
+            for row in batch:
+                out.write(json.dumps({column: _plain(value) for column, value in zip(columns, row)}) + "\n")
+
+
+def _write_csv(path, columns, batches):
+    with open(path, "w", newline="", encoding="utf-8") as out:
+        writer = csv.writer(out)
+        writer.writerow(columns)
+        for batch in batches:
+            writer.writerows([_plain(value) for value in row] for row in batch)
+
+
+def _write_columns(path, columns, batches):
+    with gzip.open(path, "wt", encoding="utf-8") as out:
+        out.write(json.dumps({"columns": columns}) + "\n")
+        for batch in batches:
+            values = [[_plain(value) for value in column] for column in zip(*batch)]
+            out.write(json.dumps({"rows": len(batch), "values": values}, separators=(",", ":")) + "\n")
+
+
+WRITERS = {"jsonl": _write_jsonl, "csv": _write_csv, "columns": _write_columns}
+
+
+def _load_watermarks(path):
+    try:
+        with open(path, encoding="utf-8") as watermarks:
+            return json.load(watermarks)
+    except (OSError, ValueError):
+        return {}
+
+
+def export_dataset(name, path, file_format, batch_size=5000, since=None):
+    # Write one dataset to path and return (rows written, latest changed_at)
+    build, model = DATASETS[name]
+    statement = build()
+    if since is not None:
+        statement = statement.where(func.coalesce(model.updated_at, model.created_at) >= since - EXPORT_OVERLAP)
+
+    # The soft-deleted rows are exported too (see models.py)
+    result = db.session.execute(statement.execution_options(yield_per=batch_size, include_deleted=True))
+    columns = list(result.keys())
+    changed_index = columns.index("changed_at")
+    stats = {"rows": 0, "latest": None}
+
+    def batches():
+        for batch in result.partitions():
+            stats["rows"] += len(batch)
+            for row in batch:
+                changed = row[changed_index]
+                if changed is not None and (stats["latest"] is None or changed > stats["latest"]):
+                    stats["latest"] = changed
+            yield batch
+
+    # Readers never see a half written file
+    tmp_path = path + ".tmp"
+    try:
+        WRITERS[file_format](tmp_path, columns, batches())
+    finally:
+        result.close()
+    os.replace(tmp_path, path)
+    return stats["rows"], stats["latest"]
+
+
+@click.command("export", help="Export venues, artists, shows and their genres/links for analytics.")
+@click.argument("datasets", nargs=-1, type=click.Choice(list(DATASETS)))
+@click.option("--output", "-o", default="export", show_default=True, type=click.Path(file_okay=False))
+@click.option("--format", "file_format", default="jsonl", show_default=True, type=click.Choice(list(WRITERS)))
+@click.option("--batch-size", default=5000, show_default=True, help="Rows fetched per round trip.")
+@click.option("--incremental", is_flag=True, help="Only rows changed since the previous incremental run.")
+@with_appcontext
+def export_command(datasets, output, file_format, batch_size, incremental):
+    os.makedirs(output, exist_ok=True)
+    watermarks_path = os.path.join(output, "watermarks.json")
+    watermarks = _load_watermarks(watermarks_path) if incremental else {}
+
+    # Incremental files are kept side by side, one per run
+    suffix = datetime.now(timezone.utc).strftime(".%Y%m%dT%H%M%S") if incremental else ""
+
+    try:
+        for name in datasets or DATASETS:
+            since = watermarks.get(name)
+            path = os.path.join(output, f"{name}{suffix}.{EXTENSIONS[file_format]}")
+            rows, latest = export_dataset(
+                name,
+                path,
+                file_format,
+                batch_size,
+                since=datetime.fromisoformat(since) if since else None,
+            )
+            if latest is not None:
+                watermarks[name] = latest.isoformat()
+            click.echo(f"{name}: {rows} rows -> {path}")
+    finally:
+        db.session.close()
+
+    if incremental:
+        tmp_path = watermarks_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as out:
+            json.dump(watermarks, out, indent=2)
+        os.replace(tmp_path, watermarks_path)
@@ -6,8 +6,14 @@ from fabric.contrib.console import confirm
 
 def test():
     with settings(warn_only=True):
+        # Unit tests, then benchmark every route on fresh synthetic data and
+        # the startup time, and compare with the stored baselines (see benchmarks/)
         result = local(
-            "python test_tasks.py -v && python test_users.py -v", capture=True
+            "python -m pytest -q"
+            " && python benchmarks/generate.py --shows 10000 --reset"
+            " && python benchmarks/run.py --baseline benchmarks/baseline.json"
+            " && python benchmarks/importtime.py --baseline benchmarks/importtime.json",
+            capture=True,
         )
     if result.failed and not confirm("Tests failed. Continue?"):
         abort("Aborted at user request.")
@@ -0,0 +1,142 @@
+from datetime import datetime, timezone
+import click
+from flask.cli import AppGroup
+from sqlalchemy import delete, event, inspect, insert, or_, select
+from sqlalchemy.orm import Session
+from database import db
+from formatting import format_datetime
+from models import Artist, Show, UpcomingShow, Venue
+
+# ----------------------------------------------------------------------------#
+# Upcoming shows feed.
+# ----------------------------------------------------------------------------#
+
+# The shows page reads the upcoming_shows table: one row per upcoming show of
+# an active venue and artist, with the names, the artist image and the start
+# time already formatted, so the page is a single-table range scan.
+#
+# The rows of the shows touched by a flush (a show created, edited or
+# deleted, or its venue/artist renamed or deleted) are rebuilt right after
+# the flush, in the same transaction, so the feed commits or rolls back
+# together with the change. Shows that start are only hidden by the
+# start_time filter of the page; "flask feed sweep" (run it from cron)
+# deletes them, and "flask feed rebuild" refills the whole table.
+
+feed_cli = AppGroup("feed", help="Maintain the upcoming shows feed.")
+
+# Fields of the venue/artist copied into the feed
+_VENUE_FEED_FIELDS = ("name", "deleted_at")
+_ARTIST_FEED_FIELDS = ("name", "image_link", "deleted_at")
+
+
+def _feed_rows(now):
+    return (
+        select(
+            Show.id.label("show_id"),
+            Show.start_time,
+            Show.venue_id,
+            Venue.name.label("venue_name"),
+            Show.artist_id,
+            Artist.name.label("artist_name"),
+            Artist.image_link.label("artist_image_link"),
+        )
+        .join(Venue, Show.venue_id == Venue.id)
+        .join(Artist, Show.artist_id == Artist.id)
+        .where(
+            Show.start_time > now,
+            Show.deleted_at.is_(None),
+            Venue.deleted_at.is_(None),
+            Artist.deleted_at.is_(None),
+        )
+    )
+
+
+def _feed_entry(row):
+    entry = dict(row._mapping)
+    entry["start_time_text"] = format_datetime(row.start_time, "full")
+    return entry
+
+
+def refresh_upcoming_shows(connection, show_ids=(), venue_ids=(), artist_ids=(), now=None):
+    # Rebuild the feed rows of the given shows and of the shows of the given
+    # venues/artists
+    now = now or datetime.now(timezone.utc)
+    show_ids = set(show_ids)
+
+    owners = []
+    if venue_ids:
+        owners.append(Show.venue_id.in_(venue_ids))
+    if artist_ids:
+        owners.append(Show.artist_id.in_(artist_ids))
+    if owners:
+        # Only their upcoming shows: the past ones are never in the feed (the
+        # page filters them out and the sweep deletes them), and a venue or
+        # artist with a long history would otherwise rewrite all of it
+        show_ids.update(
+            connection.execute(select(Show.id).where(or_(*owners), Show.start_time > now)).scalars()
+        )
+
+    if not show_ids:
+        return
+
+    connection.execute(delete(UpcomingShow).where(UpcomingShow.show_id.in_(show_ids)))
+    entries = [_feed_entry(row) for row in connection.execute(_feed_rows(now).where(Show.id.in_(show_ids)))]
+    if entries:
+        connection.execute(insert(UpcomingShow), entries)
+
+
+def sweep_upcoming_shows(connection, now=None):
+    # Delete the shows that have started, returns how many
+    now = now or datetime.now(timezone.utc)
+    result = connection.execute(delete(UpcomingShow).where(UpcomingShow.start_time <= now))
+    return result.rowcount
+
+
+def rebuild_upcoming_shows(connection, batch_size=5000, now=None):
+    # Refill the whole feed, returns the number of rows
+    now = now or datetime.now(timezone.utc)
+    connection.execute(delete(UpcomingShow))
+    result = connection.execute(_feed_rows(now).execution_options(yield_per=batch_size))
+    count = 0
+    for batch in result.partitions():
+        connection.execute(insert(UpcomingShow), [_feed_entry(row) for row in batch])
+        count += len(batch)
+    return count
+
+
+def _changed(obj, fields):
+    state = inspect(obj)
+    return any(state.attrs[field].history.has_changes() for field in fields)
+
+
+@event.listens_for(Session, "after_flush")
+def _refresh_after_flush(session, flush_context):
+    show_ids = set()
+    venue_ids = set()
+    artist_ids = set()
+
+    # Deleting a venue/artist row also deletes its shows, which are listed here
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Show):
+            show_ids.add(obj.id)
+        elif isinstance(obj, Venue) and obj not in session.new and _changed(obj, _VENUE_FEED_FIELDS):
+            venue_ids.add(obj.id)
+        elif isinstance(obj, Artist) and obj not in session.new and _changed(obj, _ARTIST_FEED_FIELDS):
+            artist_ids.add(obj.id)
+
+    if show_ids or venue_ids or artist_ids:
+        refresh_upcoming_shows(session.connection(), show_ids, venue_ids, artist_ids)
+
+
+@feed_cli.command("sweep", help="Delete the shows that have started from the feed.")
+def sweep_command():
+    with db.engine.begin() as connection:
+        count = sweep_upcoming_shows(connection)
+    click.echo(f"Removed {count} started shows from the feed.")
+
+
+@feed_cli.command("rebuild", help="Rebuild the whole feed from the shows table.")
+def rebuild_command():
+    with db.engine.begin() as connection:
+        count = rebuild_upcoming_shows(connection)
+    click.echo(f"Feed rebuilt with {count} upcoming shows.")
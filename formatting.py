@@ -0,0 +1,77 @@
+import functools
+from datetime import datetime
+
+# ----------------------------------------------------------------------------#
+# Date formatting.
+# ----------------------------------------------------------------------------#
+
+# Used by the "datetime" template filter and by the upcoming shows feed, which
+# stores the formatted start time so the shows page does not run Babel.
+#
+# babel.dates.format_datetime() resolves the locale and the pattern on every
+# call. Here the Locale objects and the parsed patterns are kept for the life
+# of the process, and the formatted strings are memoized in an LRU: a page
+# listing hundreds of shows mostly formats the same start times again.
+#
+# Babel (and its locale data) and dateutil are imported on first use, not
+# when the app starts: the CLI commands and most requests never need them.
+
+# Named formats of the templates
+PATTERNS = {
+    "full": "EEEE MMMM, d, y 'at' h:mma",
+    "medium": "EE MM, dd, y h:mma",
+}
+
+# Named formats that Babel takes from the locale data
+LOCALE_FORMATS = ("long", "short")
+
+# Formatted strings kept in the LRU
+CACHE_SIZE = 4096
+
+
+@functools.lru_cache(maxsize=None)
+def _locale(identifier):
+    from babel import Locale
+
+    return Locale.parse(identifier)
+
+
+@functools.lru_cache(maxsize=None)
+def _pattern(format):
+    import babel.dates
+
+    return babel.dates.parse_pattern(PATTERNS.get(format, format))
+
+
+def _to_datetime(value):
+    # Handle strings (For example: "2025-08-19T20:00:00") and datetime objects from SQLAlchemy
+    if isinstance(value, datetime):
+        return value
+    # ISO strings are parsed by the standard library, anything else by dateutil
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        import dateutil.parser
+
+        return dateutil.parser.parse(value)
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def _format(date, utcoffset, format, locale):
+    # utcoffset is only part of the cache key: the same instant in two time
+    # zones compares equal but is not displayed the same
+    import babel.dates
+
+    if format in LOCALE_FORMATS:
+        return babel.dates.format_datetime(date, format, locale=_locale(locale))
+    # Naive datetimes are taken as UTC, like babel.dates.format_datetime() does
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=babel.dates.UTC)
+    return _pattern(format).apply(date, _locale(locale))
+
+
+def format_datetime(value, format="medium", locale="en"):
+    # Render datetime as a human-readable string using Babel
+    # Babel handles localization (e.g. language-specific month/day names, time formatting)
+    date = _to_datetime(value)
+    return _format(date, date.utcoffset(), format, locale)
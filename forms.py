@@ -9,7 +9,8 @@ def venue_exists(form, field):
     venue_id = field.data
     venue = Venue.query.filter_by(id=venue_id).first()
     
-    if not venue or venue.deleted_at is not None:
+    # Deleted venues are not found (see models.py)
+    if not venue:
         raise ValidationError("Invalid Venue ID: This venue does not exist.")
 
 # Validator to check if artist exists
@@ -17,7 +18,8 @@ def artist_exists(form, field):
     artist_id = field.data
     artist = Artist.query.filter_by(id=artist_id).first()
     
-    if not artist or artist.deleted_at is not None:
+    # Deleted artists are not found (see models.py)
+    if not artist:
         raise ValidationError("Invalid Artist ID: This artist does not exist.")
 
 class ShowForm(FlaskForm):
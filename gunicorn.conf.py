@@ -0,0 +1,51 @@
+import multiprocessing
+import os
+
+# ----------------------------------------------------------------------------#
+# gunicorn settings (read from the working directory by "gunicorn").
+# ----------------------------------------------------------------------------#
+
+# All of them can be overridden from the environment:
+#
+# - WEB_CONCURRENCY worker processes, by default 2 per core plus one,
+# - WORKER_CLASS "gthread" (THREADS threads per worker) or "gevent" for the
+#   cooperative mode (see cooperative.py),
+# - the workers are recycled after MAX_REQUESTS requests (with jitter, so
+#   they don't all restart together) or when their own memory (not counting
+#   the pages shared with the master) grows over MAX_WORKER_RSS_MB.
+
+wsgi_app = "wsgi:application"
+bind = os.environ.get("BIND", f"0.0.0.0:{os.environ.get('PORT', '8000')}")
+
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+worker_class = os.environ.get("WORKER_CLASS", "gthread")
+threads = int(os.environ.get("THREADS", 4))
+worker_connections = int(os.environ.get("COOPERATIVE_MAX_CONNECTIONS", 1000))
+
+# Load the app in the master before forking, see wsgi.py
+preload_app = True
+
+max_requests = int(os.environ.get("MAX_REQUESTS", 5000))
+max_requests_jitter = max_requests // 10
+max_worker_rss_mb = int(os.environ.get("MAX_WORKER_RSS_MB", 512))
+
+timeout = int(os.environ.get("WORKER_TIMEOUT", 30))
+graceful_timeout = 30
+keepalive = 5
+accesslog = os.environ.get("ACCESS_LOG", "-")
+
+if worker_class == "gevent":
+    # The preloaded app must already see the patched standard library
+    from cooperative import patch
+
+    patch()
+
+
+def post_request(worker, req, environ, resp):
+    from wsgi import private_memory_mb
+
+    # Checked every 10 requests
+    if max_worker_rss_mb and worker.nr % 10 == 0 and private_memory_mb() > max_worker_rss_mb:
+        # Finish the requests in progress, then the master starts a new worker
+        worker.log.info("Worker %s uses over %s MB, recycling it", worker.pid, max_worker_rss_mb)
+        worker.alive = False
@@ -0,0 +1,398 @@
+import csv
+import itertools
+import json
+import os
+import re
+import time
+import click
+from flask.cli import AppGroup
+from sqlalchemy import insert, tuple_
+from werkzeug.datastructures import MultiDict
+from wtforms import DateTimeField, StringField
+from wtforms.validators import DataRequired
+from database import db, dialect_insert
+from feed import refresh_upcoming_shows
+from forms import ArtistForm, ShowForm, VenueForm
+from models import (
+    Artist,
+    ArtistLink,
+    GenreArtist,
+    GenreVenue,
+    Link,
+    Location,
+    PostalCode,
+    Show,
+    Venue,
+    VenueLink,
+)
+from resolvers import link_type_name_for, resolve_genre_ids, resolve_link_type_ids
+from show_counters import refresh_show_counters
+
+# ----------------------------------------------------------------------------#
+# Bulk import.
+# ----------------------------------------------------------------------------#
+
+# flask import venues|artists|shows FILE
+#
+# Loads whole line-ups from CSV or JSONL files (one object per line) with the
+# same columns as the forms. The file is streamed in chunks; every chunk is
+# validated with the form rules, its postal codes, locations, genres and link
+# types are resolved with one INSERT ... ON CONFLICT DO NOTHING + one SELECT
+# each, the rows go in with executemany, and the chunk is committed.
+#
+# Rows failing validation are written to FILE.rejects.jsonl with their errors.
+# After every commit the number of rows done is saved to FILE.checkpoint, so
+# running the same command again after a crash continues where it stopped.
+# Venues and shows are skipped if they already exist (unique constraints),
+# which also makes replaying the last chunk harmless; artists have no natural
+# key and rely on the checkpoint only.
+
+import_cli = AppGroup("import", help="Bulk import venues, artists and shows from CSV or JSONL files.")
+
+_TRUE_VALUES = {"1", "true", "t", "yes", "y", "on"}
+_BOOLEAN_FIELDS = ("seeking_talent", "seeking_venue")
+
+
+class ShowImportForm(ShowForm):
+    # ShowForm checks that the artist and the venue exist with one query per
+    # row, that is done per chunk in _check_show_owners() instead
+    artist_id = StringField("artist_id", validators=[DataRequired()])
+    venue_id = StringField("venue_id", validators=[DataRequired()])
+    # No default: a row without start_time is an error, not a show today
+    start_time = DateTimeField("start_time", validators=[DataRequired()])
+
+
+def _read_rows(path, file_format):
+    # Yields dicts, or the raw line for JSONL lines that can't be parsed
+    with open(path, newline="", encoding="utf-8") as source:
+        if file_format == "csv":
+            yield from csv.DictReader(source)
+            return
+        for line in source:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield line.rstrip("\n")
+
+
+def _formdata(row):
+    # Turn a CSV/JSONL record into what the browser would have posted
+    items = []
+    for key, value in row.items():
+        if value is None:
+            continue
+        if key == "genres":
+            # "Jazz;Blues" or "Jazz,Blues" in CSV, a list in JSONL
+            if isinstance(value, str):
+                value = [genre.strip() for genre in re.split(r"[;,]", value)]
+            items += [("genres", genre) for genre in value if genre]
+        elif key in _BOOLEAN_FIELDS:
+            # Unchecked checkboxes are not posted at all
+            if value is True or str(value).strip().lower() in _TRUE_VALUES:
+                items.append((key, "y"))
+        else:
+            items.append((key, str(value)))
+    return MultiDict(items)
+
+
+def _validate(form_class, chunk):
+    valid = []
+    rejected = []
+    for number, row in chunk:
+        if not isinstance(row, dict):
+            rejected.append((number, row, {"row": ["Not a valid JSON object."]}))
+            continue
+        form = form_class(formdata=_formdata(row), meta={"csrf": False})
+        if form.validate():
+            valid.append((number, row, form.data))
+        else:
+            rejected.append((number, row, form.errors))
+    return valid, rejected
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _check_show_owners(valid, rejected):
+    # Same rule as the artist_exists/venue_exists validators of ShowForm,
+    # with two queries for the whole chunk
+    artist_ids = {_to_int(data["artist_id"]) for _, _, data in valid} - {None}
+    venue_ids = {_to_int(data["venue_id"]) for _, _, data in valid} - {None}
+    artists = {
+        row[0] for row in db.session.query(Artist.id).filter(Artist.id.in_(artist_ids))
+    }
+    venues = {
+        row[0] for row in db.session.query(Venue.id).filter(Venue.id.in_(venue_ids))
+    }
+
+    kept = []
+    for number, row, data in valid:
+        errors = {}
+        if _to_int(data["artist_id"]) not in artists:
+            errors["artist_id"] = ["Invalid Artist ID: This artist does not exist."]
+        if _to_int(data["venue_id"]) not in venues:
+            errors["venue_id"] = ["Invalid Venue ID: This venue does not exist."]
+        if errors:
+            rejected.append((number, row, errors))
+        else:
+            kept.append((number, row, data))
+    valid[:] = kept
+
+
+def _upsert_keys(model, columns, keys):
+    # Create the missing rows for the given (column, column) keys and return
+    # key -> id for all of them
+    keys = list(keys)
+    if not keys:
+        return {}
+    statement = dialect_insert(model).on_conflict_do_nothing(index_elements=list(columns))
+    db.session.execute(statement, [dict(zip(columns, key)) for key in keys])
+
+    key_columns = [getattr(model, column) for column in columns]
+    rows = db.session.query(model.id, *key_columns).filter(tuple_(*key_columns).in_(keys))
+    return {tuple(row[1:]): row[0] for row in rows}
+
+
+def _attach_genres(association, owner_key, owners):
+    genre_ids = resolve_genre_ids([genre for _, data in owners for genre in data["genres"]])
+    rows = [
+        {owner_key: owner_id, "genre_id": genre_ids[genre]}
+        for owner_id, data in owners
+        for genre in dict.fromkeys(data["genres"])
+    ]
+    if rows:
+        db.session.execute(association.__table__.insert(), rows)
+
+
+def _attach_links(association, owner_key, owners):
+    linked = [(owner_id, data["social_link"]) for owner_id, data in owners if data["social_link"]]
+    if not linked:
+        return
+    type_ids = resolve_link_type_ids([link_type_name_for(url) for _, url in linked])
+    link_ids = db.session.execute(
+        insert(Link).returning(Link.id, sort_by_parameter_order=True),
+        [{"url": url, "link_type_id": type_ids[link_type_name_for(url)]} for _, url in linked],
+    ).scalars().all()
+    db.session.execute(
+        association.__table__.insert(),
+        [{owner_key: owner_id, "link_id": link_id} for (owner_id, _), link_id in zip(linked, link_ids)],
+    )
+
+
+def _insert_venues(items):
+    postal_code_ids = _upsert_keys(PostalCode, ("city", "state"), {(data["city"], data["state"]) for data in items})
+    for data in items:
+        data["postal_code_id"] = postal_code_ids[(data["city"], data["state"])]
+    location_ids = _upsert_keys(
+        Location, ("address", "postal_code_id"), {(data["address"], data["postal_code_id"]) for data in items}
+    )
+
+    rows = [
+        {
+            "name": data["name"],
+            "phone": data["phone"],
+            "image_link": data["image_link"],
+            "seeking_talent": data["seeking_talent"],
+            "seeking_description": data["seeking_description"],
+            "location_id": location_ids[(data["address"], data["postal_code_id"])],
+        }
+        for data in items
+    ]
+    if not rows:
+        return 0
+
+    # Venues that already exist (same name at the same location) are skipped
+    statement = (
+        dialect_insert(Venue)
+        .on_conflict_do_nothing(index_elements=["name", "location_id"])
+        .returning(Venue.id, Venue.name, Venue.location_id)
+    )
+    inserted = {(row.name, row.location_id): row.id for row in db.session.execute(statement, rows)}
+
+    # A venue repeated in the chunk is only inserted once
+    owners = []
+    for data, row in zip(items, rows):
+        venue_id = inserted.pop((row["name"], row["location_id"]), None)
+        if venue_id is not None:
+            owners.append((venue_id, data))
+
+    _attach_genres(GenreVenue, "venue_id", owners)
+    _attach_links(VenueLink, "venue_id", owners)
+    return len(owners)
+
+
+def _insert_artists(items):
+    rows = [
+        {
+            "name": data["name"],
+            "image_link": data["image_link"],
+            "seeking_venue": data["seeking_venue"],
+            "seeking_description": data["seeking_description"],
+        }
+        for data in items
+    ]
+    if not rows:
+        return 0
+
+    artist_ids = db.session.execute(
+        insert(Artist).returning(Artist.id, sort_by_parameter_order=True), rows
+    ).scalars().all()
+    owners = list(zip(artist_ids, items))
+
+    _attach_genres(GenreArtist, "artist_id", owners)
+    _attach_links(ArtistLink, "artist_id", owners)
+    return len(owners)
+
+
+def _insert_shows(items):
+    rows = [
+        {
+            "artist_id": int(data["artist_id"]),
+            "venue_id": int(data["venue_id"]),
+            "start_time": data["start_time"],
+        }
+        for data in items
+    ]
+    if not rows:
+        return 0
+
+    # Shows that already exist are skipped
+    statement = (
+        dialect_insert(Show)
+        .on_conflict_do_nothing(index_elements=["artist_id", "venue_id", "start_time"])
+        .returning(Show.id)
+    )
+    show_ids = db.session.execute(statement, rows).scalars().all()
+
+    # Core inserts don't go through the flush that keeps the feed and the
+    # show counters current
+    refresh_upcoming_shows(db.session.connection(), show_ids=show_ids)
+    if show_ids:
+        refresh_show_counters(
+            db.session.connection(),
+            venue_ids={row["venue_id"] for row in rows},
+            artist_ids={row["artist_id"] for row in rows},
+        )
+    return len(show_ids)
+
+
+_IMPORTERS = {
+    "venues": (VenueForm, _insert_venues),
+    "artists": (ArtistForm, _insert_artists),
+    "shows": (ShowImportForm, _insert_shows),
+}
+
+
+def _file_state(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime": stat.st_mtime}
+
+
+def _load_checkpoint(path, kind):
+    try:
+        with open(path + ".checkpoint", encoding="utf-8") as checkpoint:
+            state = json.load(checkpoint)
+    except (OSError, ValueError):
+        return 0
+
+    if state.get("kind") != kind or state.get("file") != _file_state(path):
+        click.echo("Ignoring checkpoint: it belongs to another import or the file has changed.")
+        return 0
+    return state["rows"]
+
+
+def _save_checkpoint(path, kind, rows):
+    # Write and rename so that a crash never leaves a truncated checkpoint
+    tmp_path = path + ".checkpoint.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as checkpoint:
+        json.dump({"kind": kind, "rows": rows, "file": _file_state(path)}, checkpoint)
+    os.replace(tmp_path, path + ".checkpoint")
+
+
+def _run_import(kind, path, file_format, chunk_size, restart):
+    if dialect_insert(Venue) is None:
+        raise click.ClickException("Bulk import needs PostgreSQL or SQLite.")
+
+    form_class, insert_rows = _IMPORTERS[kind]
+    if file_format is None:
+        file_format = "csv" if path.lower().endswith(".csv") else "jsonl"
+
+    done = 0 if restart else _load_checkpoint(path, kind)
+    if done:
+        click.echo(f"Resuming after row {done}.")
+
+    rows = itertools.islice(enumerate(_read_rows(path, file_format), start=1), done, None)
+    read = inserted = existing = rejected = 0
+    started = time.perf_counter()
+
+    rejects_path = path + ".rejects.jsonl"
+    try:
+        with open(rejects_path, "a" if done else "w", encoding="utf-8") as rejects:
+            while True:
+                chunk = list(itertools.islice(rows, chunk_size))
+                if not chunk:
+                    break
+
+                valid, invalid = _validate(form_class, chunk)
+                if kind == "shows":
+                    _check_show_owners(valid, invalid)
+
+                try:
+                    chunk_inserted = insert_rows([data for _, _, data in valid])
+                    db.session.commit()
+                except Exception:
+                    db.session.rollback()
+                    raise
+
+                for number, row, errors in sorted(invalid, key=lambda reject: reject[0]):
+                    rejects.write(json.dumps({"row": number, "data": row, "errors": errors}, default=str) + "\n")
+                rejects.flush()
+
+                done += len(chunk)
+                _save_checkpoint(path, kind, done)
+
+                read += len(chunk)
+                inserted += chunk_inserted
+                existing += len(valid) - chunk_inserted
+                rejected += len(invalid)
+                elapsed = time.perf_counter() - started
+                click.echo(
+                    f"{done} rows: {inserted} inserted, {existing} already there, "
+                    f"{rejected} rejected ({read / elapsed:.0f} rows/s)"
+                )
+    finally:
+        db.session.close()
+
+    # Finished, a new run starts from the beginning
+    if os.path.exists(path + ".checkpoint"):
+        os.remove(path + ".checkpoint")
+
+    elapsed = time.perf_counter() - started
+    click.echo(f"Imported {inserted} {kind} from {read} rows in {elapsed:.1f}s ({read / max(elapsed, 1e-9):.0f} rows/s).")
+    if rejected:
+        click.echo(f"{rejected} rows rejected, see {rejects_path}")
+    else:
+        os.remove(rejects_path)
+
+
+def _import_command(kind):
+    @import_cli.command(kind, help=f"Import {kind} from a CSV or JSONL file.")
+    @click.argument("path", type=click.Path(exists=True, dir_okay=False))
+    @click.option("--format", "file_format", type=click.Choice(["csv", "jsonl"]), help="Default: from the file extension.")
+    @click.option("--chunk-size", default=1000, show_default=True, help="Rows per transaction.")
+    @click.option("--restart", is_flag=True, help="Ignore the checkpoint and start from the first row.")
+    def command(path, file_format, chunk_size, restart):
+        _run_import(kind, path, file_format, chunk_size, restart)
+
+    return command
+
+
+import_venues = _import_command("venues")
+import_artists = _import_command("artists")
+import_shows = _import_command("shows")
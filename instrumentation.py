@@ -0,0 +1,192 @@
+import json
+import logging
+import threading
+import time
+from flask import current_app, g, has_request_context, request
+from flask.signals import before_render_template, signals_available, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# ----------------------------------------------------------------------------#
+# Request instrumentation.
+# ----------------------------------------------------------------------------#
+
+# For every request: number of SQL statements, time spent in the database and
+# in render_template, and the slowest statements. The same statement run
+# N_PLUS_ONE_THRESHOLD times or more in one request is flagged as a likely
+# N+1 (a lazy load in a loop).
+#
+# The numbers go to:
+# - the Server-Timing header (visible in the browser dev tools),
+# - one JSON line per request on the "fyyur.requests" logger (a warning
+#   when an N+1 is flagged),
+# - per-endpoint counters in /metrics.
+
+logger = logging.getLogger("fyyur.requests")
+
+
+class EndpointStats:
+    def __init__(self):
+        self.requests = 0
+        self.seconds = 0.0
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.n_plus_one = 0
+
+
+# Endpoint -> EndpointStats
+endpoint_stats = {}
+_stats_lock = threading.Lock()
+
+
+def _current():
+    # Measurements of the current request, None outside of requests or when
+    # instrumentation is off
+    if not has_request_context():
+        return None
+    return g.get("instrumentation")
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current() is not None:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    _record_statement(conn, statement)
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(context):
+    # A failing statement has no after_cursor_execute: drop its start time,
+    # or the next statements on this connection would be timed from it
+    if context.connection is not None and context.statement is not None:
+        _record_statement(context.connection, context.statement)
+
+
+def _record_statement(conn, statement):
+    started = conn.info.get("query_started")
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    measures = _current()
+    if measures is None:
+        return
+    measures["db_seconds"] += elapsed
+    entry = measures["statements"].setdefault(statement, [0, 0.0])
+    entry[0] += 1
+    entry[1] += elapsed
+    measures["slowest"].append((elapsed, statement))
+
+
+def _template_started(sender, template, context, **extra):
+    measures = _current()
+    if measures is not None:
+        measures["template_started"] = time.perf_counter()
+
+
+def _template_finished(sender, template, context, **extra):
+    measures = _current()
+    if measures is not None and "template_started" in measures:
+        measures["template_seconds"] += time.perf_counter() - measures.pop("template_started")
+
+
+def _start_request():
+    g.instrumentation = {
+        "started": time.perf_counter(),
+        "db_seconds": 0.0,
+        "template_seconds": 0.0,
+        # SQL -> [executions, seconds]
+        "statements": {},
+        "slowest": [],
+    }
+
+
+def _finish_request(response):
+    measures = g.pop("instrumentation", None)
+    if measures is None:
+        return response
+
+    config = current_app.config
+    elapsed = time.perf_counter() - measures["started"]
+    queries = sum(count for count, _ in measures["statements"].values())
+    threshold = config.get("N_PLUS_ONE_THRESHOLD", 5)
+    repeated = [
+        {"statement": statement[:500], "count": count, "ms": round(seconds * 1000, 2)}
+        for statement, (count, seconds) in measures["statements"].items()
+        if threshold and count >= threshold
+    ]
+    slowest = sorted(measures["slowest"], key=lambda item: item[0], reverse=True)
+    slowest = [
+        {"statement": statement[:500], "ms": round(seconds * 1000, 2)}
+        for seconds, statement in slowest[: config.get("SLOWEST_QUERIES_LOGGED", 3)]
+    ]
+
+    endpoint = request.endpoint or "unmatched"
+    with _stats_lock:
+        stats = endpoint_stats.setdefault(endpoint, EndpointStats())
+        stats.requests += 1
+        stats.seconds += elapsed
+        stats.queries += queries
+        stats.db_seconds += measures["db_seconds"]
+        stats.template_seconds += measures["template_seconds"]
+        stats.n_plus_one += 1 if repeated else 0
+
+    if config.get("SERVER_TIMING_HEADER", True):
+        response.headers.add(
+            "Server-Timing",
+            f'db;dur={measures["db_seconds"] * 1000:.2f};desc="{queries} queries", '
+            f'tpl;dur={measures["template_seconds"] * 1000:.2f}, '
+            f"total;dur={elapsed * 1000:.2f}",
+        )
+
+    record = {
+        "method": request.method,
+        "path": request.path,
+        "endpoint": endpoint,
+        "status": response.status_code,
+        "ms": round(elapsed * 1000, 2),
+        "queries": queries,
+        "db_ms": round(measures["db_seconds"] * 1000, 2),
+        "template_ms": round(measures["template_seconds"] * 1000, 2),
+        "slowest": slowest,
+    }
+    if repeated:
+        record["n_plus_one"] = repeated
+        logger.warning(json.dumps(record))
+    else:
+        logger.info(json.dumps(record))
+    return response
+
+
+def init_instrumentation(app):
+    if not app.config.get("INSTRUMENTATION", True):
+        return
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    # The template signals need blinker (in requirements.txt); without it the
+    # template time stays at 0
+    if signals_available:
+        before_render_template.connect(_template_started, app)
+        template_rendered.connect(_template_finished, app)
+
+
+def prometheus_text():
+    with _stats_lock:
+        stats = sorted(endpoint_stats.items())
+
+    lines = []
+    for name, help_text, value in (
+        ("fyyur_http_requests_total", "Requests.", lambda s: s.requests),
+        ("fyyur_http_request_seconds_total", "Time spent in requests.", lambda s: f"{s.seconds:.6f}"),
+        ("fyyur_db_queries_total", "SQL statements run by requests.", lambda s: s.queries),
+        ("fyyur_db_query_seconds_total", "Time spent in SQL statements.", lambda s: f"{s.db_seconds:.6f}"),
+        ("fyyur_template_seconds_total", "Time spent rendering templates.", lambda s: f"{s.template_seconds:.6f}"),
+        ("fyyur_n_plus_one_requests_total", "Requests flagged with an N+1 pattern.", lambda s: s.n_plus_one),
+    ):
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+        lines += [f'{name}{{endpoint="{endpoint}"}} {value(stat)}' for endpoint, stat in stats]
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,56 @@
+"""Add trigram search indexes
+
+Revision ID: 7f3a9c2d41b6
+Revises: d809cff94cc8
+Create Date: 2026-10-17 10:12:40.118522
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7f3a9c2d41b6'
+down_revision = 'd809cff94cc8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # pg_trgm lets GIN indexes serve ILIKE '%term%', which a btree index
+    # such as ix_venue_name or ix_artist_name cannot.
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+    with op.batch_alter_table('venues', schema=None) as batch_op:
+        batch_op.create_index('ix_venue_name_trgm', ['name'], unique=False, postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+
+    with op.batch_alter_table('artists', schema=None) as batch_op:
+        batch_op.create_index('ix_artist_name_trgm', ['name'], unique=False, postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+
+    with op.batch_alter_table('genres', schema=None) as batch_op:
+        batch_op.create_index('ix_genre_name_trgm', ['genre_name'], unique=False, postgresql_using='gin', postgresql_ops={'genre_name': 'gin_trgm_ops'})
+
+    with op.batch_alter_table('postal_codes', schema=None) as batch_op:
+        batch_op.create_index('ix_postal_code_city_trgm', ['city'], unique=False, postgresql_using='gin', postgresql_ops={'city': 'gin_trgm_ops'})
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    with op.batch_alter_table('postal_codes', schema=None) as batch_op:
+        batch_op.drop_index('ix_postal_code_city_trgm', postgresql_using='gin')
+
+    with op.batch_alter_table('genres', schema=None) as batch_op:
+        batch_op.drop_index('ix_genre_name_trgm', postgresql_using='gin')
+
+    with op.batch_alter_table('artists', schema=None) as batch_op:
+        batch_op.drop_index('ix_artist_name_trgm', postgresql_using='gin')
+
+    with op.batch_alter_table('venues', schema=None) as batch_op:
+        batch_op.drop_index('ix_venue_name_trgm', postgresql_using='gin')
+
+    # The extension is left installed, other objects may depend on it
@@ -1,5 +1,12 @@
+from sqlalchemy import event
+from sqlalchemy.orm import Session, with_loader_criteria
 from database import db
 
+# Venues, artists and shows are soft-deleted: deleting one sets deleted_at.
+# Their indexes that serve the pages only cover the active rows, so that
+# their size does not grow with the deleted ones.
+ACTIVE = db.text("deleted_at IS NULL")
+
 # ----------------------------------------------------------------------------#
 # Models.
 # ----------------------------------------------------------------------------#
@@ -17,6 +24,10 @@ class Venue(db.Model):
     location_id = db.Column(db.Integer, db.ForeignKey("locations.id"), nullable=False)
     created_at = db.Column(db.DateTime(timezone=True), server_default=db.func.now())
     updated_at = db.Column(db.DateTime(timezone=True), onupdate=db.func.now())
+    # Show counters, maintained by show_counters.py
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    next_show_at = db.Column(db.DateTime(timezone=True), nullable=True)
     shows = db.relationship("Show", back_populates="venue", cascade="all, delete-orphan")
     location = db.relationship("Location", backref="venues")
     venue_links = db.relationship(
@@ -29,8 +40,24 @@ class Venue(db.Model):
 	)
 
     __table_args__ = (
-        db.Index("ix_venue_name", "name"),
+        # Partial indexes over the active rows (see ACTIVE)
+        db.Index("ix_venue_name", "name", postgresql_where=ACTIVE, sqlite_where=ACTIVE),
+        # Trigram index for the search engine (PostgreSQL + pg_trgm)
+        db.Index(
+            "ix_venue_name_trgm",
+            "name",
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+            postgresql_where=ACTIVE,
+        ),
         db.UniqueConstraint("name", "location_id", name="uq_name_locationid"),
+        # Venues of an area, in directory order (see queries.py)
+        db.Index("ix_venue_location_id", "location_id", "name", "id", postgresql_where=ACTIVE, sqlite_where=ACTIVE),
+        # Venues whose next show has started (see show_counters.py)
+        db.Index("ix_venue_next_show_at", "next_show_at"),
+        # Last change of the table, for conditional GET (see queries.py)
+        db.Index("ix_venue_updated_at", "updated_at"),
+        db.Index("ix_venue_created_at", "created_at"),
     )
 
     def __repr__(self):
@@ -48,6 +75,10 @@ class Artist(db.Model):
     updated_at = db.Column(db.DateTime(timezone=True), onupdate=db.func.now())
     seeking_venue = db.Column(db.Boolean, nullable=False, default=False)
     seeking_description = db.Column(db.String())
+    # Show counters, maintained by show_counters.py
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    next_show_at = db.Column(db.DateTime(timezone=True), nullable=True)
     shows = db.relationship("Show", back_populates="artist", cascade="all, delete-orphan")
     artist_links = db.relationship(
         "ArtistLink", back_populates="artist", cascade="all, delete-orphan"
@@ -58,7 +89,23 @@ class Artist(db.Model):
         back_populates="artists",
 	)
 
-    __table_args__ = (db.Index("ix_artist_name", "name"),)
+    __table_args__ = (
+        # Partial indexes over the active rows (see ACTIVE)
+        db.Index("ix_artist_name", "name", "id", postgresql_where=ACTIVE, sqlite_where=ACTIVE),
+        # Trigram index for the search engine (PostgreSQL + pg_trgm)
+        db.Index(
+            "ix_artist_name_trgm",
+            "name",
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+            postgresql_where=ACTIVE,
+        ),
+        # Artists whose next show has started (see show_counters.py)
+        db.Index("ix_artist_next_show_at", "next_show_at"),
+        # Last change of the table, for conditional GET (see queries.py)
+        db.Index("ix_artist_updated_at", "updated_at"),
+        db.Index("ix_artist_created_at", "created_at"),
+    )
 
     def __repr__(self):
         return f"<Artist id={self.id} name={self.name!r}>"
@@ -85,15 +132,48 @@ class Show(db.Model):
         db.UniqueConstraint(
             "artist_id", "venue_id", "start_time", name="uq_artistid_venueid_starttime"
         ),
-        db.Index("ix_show_start_time", "start_time"),
+        db.Index("ix_show_start_time", "start_time", "id", postgresql_where=ACTIVE, sqlite_where=ACTIVE),
+        # Full indexes: the foreign keys are checked against every row
         db.Index("ix_show_artist_id", "artist_id"),
         db.Index("ix_show_venue_id", "venue_id"),
+        # Upcoming/past sections of the venue and artist pages
+        db.Index("ix_show_venue_id_start_time", "venue_id", "start_time", postgresql_where=ACTIVE, sqlite_where=ACTIVE),
+        db.Index("ix_show_artist_id_start_time", "artist_id", "start_time", postgresql_where=ACTIVE, sqlite_where=ACTIVE),
+        # Last change of the table, for conditional GET (see queries.py)
+        db.Index("ix_show_updated_at", "updated_at"),
+        db.Index("ix_show_created_at", "created_at"),
     )
 
     def __repr__(self):
         return f"<Show id={self.id} artist_id={self.artist_id} venue_id={self.venue_id} start_time={self.start_time}>"
 
 
+class UpcomingShow(db.Model):
+    # Denormalized feed of the shows page: one row per upcoming show with the
+    # venue/artist fields and the formatted start time. Maintained by feed.py.
+    __tablename__ = "upcoming_shows"
+
+    show_id = db.Column(
+        db.Integer, db.ForeignKey("shows.id", ondelete="CASCADE"), primary_key=True
+    )
+    start_time = db.Column(db.DateTime(timezone=True), nullable=False)
+    start_time_text = db.Column(db.String(120), nullable=False)
+    venue_id = db.Column(db.Integer, nullable=False)
+    venue_name = db.Column(db.String, nullable=False)
+    artist_id = db.Column(db.Integer, nullable=False)
+    artist_name = db.Column(db.String, nullable=False)
+    artist_image_link = db.Column(db.String(500))
+    refreshed_at = db.Column(db.DateTime(timezone=True), server_default=db.func.now())
+
+    __table_args__ = (
+        # Sort key of the shows page
+        db.Index("ix_upcoming_show_start_time", "start_time", "show_id"),
+    )
+
+    def __repr__(self):
+        return f"<UpcomingShow show_id={self.show_id} start_time={self.start_time}>"
+
+
 class Location(db.Model):
     __tablename__ = "locations"
 
@@ -108,6 +188,10 @@ class Location(db.Model):
         db.UniqueConstraint(
             "address", "postal_code_id", name="uq_address_postalcodeid"
         ),
+        db.Index("ix_location_postal_code_id", "postal_code_id"),
+        # Last change of the table, for conditional GET (see queries.py)
+        db.Index("ix_location_updated_at", "updated_at"),
+        db.Index("ix_location_created_at", "created_at"),
     )
 
 
@@ -124,6 +208,14 @@ class PostalCode(db.Model):
 
     __table_args__ = (
         db.UniqueConstraint("city", "state", name="uq_city_state"),
+        # Areas in venue directory order (see queries.py)
+        db.Index("ix_postal_code_state_city", "state", "city"),
+        db.Index(
+            "ix_postal_code_city_trgm",
+            "city",
+            postgresql_using="gin",
+            postgresql_ops={"city": "gin_trgm_ops"},
+        ),
     )
 
 
@@ -143,6 +235,15 @@ class Genre(db.Model):
         back_populates="genres"
 	)
 
+    __table_args__ = (
+        db.Index(
+            "ix_genre_name_trgm",
+            "genre_name",
+            postgresql_using="gin",
+            postgresql_ops={"genre_name": "gin_trgm_ops"},
+        ),
+    )
+
 
 class GenreArtist(db.Model):
     __tablename__ = "genres_artists"
@@ -217,6 +318,7 @@ class VenueLink(db.Model):
             "venue_id",
             unique=True,
             postgresql_where=(db.text("is_primary = true")),
+            sqlite_where=(db.text("is_primary = 1")),
         ),
     )
 
@@ -243,5 +345,38 @@ class ArtistLink(db.Model):
             "artist_id",
             unique=True,
             postgresql_where=(db.text("is_primary = true")),
+            sqlite_where=(db.text("is_primary = 1")),
         ),
-    )
\ No newline at end of file
+    )
+
+
+# ----------------------------------------------------------------------------#
+# Soft deletes.
+# ----------------------------------------------------------------------------#
+
+# Every ORM SELECT of a session skips the soft-deleted venues, artists and
+# shows, wherever they appear in it: selected, joined or in a subquery. A show
+# whose venue or artist is deleted is therefore hidden from the queries that
+# join them. The queries that need the deleted rows (the export, the typeahead
+# sync, the last modification times) opt out with
+# execution_options(include_deleted=True). Core statements executed on a
+# connection are not affected.
+
+SOFT_DELETED_MODELS = (Venue, Artist, Show)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _skip_soft_deleted(execute_state):
+    if (
+        execute_state.is_select
+        # Refreshes and lazy loads of the objects already loaded
+        and not execute_state.is_column_load
+        and not execute_state.is_relationship_load
+        and not execute_state.execution_options.get("include_deleted", False)
+    ):
+        execute_state.statement = execute_state.statement.options(
+            *[
+                with_loader_criteria(model, lambda cls: cls.deleted_at.is_(None), include_aliases=True)
+                for model in SOFT_DELETED_MODELS
+            ]
+        )
@@ -0,0 +1,178 @@
+import base64
+import binascii
+import json
+import operator
+from datetime import datetime
+from flask import current_app, request, url_for
+from sqlalchemy import and_, or_
+
+# ----------------------------------------------------------------------------#
+# Keyset (cursor) pagination.
+# ----------------------------------------------------------------------------#
+
+# Instead of OFFSET (which makes the database walk and throw away every row
+# of the previous pages) we remember the sort key of the first/last row of the
+# current page and ask for the rows strictly after/before it. With an index on
+# the leading sort column, page N costs the same as page 1.
+
+
+class Page:
+    def __init__(self, items, per_page, next_cursor=None, prev_cursor=None, cursor_prefix=""):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        # Prefix of the query string arguments holding the cursors, for pages
+        # with more than one paginated section
+        self.cursor_prefix = cursor_prefix
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def encode_cursor(values):
+    # Datetimes are not JSON serializable, so store them as ISO strings
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    token = base64.urlsafe_b64encode(json.dumps(payload).encode("utf-8"))
+    return token.decode("ascii").rstrip("=")
+
+
+def decode_cursor(token, columns):
+    # Restore the padding removed in encode_cursor()
+    token += "=" * (-len(token) % 4)
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+    except (binascii.Error, UnicodeError, ValueError):
+        raise ValueError("Malformed cursor")
+
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise ValueError("Cursor does not match the sort key")
+
+    # Every value must have the type of its column (the sort keys are not
+    # nullable), otherwise it would only fail once bound to the query.
+    # ISO strings are turned back into datetimes for DateTime columns.
+    for i, column in enumerate(columns):
+        python_type = column.type.python_type
+        if python_type is datetime:
+            if not isinstance(values[i], str):
+                raise ValueError("Cursor does not match the sort key")
+            values[i] = datetime.fromisoformat(values[i])
+        elif type(values[i]) is not python_type:
+            raise ValueError("Cursor does not match the sort key")
+
+    return values
+
+
+def keyset_filter(columns, values, backwards=False):
+    # Lexicographic comparison (c1, c2, ...) > (v1, v2, ...) expanded as
+    # c1 > v1 OR (c1 = v1 AND (c2 > v2 OR ...)).
+    compare = operator.lt if backwards else operator.gt
+    clause = compare(columns[-1], values[-1])
+    for column, value in zip(reversed(columns[:-1]), reversed(values[:-1])):
+        clause = or_(compare(column, value), and_(column == value, clause))
+
+    # The redundant bound on the leading column is what lets the planner use
+    # the single-column index (ix_venue_name, ix_show_start_time, ...) as a
+    # range scan instead of evaluating the OR chain on every row.
+    if backwards:
+        bound = columns[0] <= values[0]
+    else:
+        bound = columns[0] >= values[0]
+
+    return and_(bound, clause)
+
+
+def page_args(cursor_prefix=""):
+    # Query arguments holding the cursors of a paginated section
+    return (cursor_prefix + "after", cursor_prefix + "before")
+
+
+def get_per_page(per_page=None):
+    default = current_app.config.get("PAGE_SIZE", 20)
+    maximum = current_app.config.get("MAX_PAGE_SIZE", 100)
+
+    if per_page is None:
+        per_page = request.args.get("per_page", default, type=int)
+
+    # Keep the page size bounded whatever the client asks for
+    return max(1, min(per_page, maximum))
+
+
+def _row_key(row, columns):
+    return [getattr(row, column.key) for column in columns]
+
+
+def paginate(query, columns, after=None, before=None, per_page=None, descending=False, cursor_prefix=""):
+    # Read the cursors from the query string unless given explicitly
+    if after is None and before is None:
+        after = request.args.get(cursor_prefix + "after")
+        before = request.args.get(cursor_prefix + "before")
+
+    per_page = get_per_page(per_page)
+    backwards = bool(before) and not after
+    cursor = before if backwards else after
+
+    values = None
+    if cursor:
+        try:
+            values = decode_cursor(cursor, columns)
+        except ValueError:
+            # A stale or tampered cursor just falls back to the first page
+            backwards = False
+
+    # Walking a descending listing forwards means going down the sort key
+    reverse = backwards != descending
+
+    if values is not None:
+        query = query.filter(keyset_filter(columns, values, reverse))
+
+    if reverse:
+        query = query.order_by(*[column.desc() for column in columns])
+    else:
+        query = query.order_by(*[column.asc() for column in columns])
+
+    # Fetch one extra row to know if there is another page in this direction
+    rows = query.limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    if backwards:
+        rows.reverse()
+
+    next_cursor = None
+    prev_cursor = None
+    if rows:
+        if has_more or backwards:
+            next_cursor = encode_cursor(_row_key(rows[-1], columns))
+        if (has_more and backwards) or (values is not None and not backwards):
+            prev_cursor = encode_cursor(_row_key(rows[0], columns))
+
+    return Page(
+        rows,
+        per_page,
+        next_cursor=next_cursor,
+        prev_cursor=prev_cursor,
+        cursor_prefix=cursor_prefix,
+    )
+
+
+def page_url(cursor_prefix="", **cursor):
+    # Build a link to the current page keeping its other query arguments
+    # (page size, filters, cursors of other sections) and replacing only
+    # the cursor of this listing.
+    args = request.args.to_dict()
+    args.pop(cursor_prefix + "after", None)
+    args.pop(cursor_prefix + "before", None)
+    args.update({cursor_prefix + key: value for key, value in cursor.items() if value})
+    return url_for(request.endpoint, **(request.view_args or {}), **args)
@@ -0,0 +1,205 @@
+import threading
+import time
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import NullPool, QueuePool
+
+# ----------------------------------------------------------------------------#
+# Engine options and connection pool metrics.
+# ----------------------------------------------------------------------------#
+
+# The engine options come from the DATABASE_* settings of config.py, which
+# are read from the environment. Two modes:
+#
+# - Default: a QueuePool per process with bounded size and overflow,
+#   pre-ping and recycling, and a server-side statement timeout.
+# - DATABASE_EXTERNAL_POOLER: PgBouncer (or similar) in transaction mode does
+#   the pooling. The app opens a connection per session (NullPool), avoids
+#   prepared statements, and sets the statement timeout per transaction
+#   because the pooler does not forward startup options.
+#
+# The pool events record how many connections are checked out and the
+# pools time how long requests wait for one; /metrics exposes it.
+
+
+class PoolStats:
+    def __init__(self, name):
+        # Name of the pool in the metrics ("primary", "replica0", ...)
+        self.name = name
+        self.checked_out = 0
+        self.checkouts = 0
+        self.connects = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.wait_max = 0.0
+        self._lock = threading.Lock()
+
+    def record_checkout(self):
+        with self._lock:
+            self.checked_out += 1
+            self.checkouts += 1
+
+    def record_checkin(self):
+        with self._lock:
+            # A connection checked out before the listeners were registered
+            self.checked_out = max(self.checked_out - 1, 0)
+
+    def record_connect(self):
+        with self._lock:
+            self.connects += 1
+
+    def record_wait(self, seconds, timed_out=False):
+        with self._lock:
+            self.wait_seconds += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+
+class _TimedPool:
+    # The pool events have no "checkout started" hook, so the wait is timed
+    # around the public connect() (what Engine.connect() calls); everything
+    # else comes from the events registered in configure_engine
+    stats = None
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except PoolTimeoutError:
+            if self.stats is not None:
+                self.stats.record_wait(time.perf_counter() - started, timed_out=True)
+            raise
+        if self.stats is not None:
+            self.stats.record_wait(time.perf_counter() - started)
+        return connection
+
+    def recreate(self):
+        # engine.dispose() (e.g. after a fork) replaces the pool; the event
+        # listeners carry over, the stats have to as well
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+class TimedQueuePool(_TimedPool, QueuePool):
+    pass
+
+
+class TimedNullPool(_TimedPool, NullPool):
+    pass
+
+
+def engine_options(config, uri=None):
+    # SQLALCHEMY_ENGINE_OPTIONS for the database at uri (default: the main one)
+    url = make_url(uri or config["SQLALCHEMY_DATABASE_URI"])
+    postgres = url.get_backend_name() == "postgresql"
+    timeout = config.get("DATABASE_STATEMENT_TIMEOUT_MS", 0)
+    options = {}
+    connect_args = {}
+
+    if config.get("DATABASE_EXTERNAL_POOLER"):
+        options["poolclass"] = TimedNullPool
+        # psycopg 3 and asyncpg prepare statements on their own, which breaks
+        # with transaction pooling (psycopg2 never does)
+        if url.get_driver_name() == "psycopg":
+            connect_args["prepare_threshold"] = None
+        elif url.get_driver_name() == "asyncpg":
+            connect_args["statement_cache_size"] = 0
+    elif url.get_backend_name() == "sqlite":
+        # Development database: only sized and instrumented (in-memory
+        # databases need their single connection pool)
+        if url.database and url.database != ":memory:":
+            options.update(
+                poolclass=TimedQueuePool,
+                pool_size=config.get("DATABASE_POOL_SIZE", 5),
+                max_overflow=config.get("DATABASE_MAX_OVERFLOW", 5),
+            )
+    else:
+        options.update(
+            poolclass=TimedQueuePool,
+            pool_size=config.get("DATABASE_POOL_SIZE", 5),
+            max_overflow=config.get("DATABASE_MAX_OVERFLOW", 5),
+            pool_timeout=config.get("DATABASE_POOL_TIMEOUT", 10),
+            pool_recycle=config.get("DATABASE_POOL_RECYCLE", 1800),
+            pool_pre_ping=config.get("DATABASE_POOL_PRE_PING", True),
+        )
+        if postgres and timeout:
+            connect_args["options"] = f"-c statement_timeout={int(timeout)}"
+
+    if connect_args:
+        options["connect_args"] = connect_args
+    return options
+
+
+def configure_engine(engine, config, name="primary"):
+    # Things that can't be expressed as engine options. The stats belong to
+    # this engine's pool: two apps in one process (e.g. tests and the CLI)
+    # each count their own connections.
+    stats = PoolStats(name)
+    engine.pool.stats = stats
+
+    # Pool events registered on the engine follow it to the new pool after
+    # engine.dispose()
+    @event.listens_for(engine, "connect")
+    def _count_connect(dbapi_connection, connection_record):
+        stats.record_connect()
+
+    @event.listens_for(engine, "checkout")
+    def _count_checkout(dbapi_connection, connection_record, connection_proxy):
+        stats.record_checkout()
+
+    @event.listens_for(engine, "checkin")
+    def _count_checkin(dbapi_connection, connection_record):
+        stats.record_checkin()
+
+    timeout = config.get("DATABASE_STATEMENT_TIMEOUT_MS", 0)
+    if config.get("DATABASE_EXTERNAL_POOLER") and timeout and engine.dialect.name == "postgresql":
+
+        @event.listens_for(engine, "begin")
+        def _set_statement_timeout(connection):
+            # SET LOCAL only lasts for the transaction, which is all the
+            # pooler guarantees to be on the same server connection
+            connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(timeout)}")
+
+
+def prometheus_text(engines):
+    # Metrics of the pools of the given engines (those of one app)
+    lines = []
+
+    def metric(name, kind, help_text, values):
+        lines.extend([f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"])
+        for pool_name, value in values:
+            lines.append(f'{name}{{pool="{pool_name}"}} {value}')
+
+    pools = [engine.pool for engine in engines if getattr(engine.pool, "stats", None) is not None]
+    stats = [(pool.stats.name, pool.stats) for pool in pools]
+
+    gauges = []
+    for pool in pools:
+        # NullPool has no size, overflow or idle connections
+        if isinstance(pool, QueuePool):
+            # overflow() is negative while the pool is not full yet
+            gauges.append((pool.stats.name, pool.size(), max(pool.overflow(), 0), pool.checkedin()))
+
+    metric("fyyur_db_pool_size", "gauge", "Configured pool size.", [(g[0], g[1]) for g in gauges])
+    metric("fyyur_db_pool_checked_out", "gauge", "Connections in use.", [(n, s.checked_out) for n, s in stats])
+    metric("fyyur_db_pool_overflow", "gauge", "Connections over the pool size.", [(g[0], g[2]) for g in gauges])
+    metric("fyyur_db_pool_idle", "gauge", "Idle connections in the pool.", [(g[0], g[3]) for g in gauges])
+    metric("fyyur_db_pool_checkouts_total", "counter", "Connection checkouts.", [(n, s.checkouts) for n, s in stats])
+    metric("fyyur_db_pool_connects_total", "counter", "New database connections.", [(n, s.connects) for n, s in stats])
+    metric("fyyur_db_pool_timeouts_total", "counter", "Checkouts that timed out.", [(n, s.timeouts) for n, s in stats])
+    metric(
+        "fyyur_db_pool_wait_seconds_total",
+        "counter",
+        "Time spent waiting for a connection.",
+        [(n, f"{s.wait_seconds:.6f}") for n, s in stats],
+    )
+    metric(
+        "fyyur_db_pool_wait_seconds_max",
+        "gauge",
+        "Longest wait for a connection.",
+        [(n, f"{s.wait_max:.6f}") for n, s in stats],
+    )
+    return "\n".join(lines) + "\n"
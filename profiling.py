@@ -0,0 +1,189 @@
+import collections
+import json
+import os
+import random
+import sys
+import threading
+import time
+from flask import current_app, g, request
+from cooperative import is_patched
+
+# ----------------------------------------------------------------------------#
+# Request profiling.
+# ----------------------------------------------------------------------------#
+
+# Opt-in sampling profiler for finding where a slow page spends its time
+# (Flask, SQLAlchemy, Jinja, Babel...). With PROFILING on, a request is
+# profiled when it has an "X-Profile" header or a "_profile" query argument
+# (equal to PROFILING_SECRET when one is set), or at random for a
+# PROFILING_SAMPLE_RATE fraction of the requests. Outside debug mode it stays
+# off unless PROFILING_SECRET is set.
+#
+# A background thread samples the stack of the request thread every
+# PROFILING_INTERVAL_MS, which costs next to nothing in the request itself.
+# Each profile is written to PROFILING_DIR/<endpoint>/ as collapsed stacks
+# (flamegraph.pl, speedscope, inferno...) or speedscope JSON. At most
+# PROFILING_MAX_PER_MINUTE requests are profiled per process, so it is safe
+# to leave on in production.
+
+_recent = collections.deque()
+_recent_lock = threading.Lock()
+
+
+class StackSampler:
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        # Stack (outermost frame first) -> samples
+        self.stacks = collections.Counter()
+        self.started = self.stopped = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.stopped = time.perf_counter()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((getattr(code, "co_qualname", code.co_name), code.co_filename, code.co_firstlineno))
+                frame = frame.f_back
+            if stack:
+                self.stacks[tuple(reversed(stack))] += 1
+
+
+def _short_path(filename):
+    # Path relative to site-packages or to the app, for readable frame names
+    for marker in ("site-packages" + os.sep, "dist-packages" + os.sep):
+        if marker in filename:
+            return filename.split(marker, 1)[1]
+    root = current_app.root_path + os.sep
+    return filename[len(root):] if filename.startswith(root) else filename
+
+
+def _frame_name(frame):
+    function, filename, line = frame
+    return f"{_short_path(filename)}:{function}"
+
+
+def collapsed_stacks(sampler):
+    # "frame;frame;frame count" lines
+    lines = []
+    for stack, count in sampler.stacks.most_common():
+        names = ";".join(_frame_name(frame).replace(";", ",") for frame in stack)
+        lines.append(f"{names} {count}")
+    return "\n".join(lines) + "\n"
+
+
+def speedscope_profile(sampler, name):
+    # Sampled profile of https://www.speedscope.app/file-format-schema.json
+    frames = []
+    index = {}
+    samples = []
+    weights = []
+    interval_ms = sampler.interval * 1000
+    for stack, count in sampler.stacks.items():
+        sample = []
+        for frame in stack:
+            if frame not in index:
+                index[frame] = len(frames)
+                frames.append({"name": frame[0], "file": _short_path(frame[1]), "line": frame[2]})
+            sample.append(index[frame])
+        samples.append(sample)
+        weights.append(count * interval_ms)
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": frames},
+        "profiles": [
+            {
+                "type": "sampled",
+                "name": name,
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights,
+            }
+        ],
+        "name": name,
+        "exporter": "fyyur",
+    }
+
+
+def _requested(config):
+    flag = request.headers.get("X-Profile", request.args.get("_profile"))
+    if flag is not None:
+        secret = config.get("PROFILING_SECRET")
+        return not secret or flag == secret
+    return random.random() < config.get("PROFILING_SAMPLE_RATE", 0)
+
+
+def _allowed(config):
+    # At most PROFILING_MAX_PER_MINUTE profiles per process in any minute
+    now = time.monotonic()
+    with _recent_lock:
+        while _recent and _recent[0] < now - 60:
+            _recent.popleft()
+        if len(_recent) >= config.get("PROFILING_MAX_PER_MINUTE", 6):
+            return False
+        _recent.append(now)
+        return True
+
+
+def _start_profile():
+    config = current_app.config
+    if _requested(config) and _allowed(config):
+        interval = config.get("PROFILING_INTERVAL_MS", 5) / 1000
+        g.profiler = StackSampler(threading.get_ident(), interval)
+        g.profiler.start()
+
+
+def _write_profile(exception=None):
+    sampler = g.pop("profiler", None)
+    if sampler is None:
+        return
+    sampler.stop()
+
+    config = current_app.config
+    endpoint = request.endpoint or "unmatched"
+    elapsed_ms = (sampler.stopped - sampler.started) * 1000
+    name = f"{request.method} {request.full_path.rstrip('?')}"
+    directory = os.path.join(config.get("PROFILING_DIR", "profiles"), endpoint)
+    os.makedirs(directory, exist_ok=True)
+    stem = f"{time.strftime('%Y%m%dT%H%M%S')}-{elapsed_ms:.0f}ms-{os.getpid()}-{random.getrandbits(24):06x}"
+
+    if config.get("PROFILING_FORMAT", "collapsed") == "speedscope":
+        path = os.path.join(directory, stem + ".speedscope.json")
+        with open(path, "w") as profile:
+            json.dump(speedscope_profile(sampler, name), profile)
+    else:
+        path = os.path.join(directory, stem + ".collapsed")
+        with open(path, "w") as profile:
+            profile.write(collapsed_stacks(sampler))
+    current_app.logger.info("Profile of %s (%.0f ms) written to %s", name, elapsed_ms, path)
+
+
+def init_profiling(app):
+    if not app.config.get("PROFILING"):
+        return
+    if is_patched():
+        # The sampler thread would be a greenlet, never running while the
+        # request does
+        app.logger.warning("Profiling is not available in the cooperative mode.")
+        return
+    if not app.config.get("PROFILING_SECRET") and not app.debug:
+        # Anyone could start the sampler (and fill PROFILING_DIR)
+        app.logger.warning("Profiling needs PROFILING_SECRET outside debug mode, it stays off.")
+        return
+    app.before_request(_start_profile)
+    # Teardown also runs when the view raised
+    app.teardown_request(_write_profile)
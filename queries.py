@@ -0,0 +1,384 @@
+from datetime import datetime, timezone
+from itertools import groupby
+from sqlalchemy import case, func, select
+from database import db
+from models import Venue, Artist, Location, PostalCode, Show, Genre, Link, LinkType, UpcomingShow
+
+# ----------------------------------------------------------------------------#
+# Query layer.
+# ----------------------------------------------------------------------------#
+
+# Read queries shared by the views. They select plain columns instead of
+# ORM objects when the page only needs a handful of fields. The soft-deleted
+# venues, artists and shows are skipped by every query (see models.py).
+
+
+def venue_directory_query(city=None, state=None):
+    # Single joined query venues -> locations -> postal_codes. Rows come back
+    # as lightweight tuples (id, name, postal_code_id, city, state).
+    query = (
+        db.session.query(
+            Venue.id,
+            Venue.name,
+            Location.postal_code_id,
+            PostalCode.city,
+            PostalCode.state,
+        )
+        .join(Location, Venue.location_id == Location.id)
+        .join(PostalCode, Location.postal_code_id == PostalCode.id)
+    )
+
+    # Optional area filter
+    if city:
+        query = query.filter(PostalCode.city == city)
+    if state:
+        query = query.filter(PostalCode.state == state)
+
+    return query
+
+
+# Sort key of the directory. The listing is ordered by it and the keyset
+# pagination cursors are built from it. It spans two tables, so no single
+# index returns the rows in this order: ix_postal_code_state_city gives the
+# areas in order, ix_location_postal_code_id and ix_venue_location_id lead
+# to their venues, and the database only has to sort the venues of each area
+# by name (incremental sort on PostgreSQL) until the page is full.
+VENUE_DIRECTORY_ORDER = [PostalCode.state, PostalCode.city, Venue.name, Venue.id]
+
+
+def area_venue_counts(postal_code_ids):
+    # Number of active venues per area (postal code id -> count), for the
+    # areas of the current page only. It is not affected by the page the
+    # listing is on.
+    if not postal_code_ids:
+        return {}
+    rows = (
+        db.session.query(Location.postal_code_id, func.count(Venue.id))
+        .join(Venue, Venue.location_id == Location.id)
+        .filter(Location.postal_code_id.in_(postal_code_ids))
+        .group_by(Location.postal_code_id)
+    )
+    return dict(rows.all())
+
+
+def group_venues_by_area(rows, venue_counts):
+    # Rows are already ordered by state and city, so consecutive rows of the
+    # same area can be grouped lazily while the template iterates.
+    for (state, city), venues in groupby(rows, key=lambda row: (row.state, row.city)):
+        venues = list(venues)
+        yield {
+            "city": city,
+            "state": state,
+            "venue_count": venue_counts.get(venues[0].postal_code_id, len(venues)),
+            "venues": venues,
+        }
+
+
+def active_shows_query(*columns):
+    # Shows joined to their venue and artist, so that the shows of a deleted
+    # venue/artist are skipped like on the pages. Counted the same way as the
+    # stored counters (see show_counters.py).
+    return (
+        db.session.query(*columns)
+        .select_from(Show)
+        .join(Venue, Show.venue_id == Venue.id)
+        .join(Artist, Show.artist_id == Artist.id)
+    )
+
+
+def upcoming_shows_subquery(show_column, ids, now):
+    # Number of upcoming shows per venue/artist (show_column is Show.venue_id
+    # or Show.artist_id), restricted to the given ids so that it is served by
+    # ix_show_venue_id_start_time / ix_show_artist_id_start_time. The earliest
+    # upcoming start time tells when the count will next change.
+    return (
+        active_shows_query(
+            show_column.label("entity_id"),
+            func.count(Show.id).label("num_upcoming_shows"),
+            func.min(Show.start_time).label("next_show_at"),
+        )
+        .filter(show_column.in_(ids))
+        .filter(Show.start_time > now)
+        .group_by(show_column)
+    )
+
+
+def search_results(model, show_column, ids):
+    # Build the search response rows (id, name, num_upcoming_shows) for the
+    # ranked ids, keeping their order. The counts are the counters stored on
+    # the rows (see show_counters.py); the rows whose next show has started
+    # since they were refreshed are counted in the database instead.
+    if not ids:
+        return []
+
+    now = datetime.now(timezone.utc)
+
+    rows = (
+        db.session.query(
+            model.id,
+            model.name,
+            model.upcoming_shows_count.label("num_upcoming_shows"),
+            model.next_show_at,
+        )
+        .filter(model.id.in_(ids))
+        .all()
+    )
+    stale = {row.id for row in rows if _is_stale(row.next_show_at, now)}
+    counts = {}
+    if stale:
+        counts = {row.entity_id: row.num_upcoming_shows for row in upcoming_shows_subquery(show_column, sorted(stale), now)}
+
+    results = {
+        row.id: {
+            "id": row.id,
+            "name": row.name,
+            "num_upcoming_shows": counts.get(row.id, 0) if row.id in stale else row.num_upcoming_shows,
+        }
+        for row in rows
+    }
+    return [results[entity_id] for entity_id in ids if entity_id in results]
+
+
+# Sort key of the shows listing and of the show sections of the detail pages
+SHOW_ORDER = [Show.start_time, Show.id]
+
+
+def show_listing_query():
+    # Shows with the venue and artist fields the shows listing displays
+    return (
+        db.session.query(
+            Show.id,
+            Show.start_time,
+            Show.venue_id,
+            Venue.name.label("venue_name"),
+            Show.artist_id,
+            Artist.name.label("artist_name"),
+            Artist.image_link.label("artist_image_link"),
+        )
+        .join(Venue, Show.venue_id == Venue.id)
+        .join(Artist, Show.artist_id == Artist.id)
+    )
+
+
+# Sort key of the upcoming shows feed, served by ix_upcoming_show_start_time
+FEED_ORDER = [UpcomingShow.start_time, UpcomingShow.show_id]
+
+
+def upcoming_feed_query(now):
+    # The upcoming_shows feed (see feed.py). Rows of shows that have started
+    # but were not swept yet are skipped.
+    return db.session.query(
+        UpcomingShow.show_id,
+        UpcomingShow.start_time,
+        UpcomingShow.start_time_text,
+        UpcomingShow.venue_id,
+        UpcomingShow.venue_name,
+        UpcomingShow.artist_id,
+        UpcomingShow.artist_name,
+        UpcomingShow.artist_image_link,
+    ).filter(UpcomingShow.start_time > now)
+
+
+def venue_shows_query(venue_id):
+    # Shows of a venue with the artist fields the venue page displays
+    return (
+        db.session.query(
+            Show.id,
+            Show.start_time,
+            Show.artist_id,
+            Artist.name.label("artist_name"),
+            Artist.image_link.label("artist_image_link"),
+        )
+        .join(Artist, Show.artist_id == Artist.id)
+        .filter(Show.venue_id == venue_id)
+    )
+
+
+def artist_shows_query(artist_id):
+    # Shows of an artist with the venue fields the artist page displays
+    return (
+        db.session.query(
+            Show.id,
+            Show.start_time,
+            Show.venue_id,
+            Venue.name.label("venue_name"),
+            Venue.image_link.label("venue_image_link"),
+        )
+        .join(Venue, Show.venue_id == Venue.id)
+        .filter(Show.artist_id == artist_id)
+    )
+
+
+def show_counts(show_column, entity_id, now):
+    # Number of upcoming and past shows of a venue/artist in a single COUNT
+    # query, independent of how many of them the page displays
+    row = (
+        active_shows_query(
+            func.count(case((Show.start_time > now, Show.id))).label("upcoming_shows_count"),
+            func.count(case((Show.start_time <= now, Show.id))).label("past_shows_count"),
+        )
+        .filter(show_column == entity_id)
+        .one()
+    )
+    return row.upcoming_shows_count, row.past_shows_count
+
+
+def stored_show_counts(entity, show_column, now):
+    # Number of upcoming and past shows of a loaded venue/artist: its stored
+    # counters (see show_counters.py), or a COUNT query when one of its shows
+    # has started since they were refreshed
+    if _is_stale(entity.next_show_at, now):
+        return show_counts(show_column, entity.id, now)
+    return entity.upcoming_shows_count, entity.past_shows_count
+
+
+def _is_stale(next_show_at, now):
+    # SQLite returns naive datetimes even for timezone-aware columns
+    if next_show_at is not None and next_show_at.tzinfo is None:
+        next_show_at = next_show_at.replace(tzinfo=timezone.utc)
+    return next_show_at is not None and next_show_at <= now
+
+
+# ----------------------------------------------------------------------------#
+# Related rows of a page of venues/artists, for the JSON API.
+# ----------------------------------------------------------------------------#
+
+# One query per kind of related rows for all the ids of the page, grouped in
+# Python by owner id (owner_column is e.g. GenreVenue.venue_id).
+
+
+def genres_by_owner(owner_column, ids):
+    rows = (
+        db.session.query(owner_column.label("owner_id"), Genre.genre_name)
+        .join(Genre, owner_column.table.c.genre_id == Genre.id)
+        .filter(owner_column.in_(ids))
+        .order_by(owner_column, Genre.genre_name)
+    )
+    genres = {}
+    for row in rows:
+        genres.setdefault(row.owner_id, []).append(row.genre_name)
+    return genres
+
+
+def links_by_owner(owner_column, ids):
+    rows = (
+        db.session.query(
+            owner_column.label("owner_id"),
+            Link.url,
+            LinkType.type_name,
+            owner_column.table.c.is_primary,
+        )
+        .join(Link, owner_column.table.c.link_id == Link.id)
+        .join(LinkType, Link.link_type_id == LinkType.id)
+        .filter(owner_column.in_(ids))
+        .order_by(owner_column, owner_column.table.c.is_primary.desc(), Link.id)
+    )
+    links = {}
+    for row in rows:
+        links.setdefault(row.owner_id, []).append(
+            {"url": row.url, "type": row.type_name, "is_primary": row.is_primary}
+        )
+    return links
+
+
+def upcoming_shows_by_owner(show_column, ids, now):
+    # Upcoming shows of the venues/artists, with both the venue and the artist
+    # fields, served by ix_show_venue_id_start_time / ix_show_artist_id_start_time
+    rows = (
+        show_listing_query()
+        .add_columns(show_column.label("owner_id"))
+        .filter(show_column.in_(ids))
+        .filter(Show.start_time > now)
+        .order_by(show_column, *SHOW_ORDER)
+    )
+    shows = {}
+    for row in rows:
+        show = dict(row._mapping)
+        shows.setdefault(show.pop("owner_id"), []).append(show)
+    return shows
+
+
+# ----------------------------------------------------------------------------#
+# Last modification times, for conditional GET.
+# ----------------------------------------------------------------------------#
+
+# Rows get updated_at only on UPDATE, so new rows fall back to created_at.
+# Soft-deleted rows are included on purpose (include_deleted): deleting sets
+# deleted_at, which bumps updated_at and therefore the last modification time.
+# A show that starts only changes the pages if it is active, which keeps the
+# max(start_time) subqueries on the partial start_time indexes.
+
+
+_ACTIVE_SHOW = Show.deleted_at.is_(None)
+
+
+def _including_deleted(*columns):
+    return db.session.query(*columns).execution_options(include_deleted=True)
+
+
+def _last_change(model):
+    return func.max(func.coalesce(model.updated_at, model.created_at))
+
+
+def _table_last_change(model):
+    # Latest change of a whole table. max() over the coalesce() would scan
+    # the table on every listing request; the two columns are each read from
+    # the end of their index (ix_*_updated_at, ix_*_created_at). updated_at
+    # is never older than created_at, so the result is the same.
+    return (
+        select(func.max(model.updated_at)).scalar_subquery(),
+        select(func.max(model.created_at)).scalar_subquery(),
+    )
+
+
+def venue_directory_last_modified():
+    return _including_deleted(*_table_last_change(Venue), *_table_last_change(Location)).one()
+
+
+def artist_listing_last_modified():
+    return _including_deleted(*_table_last_change(Artist)).one()
+
+
+def show_listing_last_modified(now):
+    return _including_deleted(
+        *_table_last_change(Show),
+        *_table_last_change(Venue),
+        *_table_last_change(Artist),
+        # The feed also changes when a show starts
+        select(func.max(Show.start_time)).where(Show.start_time <= now, _ACTIVE_SHOW).scalar_subquery(),
+    ).one()
+
+
+def venue_page_last_modified(venue_id, now):
+    shows = Show.venue_id == venue_id
+    return _including_deleted(
+        select(_last_change(Venue)).where(Venue.id == venue_id).scalar_subquery(),
+        select(_last_change(Location))
+        .select_from(Venue)
+        .join(Location, Venue.location_id == Location.id)
+        .where(Venue.id == venue_id)
+        .scalar_subquery(),
+        select(_last_change(Show)).where(shows).scalar_subquery(),
+        select(_last_change(Artist))
+        .select_from(Show)
+        .join(Artist, Show.artist_id == Artist.id)
+        .where(shows)
+        .scalar_subquery(),
+        # The page also changes when a show moves from upcoming to past
+        select(func.max(Show.start_time)).where(shows, Show.start_time <= now, _ACTIVE_SHOW).scalar_subquery(),
+    ).one()
+
+
+def artist_page_last_modified(artist_id, now):
+    shows = Show.artist_id == artist_id
+    return _including_deleted(
+        select(_last_change(Artist)).where(Artist.id == artist_id).scalar_subquery(),
+        select(_last_change(Show)).where(shows).scalar_subquery(),
+        select(_last_change(Venue))
+        .select_from(Show)
+        .join(Venue, Show.venue_id == Venue.id)
+        .where(shows)
+        .scalar_subquery(),
+        # The page also changes when a show moves from upcoming to past
+        select(func.max(Show.start_time)).where(shows, Show.start_time <= now, _ACTIVE_SHOW).scalar_subquery(),
+    ).one()
@@ -0,0 +1,99 @@
+import random
+import time
+from flask import current_app, g, has_request_context, request, session
+from flask_sqlalchemy.session import Session as BaseSession
+from sqlalchemy import create_engine, event
+from pool import configure_engine, engine_options
+
+# ----------------------------------------------------------------------------#
+# Read replicas.
+# ----------------------------------------------------------------------------#
+
+# When SQLALCHEMY_REPLICA_URIS is set, the GET/HEAD requests (listings,
+# detail pages, JSON API) and the views marked with @replica_reads (the
+# search forms) read from one of the replicas, picked at random once per
+# request so the page sees a single snapshot. Everything else, and anything
+# flushed, goes to the primary database.
+#
+# Read-your-writes: a request that commits a write (flushed objects or a
+# bulk UPDATE/DELETE/INSERT statement) marks the client (in the
+# signed session cookie) as sticky for READ_YOUR_WRITES_SECONDS, and its
+# reads go to the primary meanwhile. Other clients may see the replication
+# lag, also through the view cache which can keep such a page for up to
+# VIEW_CACHE_TTL seconds.
+
+STICKY_KEY = "db_primary_until"
+
+
+def _replicas():
+    return current_app.extensions.get("fyyur_replicas", ())
+
+
+def replica_reads(view):
+    # Mark a view that only reads although it is not a GET (e.g. a search form)
+    view.replica_reads = True
+    return view
+
+
+def _read_from_replica():
+    if not has_request_context():
+        return False
+    view = current_app.view_functions.get(request.endpoint)
+    if request.method not in ("GET", "HEAD") and not getattr(view, "replica_reads", False):
+        return False
+    if "db_read_from_replica" not in g:
+        g.db_read_from_replica = session.get(STICKY_KEY, 0) < time.time()
+    return g.db_read_from_replica
+
+
+class RoutingSession(BaseSession):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing:
+            replicas = _replicas()
+            if replicas and _read_from_replica():
+                index = self.info.setdefault("replica", random.randrange(len(replicas)))
+                return replicas[index]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _remember_write(db_session, flush_context):
+    db_session.info["wrote"] = True
+
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def _remember_statement_write(execute_state):
+    # Bulk query.update()/delete() and the INSERT statements of the importer
+    # write without flushing
+    if execute_state.is_insert or execute_state.is_update or execute_state.is_delete:
+        execute_state.session.info["wrote"] = True
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _mark_client_sticky(db_session):
+    if db_session.info.pop("wrote", False) and has_request_context():
+        g.db_committed_write = True
+
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _forget_write(db_session):
+    db_session.info.pop("wrote", None)
+
+
+def _stick_to_primary(response):
+    if g.get("db_committed_write"):
+        session[STICKY_KEY] = time.time() + current_app.config.get("READ_YOUR_WRITES_SECONDS", 5)
+    return response
+
+
+def init_replicas(app):
+    # Create the replica engines with the same options as the primary one
+    engines = []
+    for index, uri in enumerate(app.config.get("SQLALCHEMY_REPLICA_URIS") or ()):
+        engine = create_engine(uri, **engine_options(app.config, uri))
+        configure_engine(engine, app.config, name=f"replica{index}")
+        engines.append(engine)
+
+    app.extensions["fyyur_replicas"] = engines
+    if engines:
+        app.after_request(_stick_to_primary)
@@ -0,0 +1,150 @@
+import threading
+from sqlalchemy import event
+from sqlalchemy.orm import Session, make_transient_to_detached
+from database import db, dialect_insert
+from models import Genre, LinkType
+
+# ----------------------------------------------------------------------------#
+# Genre and link type resolution.
+# ----------------------------------------------------------------------------#
+
+# The create/edit handlers turn genre names and link type names into rows,
+# creating the missing ones. Both tables are small and almost never change,
+# so their name -> id mapping is cached for the whole process: a form post
+# with cached names does not query them at all, and the missing names are
+# fetched with one IN query and inserted with one INSERT ... ON CONFLICT DO
+# NOTHING.
+
+
+class NameCache:
+    def __init__(self, model, name_column):
+        self.model = model
+        self.name_column = name_column
+        self._ids = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        return self._ids.get(name)
+
+    def update(self, ids):
+        with self._lock:
+            self._ids.update(ids)
+
+    def clear(self):
+        with self._lock:
+            self._ids.clear()
+
+
+genre_cache = NameCache(Genre, Genre.genre_name)
+link_type_cache = NameCache(LinkType, LinkType.type_name)
+
+
+def _insert_ignoring_conflicts(model, name_column, names):
+    rows = [{name_column.key: name} for name in names]
+
+    statement = dialect_insert(model)
+    if statement is None:
+        # No portable ON CONFLICT, insert only what is not there yet
+        existing = {
+            row[0] for row in db.session.query(name_column).filter(name_column.in_(names))
+        }
+        rows = [row for row in rows if row[name_column.key] not in existing]
+        if rows:
+            db.session.execute(model.__table__.insert(), rows)
+        return
+
+    db.session.execute(statement.values(rows).on_conflict_do_nothing(index_elements=[name_column.key]))
+
+
+def _resolve_ids(cache, names):
+    # name -> id for the given (unique) names
+    ids = {name: cache.get(name) for name in names}
+    missing = [name for name, row_id in ids.items() if row_id is None]
+
+    if missing:
+        # Objects pending in the handler (e.g. the new venue) are not needed
+        # to resolve names, don't flush them half-built
+        with db.session.no_autoflush:
+            found = dict(
+                db.session.query(cache.name_column, cache.model.id).filter(cache.name_column.in_(missing))
+            )
+            to_create = [name for name in missing if name not in found]
+            if to_create:
+                _insert_ignoring_conflicts(cache.model, cache.name_column, to_create)
+                found.update(
+                    db.session.query(cache.name_column, cache.model.id).filter(cache.name_column.in_(to_create))
+                )
+        ids.update(found)
+
+        # Rows created in this transaction only become cacheable on commit
+        pending = db.session.info.setdefault("resolved_names", [])
+        pending.append((cache, found))
+
+    return ids
+
+
+def _resolve(cache, names):
+    # Unique names, in the order they were given
+    names = list(dict.fromkeys(name for name in names if name))
+    ids = _resolve_ids(cache, names)
+
+    # Attach the rows to the session without loading them: reuse the
+    # instance already in the session, or add a persistent one built from
+    # the cached values
+    instances = []
+    for name in names:
+        key = db.session.identity_key(cache.model, ids[name])
+        instance = db.session.identity_map.get(key)
+        if instance is None:
+            instance = cache.model(id=ids[name], **{cache.name_column.key: name})
+            make_transient_to_detached(instance)
+            db.session.add(instance)
+        instances.append(instance)
+    return instances
+
+
+def resolve_genres(names):
+    # Genre rows for the given names, created if needed
+    return _resolve(genre_cache, names)
+
+
+def resolve_link_type(name):
+    # LinkType row for the given name, created if needed
+    return _resolve(link_type_cache, [name])[0]
+
+
+def resolve_genre_ids(names):
+    # Same as resolve_genres() but only the ids, for bulk inserts that don't
+    # go through the ORM
+    return _resolve_ids(genre_cache, list(dict.fromkeys(name for name in names if name)))
+
+
+def resolve_link_type_ids(names):
+    # name -> LinkType id for the given names, created if needed
+    return _resolve_ids(link_type_cache, list(dict.fromkeys(name for name in names if name)))
+
+
+def link_type_name_for(url):
+    # Determine the link type by checking the URL
+    if "instagram.com" in url:
+        return "Instagram"
+    if "tiktok.com" in url:
+        return "TikTok"
+    if "x.com" in url or "twitter.com" in url:
+        return "X"
+    if "facebook.com" in url:
+        return "Facebook"
+    if "youtube.com" in url:
+        return "YouTube"
+    return "Website"
+
+
+@event.listens_for(Session, "after_commit")
+def _cache_on_commit(session):
+    for cache, ids in session.info.pop("resolved_names", ()):
+        cache.update(ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session):
+    session.info.pop("resolved_names", None)
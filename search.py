@@ -0,0 +1,349 @@
+import heapq
+import re
+import threading
+import time
+from bisect import bisect_left
+from datetime import timedelta
+from flask import current_app
+from sqlalchemy import event, func, or_
+from sqlalchemy.orm import Session
+from database import db
+from models import Venue, Artist, Genre, GenreVenue, GenreArtist, Location, PostalCode
+
+# ----------------------------------------------------------------------------#
+# Search engine.
+# ----------------------------------------------------------------------------#
+
+# A search term is split into words. Every word must match the entity, either
+# anywhere in its name (like the previous ILIKE '%term%') or at the start of
+# one of its genres or, for venues, its city.
+#
+# On PostgreSQL the filtering runs in SQL and is served by the pg_trgm GIN
+# indexes (see the "add trigram search indexes" migration), which support
+# ILIKE with a leading wildcard. Other databases (SQLite in test runs) use an
+# in-process inverted index, built on first use. Like the typeahead index, it
+# picks up the rows changed since its last sync (by this process right after
+# the commit, by other processes and the bulk importer at most
+# SEARCH_SYNC_SECONDS later), re-reading SYNC_OVERLAP before its watermark.
+
+# Scores of the in-process index, per matched word
+EXACT_NAME_WORD = 4
+NAME_WORD_PREFIX = 3
+NAME_SUBSTRING = 2
+TAG_PREFIX = 1
+
+SYNC_OVERLAP = timedelta(minutes=1)
+
+
+def tokenize(text):
+    return re.findall(r"\w+", (text or "").lower())
+
+
+def _use_sql_backend():
+    backend = current_app.config.get("SEARCH_BACKEND", "auto")
+    if backend == "auto":
+        return db.engine.dialect.name == "postgresql"
+    return backend == "sql"
+
+
+# Both return the ids of the best `limit` matches, best first. An empty or
+# one letter term matches almost every row, so there is always a limit.
+
+def search_venue_ids(term, limit):
+    if _use_sql_backend():
+        return _sql_search_venues(tokenize(term), term, limit)
+    return _memory_indexes["venues"].search(term, limit, current_app.config.get("SEARCH_SYNC_SECONDS", 5))
+
+
+def search_artist_ids(term, limit):
+    if _use_sql_backend():
+        return _sql_search_artists(tokenize(term), term, limit)
+    return _memory_indexes["artists"].search(term, limit, current_app.config.get("SEARCH_SYNC_SECONDS", 5))
+
+
+# ----------------------------------------------------------------------------#
+# SQL backend (PostgreSQL + pg_trgm).
+# ----------------------------------------------------------------------------#
+
+
+def _sql_search_venues(tokens, term, limit):
+    query = db.session.query(Venue.id)
+
+    for token in tokens:
+        query = query.filter(or_(
+            Venue.name.ilike(f"%{token}%"),
+            Venue.genres.any(Genre.genre_name.ilike(f"{token}%")),
+            Venue.location.has(Location.postal_code.has(PostalCode.city.ilike(f"{token}%"))),
+        ))
+
+    return [row.id for row in _rank(query, Venue, term, limit)]
+
+
+def _sql_search_artists(tokens, term, limit):
+    query = db.session.query(Artist.id)
+
+    for token in tokens:
+        query = query.filter(or_(
+            Artist.name.ilike(f"%{token}%"),
+            Artist.genres.any(Genre.genre_name.ilike(f"{token}%")),
+        ))
+
+    return [row.id for row in _rank(query, Artist, term, limit)]
+
+
+def _rank(query, model, term, limit):
+    # Names starting with the term first, then by trigram similarity
+    term = " ".join(tokenize(term))
+    if term:
+        query = query.order_by(
+            model.name.ilike(f"{term}%").desc(),
+            func.similarity(model.name, term).desc(),
+        )
+    return query.order_by(model.name, model.id).limit(limit).all()
+
+
+# ----------------------------------------------------------------------------#
+# In-process inverted index (fallback).
+# ----------------------------------------------------------------------------#
+
+
+class InvertedIndex:
+    def __init__(self):
+        # word -> set of document ids, for names and for tags (genres, city)
+        self.name_postings = {}
+        self.tag_postings = {}
+        # Sorted vocabularies, for prefix lookups with bisect
+        self.name_words = []
+        self.tag_words = []
+        # document id -> name, used to break ties in the ranking
+        self.names = {}
+        # document id -> (name words, tag words), to remove a document
+        self.words = {}
+
+    def add(self, doc_id, name, tags=()):
+        self.remove(doc_id)
+        self.names[doc_id] = name
+        name_words = set(tokenize(name))
+        tag_words = {word for tag in tags for word in tokenize(tag)}
+        self.words[doc_id] = (name_words, tag_words)
+        for word in name_words:
+            self.name_postings.setdefault(word, set()).add(doc_id)
+        for word in tag_words:
+            self.tag_postings.setdefault(word, set()).add(doc_id)
+
+    def remove(self, doc_id):
+        if doc_id not in self.names:
+            return
+        del self.names[doc_id]
+        name_words, tag_words = self.words.pop(doc_id)
+        for postings, words in ((self.name_postings, name_words), (self.tag_postings, tag_words)):
+            for word in words:
+                postings[word].discard(doc_id)
+                if not postings[word]:
+                    del postings[word]
+
+    def freeze(self):
+        # Sort the vocabularies, after adding or removing documents
+        self.name_words = sorted(self.name_postings)
+        self.tag_words = sorted(self.tag_postings)
+
+    @staticmethod
+    def _prefixed(words, prefix):
+        start = bisect_left(words, prefix)
+        for word in words[start:]:
+            if not word.startswith(prefix):
+                break
+            yield word
+
+    def _scores(self, token):
+        scores = {}
+
+        def bump(doc_ids, score):
+            for doc_id in doc_ids:
+                if scores.get(doc_id, 0) < score:
+                    scores[doc_id] = score
+
+        for word in self._prefixed(self.tag_words, token):
+            bump(self.tag_postings[word], TAG_PREFIX)
+
+        # Substring match over the vocabulary, which is much smaller than the
+        # number of rows. Prefix and exact matches score higher.
+        for word in self.name_words:
+            if token not in word:
+                continue
+            if word == token:
+                score = EXACT_NAME_WORD
+            elif word.startswith(token):
+                score = NAME_WORD_PREFIX
+            else:
+                score = NAME_SUBSTRING
+            bump(self.name_postings[word], score)
+
+        return scores
+
+    def search(self, term, limit):
+        tokens = tokenize(term)
+        if not tokens:
+            return heapq.nsmallest(limit, self.names, key=lambda doc_id: (self.names[doc_id], doc_id))
+
+        totals = None
+        for token in tokens:
+            scores = self._scores(token)
+            if totals is None:
+                totals = scores
+            else:
+                # Every word of the term must match
+                totals = {
+                    doc_id: totals[doc_id] + score
+                    for doc_id, score in scores.items()
+                    if doc_id in totals
+                }
+            if not totals:
+                return []
+
+        # Only the best `limit` matches are sorted
+        return heapq.nsmallest(limit, totals, key=lambda doc_id: (-totals[doc_id], self.names[doc_id], doc_id))
+
+
+def _changed_since(model, since):
+    # Either column, so that each one is served by its index
+    # (ix_*_updated_at, ix_*_created_at)
+    return or_(model.updated_at >= since, model.created_at >= since)
+
+
+def _documents(model, association, owner_column, query, since):
+    # (id, name, tags, deleted, changed_at) of the rows of query, all of them
+    # or the ones changed since `since`. query selects id, name, deleted_at,
+    # changed_at and then the tag columns of the row (e.g. the city). The
+    # deleted rows are read too, to remove them from the index.
+    genres = db.session.query(owner_column, Genre.genre_name).join(Genre, association.genre_id == Genre.id)
+    if since is not None:
+        query = query.filter(_changed_since(model, since))
+        genres = genres.filter(owner_column.in_(db.session.query(model.id).filter(_changed_since(model, since))))
+
+    tags = {}
+    for owner_id, genre_name in genres.execution_options(include_deleted=True):
+        tags.setdefault(owner_id, []).append(genre_name)
+
+    for row in query.execution_options(include_deleted=True):
+        yield (
+            row.id,
+            row.name,
+            tags.get(row.id, []) + list(row[4:]),
+            row.deleted_at is not None,
+            row.changed_at,
+        )
+
+
+def _venue_documents(since=None):
+    query = (
+        db.session.query(
+            Venue.id,
+            Venue.name,
+            Venue.deleted_at,
+            func.coalesce(Venue.updated_at, Venue.created_at).label("changed_at"),
+            PostalCode.city,
+        )
+        .join(Location, Venue.location_id == Location.id)
+        .join(PostalCode, Location.postal_code_id == PostalCode.id)
+    )
+    return _documents(Venue, GenreVenue, GenreVenue.venue_id, query, since)
+
+
+def _artist_documents(since=None):
+    query = db.session.query(
+        Artist.id,
+        Artist.name,
+        Artist.deleted_at,
+        func.coalesce(Artist.updated_at, Artist.created_at).label("changed_at"),
+    )
+    return _documents(Artist, GenreArtist, GenreArtist.artist_id, query, since)
+
+
+class _MemorySearch:
+    def __init__(self, documents):
+        self.documents = documents
+        self.index = None
+        # Latest change already in the index, and when it was read
+        self.watermark = None
+        self.synced = 0.0
+        self.lock = threading.Lock()
+
+    def _apply(self, documents):
+        for doc_id, name, tags, deleted, changed_at in documents:
+            if deleted:
+                self.index.remove(doc_id)
+            else:
+                self.index.add(doc_id, name, tags)
+            if changed_at is not None and (self.watermark is None or changed_at > self.watermark):
+                self.watermark = changed_at
+        self.index.freeze()
+        self.synced = time.monotonic()
+
+    def _build(self):
+        self.index = InvertedIndex()
+        self.watermark = None
+        self._apply(self.documents())
+
+    def _sync(self):
+        # Rows are stamped with the start time of their transaction, so a
+        # slow one can commit rows older than the watermark
+        since = self.watermark - SYNC_OVERLAP if self.watermark is not None else None
+        self._apply(self.documents(since))
+
+    def search(self, term, limit, sync_seconds):
+        with self.lock:
+            if self.index is None:
+                self._build()
+            elif time.monotonic() - self.synced > sync_seconds:
+                self._sync()
+            return self.index.search(term, limit)
+
+    def expire(self):
+        # Sync on next use
+        with self.lock:
+            self.synced = float("-inf")
+
+    def reset(self):
+        # Rebuild on next use
+        with self.lock:
+            self.index = None
+
+
+_memory_indexes = {"venues": _MemorySearch(_venue_documents), "artists": _MemorySearch(_artist_documents)}
+
+
+def invalidate(*kinds):
+    for kind in kinds or list(_memory_indexes):
+        _memory_indexes[kind].reset()
+
+
+# Models whose changes affect each index
+_indexed_models = {
+    "venues": (Venue, Location, PostalCode, Genre, GenreVenue),
+    "artists": (Artist, Genre, GenreArtist),
+}
+
+
+# Changes are collected on flush and the index is synced after the commit,
+# so that a sync in another request never reads rows that could still be
+# rolled back.
+@event.listens_for(Session, "after_flush")
+def _collect_stale_indexes(session, flush_context):
+    changed = list(session.new) + list(session.dirty) + list(session.deleted)
+    stale = session.info.setdefault("stale_search_indexes", set())
+    for kind, models in _indexed_models.items():
+        if any(isinstance(obj, models) for obj in changed):
+            stale.add(kind)
+
+
+@event.listens_for(Session, "after_commit")
+def _sync_on_commit(session):
+    stale = session.info.pop("stale_search_indexes", None)
+    for kind in stale or ():
+        _memory_indexes[kind].expire()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_stale_indexes(session):
+    session.info.pop("stale_search_indexes", None)
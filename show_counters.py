@@ -0,0 +1,159 @@
+from datetime import datetime, timezone
+import click
+from flask.cli import AppGroup
+from sqlalchemy import event, func, inspect, select, update
+from sqlalchemy.orm import Session
+from database import db
+from models import Artist, Show, Venue
+
+# ----------------------------------------------------------------------------#
+# Show counters of the venues and artists.
+# ----------------------------------------------------------------------------#
+
+# Every venue and artist row stores its number of upcoming and past shows and
+# the start time of its next show, which the detail pages and the search
+# results read instead of counting the shows.
+#
+# Like the pages, the counters skip the shows of a deleted venue or artist.
+# The counters of the venues/artists whose shows are touched by a flush (a
+# show created, moved, rescheduled or soft-deleted, or the other owner of
+# the show deleted or restored) are recomputed right after the flush, in the
+# same transaction, from their shows (ix_show_venue_id_start_time and
+# ix_show_artist_id_start_time). The rows are locked first: a concurrent
+# transaction adding a show to the same venue waits, then counts it.
+#
+# The counters are exact until next_show_at, when a show moves from upcoming
+# to past. "flask counters rollover" (run it from cron, e.g. every minute)
+# refreshes those rows; until then the readers count the shows of such a row
+# themselves (see queries.stored_show_counts). "flask counters rebuild"
+# recomputes every row.
+
+counters_cli = AppGroup("counters", help="Maintain the show counters of the venues and artists.")
+
+# Each kind of owner and its column in the shows table
+_OWNERS = ((Venue, Show.venue_id), (Artist, Show.artist_id))
+
+# Show fields the counters depend on
+_SHOW_FIELDS = ("venue_id", "artist_id", "start_time", "deleted_at")
+
+
+def _counter_values(model, show_column, now):
+    # Correlated subqueries over the active shows of each row whose other
+    # owner (the artist of a venue's show, the venue of an artist's) is active
+    other, other_column = next((owner, column) for owner, column in _OWNERS if owner is not model)
+    other_active = select(other.id).where(other.id == other_column, other.deleted_at.is_(None)).exists()
+    shows = (show_column == model.id, Show.deleted_at.is_(None), other_active)
+    return {
+        "upcoming_shows_count": select(func.count(Show.id)).where(*shows, Show.start_time > now).scalar_subquery(),
+        "past_shows_count": select(func.count(Show.id)).where(*shows, Show.start_time <= now).scalar_subquery(),
+        "next_show_at": select(func.min(Show.start_time)).where(*shows, Show.start_time > now).scalar_subquery(),
+        # Not an edit of the venue/artist: keep updated_at (and so the
+        # Last-Modified of its page, the incremental export...) as it is
+        "updated_at": model.updated_at,
+    }
+
+
+def _refresh(connection, model, show_column, ids, now):
+    ids = sorted(ids)
+    # NO KEY UPDATE: does not wait for the transactions that only added shows
+    # (their foreign key holds a KEY SHARE lock on the row)
+    connection.execute(
+        select(model.id).where(model.id.in_(ids)).order_by(model.id).with_for_update(key_share=True)
+    )
+    connection.execute(update(model).where(model.id.in_(ids)).values(**_counter_values(model, show_column, now)))
+
+
+def refresh_show_counters(connection, venue_ids=(), artist_ids=(), now=None):
+    # Recompute the counters of the given venues and artists
+    now = now or datetime.now(timezone.utc)
+    for (model, show_column), ids in zip(_OWNERS, (venue_ids, artist_ids)):
+        if ids:
+            _refresh(connection, model, show_column, set(ids), now)
+
+
+def roll_over_show_counters(connection, batch_size=1000, now=None):
+    # Refresh up to batch_size venues and batch_size artists whose next show
+    # has started, returns how many. Rows locked by a writer are skipped: the
+    # writer refreshes them.
+    now = now or datetime.now(timezone.utc)
+    count = 0
+    for model, show_column in _OWNERS:
+        ids = connection.execute(
+            select(model.id)
+            .where(model.next_show_at <= now)
+            .order_by(model.id)
+            .limit(batch_size)
+            .with_for_update(key_share=True, skip_locked=True)
+        ).scalars().all()
+        if ids:
+            connection.execute(update(model).where(model.id.in_(ids)).values(**_counter_values(model, show_column, now)))
+            count += len(ids)
+    return count
+
+
+def rebuild_show_counters(connection, now=None):
+    # Recompute the counters of every venue and artist, returns how many
+    now = now or datetime.now(timezone.utc)
+    count = 0
+    for model, show_column in _OWNERS:
+        count += connection.execute(update(model).values(**_counter_values(model, show_column, now))).rowcount
+    return count
+
+
+@event.listens_for(Session, "after_flush")
+def _refresh_after_flush(session, flush_context):
+    venue_ids = set()
+    artist_ids = set()
+    # Venues/artists deleted or restored: the counters of the other owners of
+    # their shows change
+    deleted_venue_ids = set()
+    deleted_artist_ids = set()
+
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, (Venue, Artist)):
+            if obj in session.dirty and inspect(obj).attrs.deleted_at.history.has_changes():
+                (deleted_venue_ids if isinstance(obj, Venue) else deleted_artist_ids).add(obj.id)
+            continue
+        if not isinstance(obj, Show):
+            continue
+        state = inspect(obj)
+        if obj in session.dirty and not any(state.attrs[field].history.has_changes() for field in _SHOW_FIELDS):
+            continue
+        for column, ids in ((Show.venue_id, venue_ids), (Show.artist_id, artist_ids)):
+            # Both the current and, if the show was moved, the previous owner
+            history = state.attrs[column.key].history
+            for entity_id in [getattr(obj, column.key)] + list(history.deleted or ()):
+                # Ids coming from forms may still be strings at this point
+                if entity_id is not None:
+                    ids.add(int(entity_id))
+
+    if deleted_venue_ids:
+        shows = select(Show.artist_id).where(Show.venue_id.in_(deleted_venue_ids)).distinct()
+        artist_ids.update(session.connection().execute(shows).scalars())
+    if deleted_artist_ids:
+        shows = select(Show.venue_id).where(Show.artist_id.in_(deleted_artist_ids)).distinct()
+        venue_ids.update(session.connection().execute(shows).scalars())
+
+    if venue_ids or artist_ids:
+        refresh_show_counters(session.connection(), venue_ids, artist_ids)
+
+
+@counters_cli.command("rollover", help="Refresh the counters of the venues and artists whose next show has started.")
+@click.option("--batch-size", default=1000, show_default=True, help="Rows refreshed per transaction.")
+def rollover_command(batch_size):
+    total = 0
+    while True:
+        # One short transaction per batch
+        with db.engine.begin() as connection:
+            count = roll_over_show_counters(connection, batch_size)
+        total += count
+        if not count:
+            break
+    click.echo(f"Refreshed the show counters of {total} venues and artists.")
+
+
+@counters_cli.command("rebuild", help="Recompute the show counters of every venue and artist.")
+def rebuild_command():
+    with db.engine.begin() as connection:
+        count = rebuild_show_counters(connection)
+    click.echo(f"Show counters recomputed for {count} venues and artists.")
@@ -2,3 +2,35 @@ window.parseISOString = function parseISOString(s) {
   var b = s.split(/\D+/);
   return new Date(Date.UTC(b[0], --b[1], b[2], b[3], b[4], b[5], b[6]));
 };
+
+// Autocomplete of the nav search boxes, from /api/v1/typeahead
+document.querySelectorAll('input[data-typeahead]').forEach(function (input) {
+  var kind = input.dataset.typeahead;
+  var list = document.getElementById(input.getAttribute('list'));
+  var timer = null;
+  var latest = '';
+
+  input.addEventListener('input', function () {
+    clearTimeout(timer);
+    timer = setTimeout(function () {
+      var prefix = input.value.trim();
+      latest = prefix;
+      if (!prefix) {
+        list.innerHTML = '';
+        return;
+      }
+      fetch('/api/v1/typeahead?type=' + kind + '&q=' + encodeURIComponent(prefix))
+        .then(function (response) { return response.json(); })
+        .then(function (body) {
+          // Ignore the answers to older keystrokes
+          if (prefix !== latest) return;
+          list.innerHTML = '';
+          body.data[kind].forEach(function (item) {
+            var option = document.createElement('option');
+            option.value = item.name;
+            list.appendChild(option);
+          });
+        });
+    }, 100);
+  });
+});
@@ -0,0 +1,68 @@
+import os
+import tempfile
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from jinja2 import FileSystemBytecodeCache
+
+# ----------------------------------------------------------------------------#
+# Template compilation.
+# ----------------------------------------------------------------------------#
+
+# Jinja compiles a template to Python code the first time a process renders
+# it, which makes the first requests of every worker slow. In production
+# (see config.py):
+#
+# - the compiled templates are cached on disk in TEMPLATE_BYTECODE_CACHE_DIR,
+#   shared by the workers and kept across restarts and deploys (a template
+#   whose source changed gets a new entry),
+# - all the templates are loaded at startup (PRECOMPILE_TEMPLATES), so no
+#   request pays for it, and "flask templates compile" fills the cache at
+#   build time,
+# - TEMPLATES_AUTO_RELOAD is off: the template files are not checked for
+#   changes on every render.
+
+templates_cli = AppGroup("templates", help="Compile the templates.")
+
+
+class SharedBytecodeCache(FileSystemBytecodeCache):
+    # Several workers write to the same directory: write to a temporary file
+    # and rename it, so that no worker reads a half-written file
+    def dump_bytecode(self, bucket):
+        descriptor, temporary = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        try:
+            with os.fdopen(descriptor, "wb") as cache_file:
+                bucket.write_bytecode(cache_file)
+            os.replace(temporary, self._get_cache_filename(bucket))
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+
+
+def precompile_templates(app):
+    # Load every template into the environment cache (and the bytecode cache)
+    env = app.jinja_env
+    names = env.list_templates(filter_func=lambda name: name.endswith(".html"))
+    for name in names:
+        env.get_template(name)
+    return names
+
+
+def init_templates(app):
+    # Call after the template filters are registered: compiling a template
+    # checks that its filters exist
+    directory = app.config.get("TEMPLATE_BYTECODE_CACHE_DIR")
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        app.jinja_env.bytecode_cache = SharedBytecodeCache(directory)
+    if app.config.get("PRECOMPILE_TEMPLATES"):
+        precompile_templates(app)
+
+
+@templates_cli.command("compile", help="Compile all the templates into the bytecode cache.")
+def compile_command():
+    if not current_app.config.get("TEMPLATE_BYTECODE_CACHE_DIR"):
+        raise click.ClickException("TEMPLATE_BYTECODE_CACHE_DIR is not set (FYYUR_ENV=production sets it).")
+    names = precompile_templates(current_app)
+    click.echo(f"Compiled {len(names)} templates into {current_app.config['TEMPLATE_BYTECODE_CACHE_DIR']}.")
@@ -0,0 +1,63 @@
+import base64
+import json
+from datetime import datetime, timezone
+import pytest
+import config
+from app import create_app
+from database import db
+from models import Artist, Show
+from pagination import decode_cursor, encode_cursor
+
+
+def _token(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+@pytest.fixture
+def client(tmp_path):
+    settings = {name: getattr(config, name) for name in dir(config) if name.isupper()}
+    settings.update(
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'fyyur.db'}",
+        SQLALCHEMY_REPLICA_URIS=[],
+        TESTING=True,
+    )
+    app = create_app(type("TestConfig", (), settings))
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([Artist(name=f"Artist {i}") for i in range(3)])
+        db.session.commit()
+    return app.test_client()
+
+
+def test_cursor_round_trip():
+    start_time = datetime(2026, 1, 1, 20, 30, tzinfo=timezone.utc)
+    token = encode_cursor([start_time, 7])
+    assert decode_cursor(token, [Show.start_time, Show.id]) == [start_time, 7]
+
+
+@pytest.mark.parametrize(
+    "values",
+    [
+        [{"a": 1}, 3],
+        ["Artist 1", "3"],
+        ["Artist 1", True],
+        [None, 3],
+        ["Artist 1"],
+    ],
+)
+def test_cursor_with_wrong_values_is_rejected(values):
+    with pytest.raises(ValueError):
+        decode_cursor(_token(values), [Artist.name, Artist.id])
+
+
+def test_cursor_with_bad_datetime_is_rejected():
+    with pytest.raises(ValueError):
+        decode_cursor(_token([12, 3]), [Show.start_time, Show.id])
+    with pytest.raises(ValueError):
+        decode_cursor(_token(["yesterday", 3]), [Show.start_time, Show.id])
+
+
+def test_tampered_cursor_falls_back_to_first_page(client):
+    response = client.get("/artists", query_string={"after": _token([{"a": 1}, 3])})
+    assert response.status_code == 200
+    assert b"Artist 0" in response.data
@@ -0,0 +1,195 @@
+import threading
+import time
+from datetime import timedelta
+from bisect import bisect_left, insort
+from sqlalchemy import event, func, inspect
+from sqlalchemy.orm import Session
+from database import db
+from models import Artist, Venue
+from search import tokenize
+
+# ----------------------------------------------------------------------------#
+# Typeahead index.
+# ----------------------------------------------------------------------------#
+
+# The autocomplete of the nav search boxes is served from memory: per kind
+# (venues, artists) two sorted arrays searched with bisect, one keyed by the
+# whole name and one by every later word of the name ("blue owl hall",
+# "owl hall", "hall"). Names starting with the prefix come first, then names
+# with a word starting with it, alphabetically, so a lookup is a bisect plus
+# at most a few dozen steps whatever the number of rows.
+#
+# Each process builds the index on first use. Commits in the process update
+# it right away (collected on flush, applied on commit like the search
+# index). Changes made by other processes are picked up at most
+# TYPEAHEAD_SYNC_SECONDS later, by reading the rows changed since the last
+# sync. Soft-deleted rows are removed from the index.
+
+_models = {"venues": Venue, "artists": Artist}
+SYNC_OVERLAP = timedelta(minutes=1)
+
+
+def _key(text):
+    return " ".join(tokenize(text))
+
+
+class PrefixIndex:
+    def __init__(self):
+        # Sorted (key, name, id) tuples
+        self.names = []
+        self.words = []
+        # id -> indexed name
+        self.entries = {}
+
+    @staticmethod
+    def _keys(name):
+        tokens = tokenize(name)
+        return " ".join(tokens), {" ".join(tokens[start:]) for start in range(1, len(tokens))}
+
+    def add(self, doc_id, name):
+        self.remove(doc_id)
+        key, word_keys = self._keys(name)
+        self.entries[doc_id] = name
+        insort(self.names, (key, name, doc_id))
+        for word_key in word_keys:
+            insort(self.words, (word_key, name, doc_id))
+
+    def remove(self, doc_id):
+        name = self.entries.pop(doc_id, None)
+        if name is None:
+            return
+        key, word_keys = self._keys(name)
+        for array, array_key in [(self.names, key)] + [(self.words, word_key) for word_key in word_keys]:
+            position = bisect_left(array, (array_key, name, doc_id))
+            if position < len(array) and array[position] == (array_key, name, doc_id):
+                del array[position]
+
+    def load(self, rows):
+        # Bulk build from (id, name) rows
+        self.entries = dict(rows)
+        names = []
+        words = []
+        for doc_id, name in self.entries.items():
+            key, word_keys = self._keys(name)
+            names.append((key, name, doc_id))
+            words.extend((word_key, name, doc_id) for word_key in word_keys)
+        self.names = sorted(names)
+        self.words = sorted(words)
+
+    def complete(self, prefix, limit):
+        prefix = _key(prefix)
+        if not prefix:
+            return []
+        found = {}
+        for array in (self.names, self.words):
+            position = bisect_left(array, (prefix,))
+            while len(found) < limit and position < len(array):
+                key, name, doc_id = array[position]
+                if not key.startswith(prefix):
+                    break
+                found.setdefault(doc_id, name)
+                position += 1
+        return [{"id": doc_id, "name": name} for doc_id, name in found.items()]
+
+
+class _Typeahead:
+    def __init__(self, model):
+        self.model = model
+        self.index = None
+        # Latest change already in the index, and when it was read
+        self.watermark = None
+        self.synced = 0.0
+        self.lock = threading.Lock()
+
+    def _changed_at(self):
+        return func.coalesce(self.model.updated_at, self.model.created_at)
+
+    def _build(self):
+        model = self.model
+        index = PrefixIndex()
+        index.load(db.session.query(model.id, model.name))
+        # Deleting a row changes it too, so the deleted rows count
+        self.watermark = (
+            db.session.query(func.max(self._changed_at())).execution_options(include_deleted=True).scalar()
+        )
+        self.synced = time.monotonic()
+        self.index = index
+
+    def _sync(self):
+        # Apply the rows changed by other processes since the last sync
+        model = self.model
+        # The deleted rows are read too, to remove them from the index
+        query = db.session.query(
+            model.id, model.name, model.deleted_at, self._changed_at().label("changed_at")
+        ).execution_options(include_deleted=True)
+        if self.watermark is not None:
+            # Rows are stamped with the start time of their transaction, so a
+            # slow one can commit rows older than the watermark
+            query = query.filter(self._changed_at() >= self.watermark - SYNC_OVERLAP)
+        for row in query:
+            if row.deleted_at is None:
+                self.index.add(row.id, row.name)
+            else:
+                self.index.remove(row.id)
+            if self.watermark is None or row.changed_at > self.watermark:
+                self.watermark = row.changed_at
+        self.synced = time.monotonic()
+
+    def complete(self, prefix, limit, sync_seconds):
+        with self.lock:
+            if self.index is None:
+                self._build()
+            elif time.monotonic() - self.synced > sync_seconds:
+                self._sync()
+            return self.index.complete(prefix, limit)
+
+    def apply(self, changes):
+        with self.lock:
+            if self.index is None:
+                return
+            for doc_id, name, deleted in changes:
+                if deleted:
+                    self.index.remove(doc_id)
+                else:
+                    self.index.add(doc_id, name)
+
+
+_typeaheads = {kind: _Typeahead(model) for kind, model in _models.items()}
+
+
+def complete(kind, prefix, limit=8, sync_seconds=5):
+    return _typeaheads[kind].complete(prefix, limit, sync_seconds)
+
+
+def reset():
+    # Drop the indexes, rebuilt on next use
+    for typeahead in _typeaheads.values():
+        with typeahead.lock:
+            typeahead.index = None
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session, flush_context):
+    changes = session.info.setdefault("typeahead_changes", [])
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        for kind, model in _models.items():
+            if not isinstance(obj, model):
+                continue
+            state = inspect(obj)
+            if obj in session.new or state.attrs.name.history.has_changes() or state.attrs.deleted_at.history.has_changes():
+                deleted = obj in session.deleted or obj.deleted_at is not None
+                changes.append((kind, obj.id, obj.name, deleted))
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_on_commit(session):
+    changes = session.info.pop("typeahead_changes", None)
+    if not changes:
+        return
+    for kind, typeahead in _typeaheads.items():
+        typeahead.apply([change[1:] for change in changes if change[0] == kind])
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session):
+    session.info.pop("typeahead_changes", None)
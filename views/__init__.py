@@ -0,0 +1,6 @@
+# ----------------------------------------------------------------------------#
+# HTML pages, one blueprint per section (registered by create_app in app.py).
+# ----------------------------------------------------------------------------#
+
+# The forms (WTForms) are imported by the views that use them, not when the
+# blueprints are registered: the CLI commands and the JSON API never load them.
@@ -0,0 +1,354 @@
+from datetime import datetime, timezone
+from flask import Blueprint, current_app, flash, jsonify, redirect, render_template, request, url_for
+from sqlalchemy.orm import joinedload
+from cache import request_key, view_cache
+from conditional import cached_last_modified, conditional_get
+from database import db
+from models import Artist, ArtistLink, Link, Show
+from pagination import page_args, paginate
+from queries import (
+    artist_shows_query,
+    stored_show_counts,
+    artist_listing_last_modified,
+    artist_page_last_modified,
+    SHOW_ORDER,
+)
+from resolvers import resolve_genres, resolve_link_type, link_type_name_for
+
+# ----------------------------------------------------------------------------#
+# Artists.
+# ----------------------------------------------------------------------------#
+
+artists = Blueprint("artists", __name__)
+
+
+# This function searches for any existing primary link within ArtistLink,
+# clears it out and set a new primary link. There can just be one primary link.
+
+def set_primary_link_for_artist(artist_id, link_id):
+    with db.session.begin():
+        # Clear existing primary link
+        db.session.query(ArtistLink).filter_by(artist_id=artist_id, is_primary=True).update({"is_primary": False})
+        # Set new primary link
+        db.session.query(ArtistLink).filter_by(artist_id=artist_id, link_id=link_id).update({"is_primary": True})
+        # Touch the artist so that its page's Last-Modified/ETag change
+        db.session.query(Artist).filter_by(id=artist_id).update({"updated_at": datetime.now(timezone.utc)})
+
+
+# Drops the cached pages that display an artist: its own page, the shows
+# listing and the pages of the venues it played at.
+
+def invalidate_artist_views(artist_id):
+    venue_ids = db.session.query(Show.venue_id).filter(Show.artist_id == artist_id).distinct()
+    view_cache.invalidate(
+        "shows",
+        f"artist:{artist_id}",
+        *[f"venue:{row.venue_id}" for row in venue_ids],
+    )
+
+
+@artists.route("/artists/<int:artist_id>/links/<int:link_id>/make-primary", methods=["POST"])
+def make_primary_link(artist_id, link_id):
+    set_primary_link_for_artist(artist_id, link_id)
+    view_cache.invalidate(f"artist:{artist_id}")
+    flash("Primary link updated")
+    return redirect(url_for("artists.show", artist_id=artist_id))
+
+
+@artists.route("/artists")
+@conditional_get(artist_listing_last_modified)
+def index():
+    # Keyset pagination over (name, id), backed by ix_artist_name
+    page = paginate(Artist.query, [Artist.name, Artist.id])
+    return render_template("pages/artists.html", artists=page.items, page=page)
+
+
+@artists.route("/artists/<int:artist_id>")
+@conditional_get(lambda artist_id: cached_last_modified(artist_view(artist_id)))
+def show(artist_id):
+    view = artist_view(artist_id)
+
+    # Return a 404 page if the artist doesn't exist
+    if not view:
+        return render_template("errors/404.html")
+
+    return render_template("pages/show_artist.html", **view)
+
+
+def artist_view(artist_id):
+    # Read-through cache, dropped whenever the artist or one of its shows is written
+    return view_cache.get_or_set(
+        [f"artist:{artist_id}"],
+        request_key(*page_args("upcoming_"), *page_args("past_")),
+        lambda: build_artist_view(artist_id),
+    )
+
+
+def build_artist_view(artist_id):
+    # Get the current time in a timezone-aware format (UTC)
+    current_datetime = datetime.now(timezone.utc)
+
+    # Validators of the page, read before its rows (see conditional.py)
+    last_modified = artist_page_last_modified(artist_id, current_datetime)
+
+    # shows the artist page with the given artist_id. The shows are not loaded here, see below.
+    artist = Artist.query.options(
+            joinedload(Artist.genres),
+            joinedload(Artist.artist_links).joinedload(ArtistLink.link)
+        ).filter_by(id=artist_id).first()
+
+    # Return None if the artist doesn't exist
+    if not artist:
+        return None
+
+    data = {
+        "id": artist.id,
+        "name": artist.name,
+        "genres": [ genre.genre_name for genre in artist.genres ],
+        "social_link": artist.artist_links[0].link.url if artist.artist_links else None,
+        "seeking_venue": artist.seeking_venue,
+        "seeking_description": artist.seeking_description,
+        "image_link": artist.image_link
+    }
+
+    # Upcoming and past shows are two separate bounded queries, each with
+    # its own "load more" cursor. Totals are stored on the artist row.
+    shows = artist_shows_query(artist_id)
+    per_page = current_app.config["DETAIL_SHOWS_PAGE_SIZE"]
+    upcoming_page = paginate(
+        shows.filter(Show.start_time > current_datetime),
+        SHOW_ORDER,
+        per_page=per_page,
+        cursor_prefix="upcoming_",
+    )
+    past_page = paginate(
+        shows.filter(Show.start_time <= current_datetime),
+        SHOW_ORDER,
+        per_page=per_page,
+        descending=True,
+        cursor_prefix="past_",
+    )
+    upcoming_shows_count, past_shows_count = stored_show_counts(artist, Show.artist_id, current_datetime)
+
+    # Build the dictionaries that the template expects
+    def show_details(show):
+        return {
+            "venue_id": show.venue_id,
+            "venue_name": show.venue_name,
+            "venue_image_link": show.venue_image_link,
+            # Passed as a datetime, the template filter formats it
+            "start_time": show.start_time
+        }
+
+    data["upcoming_shows"] = [show_details(show) for show in upcoming_page]
+    data["past_shows"] = [show_details(show) for show in past_page]
+    data["past_shows_count"] = past_shows_count
+    data["upcoming_shows_count"] = upcoming_shows_count
+
+    return {
+        "artist": data,
+        "upcoming_page": upcoming_page,
+        "past_page": past_page,
+        "last_modified": last_modified,
+    }
+
+
+#  ----------------------------------------------------------------
+#  Create Artist
+#  ----------------------------------------------------------------
+
+
+@artists.route("/artists/create", methods=["GET"])
+def create_form():
+    from forms import ArtistForm
+
+    form = ArtistForm()
+    return render_template("forms/new_artist.html", form=form)
+
+
+@artists.route("/artists/create", methods=["POST"])
+def create_submission():
+    from forms import ArtistForm
+
+    # called upon submitting the new artist listing form
+    form = ArtistForm()
+
+    if form.validate_on_submit():
+        try:
+            # Create new artist object
+            new_artist = Artist(
+                name=form.name.data,
+                image_link=form.image_link.data,
+                seeking_venue=form.seeking_venue.data,
+                seeking_description=form.seeking_description.data
+            )
+
+            # Handle the genres. All of them are resolved at once,
+            # creating the missing ones, and added to the artist.
+            new_artist.genres.extend(resolve_genres(form.genres.data))
+
+            # Handle social link
+            social_url = form.social_link.data
+            if social_url:
+                # Get or create the LinkType object for the platform of the URL
+                link_type = resolve_link_type(link_type_name_for(social_url))
+
+                # Create Link object
+                link_obj = Link(url=social_url, link_type=link_type)
+                db.session.add(link_obj)
+
+                # Create ArtistLink
+                artist_link = ArtistLink(artist=new_artist, link=link_obj)
+                db.session.add(artist_link)
+
+            # Add artist
+            db.session.add(new_artist)
+            db.session.commit()
+            invalidate_artist_views(new_artist.id)
+
+            # On successful db insert, flash success
+            flash("Artist " + request.form["name"] + " was successfully listed!")
+            return redirect(url_for('index'))
+        except Exception as e:
+            # On unsuccessful db insert, flash an error instead.
+            db.session.rollback()
+            flash('An error occurred. Artist ' + form.name.data + ' could not be created.')
+        finally:
+            # Close the connection
+            db.session.close()
+
+    # Re-render the form page if it's a GET request OR if validation fails
+    return render_template("forms/new_artist.html", form=form)
+
+
+#  ----------------------------------------------------------------
+#  Delete Artist
+#  ----------------------------------------------------------------
+
+
+@artists.route("/artists/<int:artist_id>/delete", methods=["DELETE"])
+def delete(artist_id):
+    try:
+        # Query artist by id
+        artist_to_delete = Artist.query.get(artist_id)
+
+        # Handle case where artist doesn't exist
+        if not artist_to_delete:
+            return jsonify({'success': False, 'message': 'Artist not found'}), 404
+
+        # Implement soft delete
+        artist_to_delete.deleted_at = datetime.now(timezone.utc)
+        # Comit the transaction
+        db.session.commit()
+        invalidate_artist_views(artist_id)
+        # On success, return a success response.
+        flash('Artist ' + artist_to_delete.name + ' was successfully deleted!')
+        return jsonify({'success': True, 'deleted_id': artist_id}), 200
+    except Exception as e:
+        # In case of error, rollback changes
+        db.session.rollback()
+        # Return an error response.
+        flash('An error occurred. Artist could not be deleted.')
+        return jsonify({'success': False, 'message': 'Server error'}), 500
+    finally:
+        # Close db session
+        db.session.close()
+
+
+#  ----------------------------------------------------------------
+#  Update Artist
+#  ----------------------------------------------------------------
+
+
+@artists.route("/artists/<int:artist_id>/edit", methods=["GET"])
+def edit(artist_id):
+    from forms import ArtistForm
+
+    # Get the artist to edit
+    artist_to_edit = Artist.query.options(
+            joinedload(Artist.genres),
+            joinedload(Artist.artist_links).joinedload(ArtistLink.link)
+        ).get(artist_id)
+
+    # Handle case where artist doesn't exist
+    if not artist_to_edit:
+        return render_template('errors/404.html')
+
+    # Instantiate artist form
+    form = ArtistForm()
+    # Populate form with values
+    form.name.data = artist_to_edit.name
+    form.genres.data = [ genre.genre_name for genre in artist_to_edit.genres ]
+    form.image_link.data = artist_to_edit.image_link
+    form.seeking_venue.data = artist_to_edit.seeking_venue
+    form.seeking_description.data = artist_to_edit.seeking_description
+
+    # Check if there are any links before trying to access them
+    if artist_to_edit.artist_links:
+        form.social_link.data = artist_to_edit.artist_links[0].link.url
+
+    return render_template("forms/edit_artist.html", form=form, artist=artist_to_edit)
+
+
+@artists.route("/artists/<int:artist_id>/edit", methods=["POST"])
+def edit_submission(artist_id):
+    from forms import ArtistForm
+
+    # Get artist to edit
+    artist_to_edit = Artist.query.get(artist_id)
+
+    # Instantiate artist form
+    form = ArtistForm()
+    # Validate artist form
+    if form.validate_on_submit():
+        try:
+            # Update the simple fields on the venue object
+            artist_to_edit.name = form.name.data
+            artist_to_edit.image_link = form.image_link.data
+            artist_to_edit.seeking_venue = form.seeking_venue.data
+            artist_to_edit.seeking_description = form.seeking_description.data
+            # Genres and links live in other tables, so touch updated_at
+            # explicitly for the page's Last-Modified/ETag to change
+            artist_to_edit.updated_at = datetime.now(timezone.utc)
+
+            # For many-to-many fields, a reliable way to update is to
+            # clear the existing list and re-populate it with the new selections
+            # from the form. This ensures removed items are handled correctly.
+            artist_to_edit.genres.clear()
+            # Handle genres (Many-to-Many relationship). All of them are
+            # resolved at once, creating the missing ones.
+            artist_to_edit.genres.extend(resolve_genres(form.genres.data))
+
+            # Clear venue_links list
+            artist_to_edit.artist_links.clear()
+            # Handle social link
+            social_url = form.social_link.data
+            if social_url:
+                # Get or create the LinkType object for the platform of the URL
+                link_type = resolve_link_type(link_type_name_for(social_url))
+
+                # Create Link object
+                link_obj = Link(url=social_url, link_type=link_type)
+                db.session.add(link_obj)
+
+                # Create ArtistLink
+                artist_link = ArtistLink(artist=artist_to_edit, link=link_obj)
+                db.session.add(artist_link)
+
+            # If the operations succeed, commit changes and show message.
+            db.session.commit()
+            invalidate_artist_views(artist_id)
+            flash('Artist ' + form.name.data + ' was successfully updated!')
+        except Exception as e:
+            # In case of error, rollback changes
+            db.session.rollback()
+            flash('An error occurred. Artist could not be updated.')
+        finally:
+            # Close the db session
+            db.session.close()
+
+        # On successful submission, redirect
+        return redirect(url_for("artists.show", artist_id=artist_id))
+
+    # If form.validate_on_submit() is False, re-render the page
+    return render_template("forms/edit_artist.html", form=form, artist=artist_to_edit)
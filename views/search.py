@@ -0,0 +1,71 @@
+from flask import Blueprint, current_app, render_template, request
+from models import Artist, Show, Venue
+from queries import search_results
+from replicas import replica_reads
+from search import search_artist_ids, search_venue_ids
+
+# ----------------------------------------------------------------------------#
+# Search forms of the venues and artists pages.
+# ----------------------------------------------------------------------------#
+
+search = Blueprint("search", __name__)
+
+
+@search.route("/venues/search", methods=["POST"])
+@replica_reads
+def venues():
+    # Partial, case-insensitive search on the venue name, genres and city.
+    # seach for Hop should return "The Musical Hop".
+    # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
+    search_terms = request.form.get("search_term", "")
+
+    # Ranked venue ids from the search index, one more than displayed to
+    # tell if there are more matches
+    limit = current_app.config["SEARCH_MAX_RESULTS"]
+    venue_ids = search_venue_ids(search_terms, limit + 1)
+
+    # Names and number of upcoming shows in a single query. The shows are
+    # counted by the database, none of them are loaded.
+    results = search_results(Venue, Show.venue_id, venue_ids[:limit])
+
+    response = {
+        "count": len(results),
+        "more": len(venue_ids) > limit,
+        "data": results,
+    }
+
+    return render_template(
+        "pages/search_venues.html",
+        results=response,
+        search_term=search_terms,
+    )
+
+
+@search.route("/artists/search", methods=["POST"])
+@replica_reads
+def artists():
+    # Search on artists with partial string search on the name and genres. It must be case-insensitive.
+    # Seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
+    # Search for "band" should return "The Wild Sax Band".
+    search_terms = request.form.get("search_term", "")
+
+    # Ranked artist ids from the search index, one more than displayed to
+    # tell if there are more matches
+    limit = current_app.config["SEARCH_MAX_RESULTS"]
+    artist_ids = search_artist_ids(search_terms, limit + 1)
+
+    # Names and number of upcoming shows in a single query. The shows are
+    # counted by the database, none of them are loaded.
+    results = search_results(Artist, Show.artist_id, artist_ids[:limit])
+
+    response = {
+        "count": len(results),
+        "more": len(artist_ids) > limit,
+        "data": results,
+    }
+
+    return render_template(
+        "pages/search_artists.html",
+        results=response,
+        search_term=search_terms,
+    )
@@ -0,0 +1,98 @@
+from datetime import datetime, timezone
+from flask import Blueprint, flash, redirect, render_template, request, url_for
+from cache import request_key, view_cache
+from conditional import cached_last_modified, conditional_get
+from database import db
+from models import Show
+from pagination import page_args, paginate
+from queries import upcoming_feed_query, show_listing_last_modified, FEED_ORDER
+
+# ----------------------------------------------------------------------------#
+# Shows.
+# ----------------------------------------------------------------------------#
+
+shows = Blueprint("shows", __name__)
+
+
+@shows.route("/shows")
+@conditional_get(lambda: cached_last_modified(shows_view()))
+def index():
+    return render_template("pages/shows.html", **shows_view())
+
+
+def shows_view():
+    # Read-through cache, dropped whenever a show, venue or artist is written
+    return view_cache.get_or_set(["shows"], request_key("per_page", *page_args()), build_shows_view)
+
+
+def build_shows_view():
+    now = datetime.now(timezone.utc)
+
+    # Validators of the page, read before its rows (see conditional.py)
+    last_modified = show_listing_last_modified(now)
+
+    # Query one page of the upcoming shows feed. Keyset pagination over
+    # (start_time, show_id) is served by ix_upcoming_show_start_time.
+    page = paginate(upcoming_feed_query(now), FEED_ORDER)
+
+    data = []
+
+    # Dict to use as model
+    for show in page:
+
+        shows_dict = {
+            "venue_id": show.venue_id,
+            "venue_name": show.venue_name,
+            "artist_id": show.artist_id,
+            "artist_name": show.artist_name,
+            "artist_image_link": show.artist_image_link,
+            "start_time": show.start_time,
+            "start_time_text": show.start_time_text
+        }
+
+        data.append(shows_dict)
+
+    return {"shows": data, "page": page, "last_modified": last_modified}
+
+
+@shows.route("/shows/create")
+def create_form():
+    from forms import ShowForm
+
+    # renders form. do not touch.
+    form = ShowForm()
+    return render_template("forms/new_show.html", form=form)
+
+
+@shows.route("/shows/create", methods=["POST"])
+def create_submission():
+    from forms import ShowForm
+
+    # Instatiate shows form
+    form = ShowForm()
+
+    # Validate form
+    if form.validate_on_submit():
+        try:
+            # Instantiate show to add
+            new_show = Show(
+                artist_id=form.artist_id.data,
+                venue_id=form.venue_id.data,
+                start_time=form.start_time.data
+            )
+            # Add show to db
+            db.session.add(new_show)
+            # If the operations succeed, commit changes and show message.
+            db.session.commit()
+            view_cache.invalidate("shows", f"venue:{new_show.venue_id}", f"artist:{new_show.artist_id}")
+            flash("Show was successfully listed!")
+            return redirect(url_for('index'))
+        except Exception as e:
+            # Rollback changes in case of failure. Show message and the error itself.
+            db.session.rollback()
+            flash("An error ocurred. The show could not be listed.")
+        finally:
+            db.session.close()
+
+    # Re-render the form page if it's a GET request OR if validation fails
+    return render_template("forms/new_show.html", form=form)
@@ -0,0 +1,438 @@
+from datetime import datetime, timezone
+from flask import Blueprint, current_app, flash, jsonify, redirect, render_template, request, url_for
+from sqlalchemy.orm import joinedload
+from cache import request_key, view_cache
+from conditional import cached_last_modified, conditional_get
+from database import db
+from models import Link, Location, PostalCode, Show, Venue, VenueLink
+from pagination import page_args, paginate
+from queries import (
+    venue_directory_query,
+    group_venues_by_area,
+    area_venue_counts,
+    venue_shows_query,
+    stored_show_counts,
+    venue_directory_last_modified,
+    venue_page_last_modified,
+    VENUE_DIRECTORY_ORDER,
+    SHOW_ORDER,
+)
+from resolvers import resolve_genres, resolve_link_type, link_type_name_for
+
+# ----------------------------------------------------------------------------#
+# Venues.
+# ----------------------------------------------------------------------------#
+
+venues = Blueprint("venues", __name__)
+
+
+# This function searches for any existing primary link within VenueLink,
+# clears it out and set a new primary link. There can just be one primary link.
+
+def set_primary_link_for_venue(venue_id, link_id):
+    with db.session.begin():
+        # Clear existing primary link
+        db.session.query(VenueLink).filter_by(venue_id=venue_id, is_primary=True).update({"is_primary": False})
+        # Set new primary link
+        db.session.query(VenueLink).filter_by(venue_id=venue_id, link_id=link_id).update({"is_primary": True})
+        # Touch the venue so that its page's Last-Modified/ETag change
+        db.session.query(Venue).filter_by(id=venue_id).update({"updated_at": datetime.now(timezone.utc)})
+
+
+# Drops the cached pages that display a venue. Besides its own page, a venue
+# is shown in the directory, in the shows listing and in the pages of the
+# artists that played there.
+
+def invalidate_venue_views(venue_id):
+    artist_ids = db.session.query(Show.artist_id).filter(Show.venue_id == venue_id).distinct()
+    view_cache.invalidate(
+        "venues",
+        "shows",
+        f"venue:{venue_id}",
+        *[f"artist:{row.artist_id}" for row in artist_ids],
+    )
+
+
+@venues.route("/venues/<int:venue_id>/links/<int:link_id>/make-primary", methods=["POST"])
+def make_primary_link(venue_id, link_id):
+    set_primary_link_for_venue(venue_id, link_id)
+    view_cache.invalidate(f"venue:{venue_id}")
+    flash("Primary link updated for venue")
+    return redirect(url_for("venues.show", venue_id=venue_id))
+
+
+@venues.route("/venues")
+@conditional_get(lambda: cached_last_modified(venue_directory_view()))
+def index():
+    return render_template("pages/venues.html", **venue_directory_view())
+
+
+def venue_directory_view():
+    # Optional area filter, e.g. /venues?city=San Francisco&state=CA
+    city = request.args.get("city")
+    state = request.args.get("state")
+
+    def build_view():
+        # Read before the rows, so that a write in between gives a newer
+        # version on the next build rather than an older one
+        last_modified = venue_directory_last_modified()
+
+        # A single joined query returns the venues already ordered by
+        # state, city and name, so no ORM objects or lazy loads are needed
+        page = paginate(venue_directory_query(city=city, state=state), VENUE_DIRECTORY_ORDER)
+
+        # Group consecutive rows by city/state, with the number of venues
+        # of each of these areas
+        venue_counts = area_venue_counts({row.postal_code_id for row in page.items})
+        areas = list(group_venues_by_area(page.items, venue_counts))
+
+        return {"areas": areas, "page": page, "city": city, "state": state, "last_modified": last_modified}
+
+    # Read-through cache, dropped whenever a venue is written
+    return view_cache.get_or_set(["venues"], request_key("city", "state", "per_page", *page_args()), build_view)
+
+
+@venues.route("/venues/<int:venue_id>")
+@conditional_get(lambda venue_id: cached_last_modified(venue_view(venue_id)))
+def show(venue_id):
+    view = venue_view(venue_id)
+
+    # Handle case where venue doesn't exist
+    if not view:
+        return render_template("errors/404.html")
+
+    return render_template("pages/show_venue.html", **view)
+
+
+def venue_view(venue_id):
+    # Read-through cache, dropped whenever the venue or one of its shows is written
+    return view_cache.get_or_set(
+        [f"venue:{venue_id}"],
+        request_key(*page_args("upcoming_"), *page_args("past_")),
+        lambda: build_venue_view(venue_id),
+    )
+
+
+def build_venue_view(venue_id):
+    # Get current datetime in UTC format (timezone aware)
+    current_datetime = datetime.now(timezone.utc)
+
+    # Validators of the page, read before its rows (see conditional.py)
+    last_modified = venue_page_last_modified(venue_id, current_datetime)
+
+    # Get venue. The shows are not loaded here, see below.
+    venue = Venue.query.options(
+            joinedload(Venue.location).joinedload(Location.postal_code),
+            joinedload(Venue.genres),
+            joinedload(Venue.venue_links).joinedload(VenueLink.link)
+        ).filter_by(id=venue_id).first()
+
+    # Handle case where venue doesn't exist
+    if not venue:
+        return None
+
+    # Upcoming and past shows are two separate bounded queries, each with
+    # its own "load more" cursor. Totals are stored on the venue row.
+    shows = venue_shows_query(venue_id)
+    per_page = current_app.config["DETAIL_SHOWS_PAGE_SIZE"]
+    upcoming_page = paginate(
+        shows.filter(Show.start_time > current_datetime),
+        SHOW_ORDER,
+        per_page=per_page,
+        cursor_prefix="upcoming_",
+    )
+    past_page = paginate(
+        shows.filter(Show.start_time <= current_datetime),
+        SHOW_ORDER,
+        per_page=per_page,
+        descending=True,
+        cursor_prefix="past_",
+    )
+    upcoming_shows_count, past_shows_count = stored_show_counts(venue, Show.venue_id, current_datetime)
+
+    # Build dictionary expected as response
+    data = {
+        "id": venue.id,
+        "name": venue.name,
+        "genres": [ genre.genre_name for genre in venue.genres ],
+        "address": venue.location.address,
+        "city": venue.location.postal_code.city,
+        "state": venue.location.postal_code.state,
+        "phone": venue.phone,
+        "social_link": "",
+        "seeking_talent": venue.seeking_talent,
+        "seeking_description": venue.seeking_description,
+        "image_link": venue.image_link,
+        "past_shows": [],
+        "upcoming_shows": [],
+        "past_shows_count": past_shows_count,
+        "upcoming_shows_count": upcoming_shows_count,
+    }
+
+    # Check for links
+    if venue.venue_links:
+        data["social_link"] = venue.venue_links[0].link.url
+
+    for section, page in (("upcoming_shows", upcoming_page), ("past_shows", past_page)):
+        for show in page:
+            # Define expected dictionary to add to lists
+            # past_shows or upcoming_shows
+            data[section].append({
+                "artist_id": show.artist_id,
+                "artist_name": show.artist_name,
+                "artist_image_link": show.artist_image_link,
+                "start_time": show.start_time
+            })
+
+    return {
+        "venue": data,
+        "upcoming_page": upcoming_page,
+        "past_page": past_page,
+        "last_modified": last_modified,
+    }
+
+
+#  ----------------------------------------------------------------
+#  Create Venue
+#  ----------------------------------------------------------------
+
+
+@venues.route("/venues/create", methods=["GET"])
+def create_form():
+    from forms import VenueForm
+
+    form = VenueForm()
+    return render_template("forms/new_venue.html", form=form)
+
+
+@venues.route("/venues/create", methods=["POST"])
+def create_submission():
+    from forms import VenueForm
+
+    # Instantiate VenueForm from forms.py
+    form = VenueForm()
+
+    # Use the validate_on_submit() method to check if it's a POST
+    # request and if the data is valid according to the form's rules
+    if form.validate_on_submit():
+        try:
+            # Check if postal code exists filtering by city and state
+            # I use .first() to get the first result or to get None if no match is found
+            postal_code = PostalCode.query.filter_by(city=form.city.data, state=form.state.data).first()
+
+            # If postal code doesn't exist, create the record
+            if not postal_code:
+                postal_code = PostalCode(city=form.city.data, state=form.state.data)
+                db.session.add(postal_code)
+
+            # Check if location exists filtering by postal code id and the address from the form
+            location = Location.query.filter_by(postal_code_id=postal_code.id, address=form.address.data).first()
+            # If location doesn't exist, create the record
+            if not location:
+                location = Location(address=form.address.data, postal_code_id=postal_code.id)
+                db.session.add(location)
+
+            # Instatiate venue
+            new_venue = Venue(
+                name=form.name.data,
+                phone=form.phone.data,
+                image_link=form.image_link.data,
+                seeking_talent=form.seeking_talent.data,
+                seeking_description=form.seeking_description.data,
+                location=location
+            )
+
+            # Handle genres (Many-to-Many relationship). All of them are
+            # resolved at once, creating the missing ones.
+            # Create the GenreVenue links by adding the genres to the Venue
+            new_venue.genres.extend(resolve_genres(form.genres.data))
+
+            # Handle social link
+            social_url = form.social_link.data
+            if social_url:
+                # Get or create the LinkType object for the platform of the URL
+                link_type = resolve_link_type(link_type_name_for(social_url))
+
+                # Create Link object
+                link_obj = Link(url=social_url, link_type=link_type)
+                db.session.add(link_obj)
+
+                # Create VenueLink
+                venue_link = VenueLink(venue=new_venue, link=link_obj)
+                db.session.add(venue_link)
+
+            # Add venue
+            db.session.add(new_venue)
+            # If the operations succeed, commit changes and show message.
+            db.session.commit()
+            invalidate_venue_views(new_venue.id)
+            flash("Venue " + request.form["name"] + " was successfully listed!")
+            # On success, redirect to the homepage
+            return redirect(url_for('index'))
+
+        except Exception as e:
+            # Rollback changes in case of failure. Show message and the error itself.
+            db.session.rollback()
+            flash("An error ocurred. Venue " + form.name.data + " could not be listed.")
+            print(e)
+        finally:
+            # Regardless of the result, close the db connection.
+            db.session.close()
+
+    return render_template("forms/new_venue.html", form=form)
+
+
+#  ----------------------------------------------------------------
+#  Delete Venue
+#  ----------------------------------------------------------------
+
+
+@venues.route("/venues/<int:venue_id>/delete", methods=["DELETE"])
+def delete(venue_id):
+    try:
+        # Query venue by id
+        venue_to_delete = Venue.query.get(venue_id)
+
+        # Handle case where venue doesn't exist
+        if not venue_to_delete:
+            return jsonify({'success': False, 'message': 'Venue not found'}), 404
+
+        # Implement soft delete
+        venue_to_delete.deleted_at = datetime.now(timezone.utc)
+        # Comit the transaction
+        db.session.commit()
+        invalidate_venue_views(venue_id)
+        # On success, return a success response.
+        flash('Venue ' + venue_to_delete.name + ' was successfully deleted!')
+        return jsonify({'success': True, 'deleted_id': venue_id}), 200
+    except Exception as e:
+        # In case of error, rollback changes
+        db.session.rollback()
+        # Return an error response.
+        flash('An error occurred. Venue could not be deleted.')
+        return jsonify({'success': False, 'message': 'Server error'}), 500
+    finally:
+        # Close db session
+        db.session.close()
+
+
+#  ----------------------------------------------------------------
+#  Update Venue
+#  ----------------------------------------------------------------
+
+
+@venues.route("/venues/<int:venue_id>/edit", methods=["GET"])
+def edit(venue_id):
+    from forms import VenueForm
+
+    # Get the venue to edit
+    venue_to_edit = Venue.query.options(
+            joinedload(Venue.location).joinedload(Location.postal_code),
+            joinedload(Venue.genres),
+            joinedload(Venue.venue_links).joinedload(VenueLink.link)
+        ).filter_by(id=venue_id).first()
+
+    # Handle case where venue doesn't exist
+    if not venue_to_edit:
+        return render_template('errors/404.html')
+
+    # Instatiate venue form
+    form = VenueForm()
+    # Populate form with values
+    form.name.data = venue_to_edit.name
+    form.city.data = venue_to_edit.location.postal_code.city
+    form.state.data = venue_to_edit.location.postal_code.state
+    form.address.data = venue_to_edit.location.address
+    form.phone.data = venue_to_edit.phone
+    form.image_link.data = venue_to_edit.image_link
+    form.genres.data = [ genre.genre_name for genre in venue_to_edit.genres ]
+    form.seeking_talent.data = venue_to_edit.seeking_talent
+    form.seeking_description.data = venue_to_edit.seeking_description
+
+    # Check if there are any links before trying to access them
+    if venue_to_edit.venue_links:
+        form.social_link.data = venue_to_edit.venue_links[0].link.url
+
+    return render_template("forms/edit_venue.html", form=form, venue=venue_to_edit)
+
+
+@venues.route("/venues/<int:venue_id>/edit", methods=["POST"])
+def edit_submission(venue_id):
+    from forms import VenueForm
+
+    venue_to_edit = Venue.query.get(venue_id)
+
+    form = VenueForm()
+
+    if form.validate_on_submit():
+        try:
+            # Update the simple fields on the venue object
+            venue_to_edit.name = form.name.data
+            venue_to_edit.phone = form.phone.data
+            venue_to_edit.image_link = form.image_link.data
+            venue_to_edit.seeking_talent = form.seeking_talent.data
+            venue_to_edit.seeking_description = form.seeking_description.data
+            # Genres and links live in other tables, so touch updated_at
+            # explicitly for the page's Last-Modified/ETag to change
+            venue_to_edit.updated_at = datetime.now(timezone.utc)
+
+            # Check if postal code exists filtering by city and state
+            # I use .first() to get the first result or to get None if no match is found
+            postal_code = PostalCode.query.filter_by(city=form.city.data, state=form.state.data).first()
+
+            # If postal code doesn't exist, create the record
+            if not postal_code:
+                postal_code = PostalCode(city=form.city.data, state=form.state.data)
+                db.session.add(postal_code)
+
+            # Check if location exists filtering by postal code id and the address from the form
+            location = Location.query.filter_by(postal_code_id=postal_code.id, address=form.address.data).first()
+            # If location doesn't exist, create the record
+            if not location:
+                location = Location(address=form.address.data, postal_code_id=postal_code.id)
+                db.session.add(location)
+            # Add location to Venue
+            venue_to_edit.location = location
+
+            # For many-to-many fields, a reliable way to update is to
+            # clear the existing list and re-populate it with the new selections
+            # from the form. This ensures removed items are handled correctly.
+            venue_to_edit.genres.clear()
+            # Handle genres (Many-to-Many relationship). All of them are
+            # resolved at once, creating the missing ones.
+            venue_to_edit.genres.extend(resolve_genres(form.genres.data))
+
+            # Clear venue_links list
+            venue_to_edit.venue_links.clear()
+            # Handle social link
+            social_url = form.social_link.data
+            if social_url:
+                # Get or create the LinkType object for the platform of the URL
+                link_type = resolve_link_type(link_type_name_for(social_url))
+
+                # Create Link object
+                link_obj = Link(url=social_url, link_type=link_type)
+                db.session.add(link_obj)
+
+                # Create VenueLink
+                venue_link = VenueLink(venue=venue_to_edit, link=link_obj)
+                db.session.add(venue_link)
+
+            # If the operations succeed, commit changes and show message.
+            db.session.commit()
+            invalidate_venue_views(venue_id)
+            flash('Venue ' + form.name.data + ' was successfully updated!')
+        except Exception as e:
+            # In case of error, rollback changes
+            db.session.rollback()
+            flash('An error occurred. Venue could not be updated.')
+            flash(str(e))
+        finally:
+            # Close the db session
+            db.session.close()
+
+        # On successful submission, redirect
+        return redirect(url_for("venues.show", venue_id=venue_id))
+
+    # If form.validate_on_submit() is False, re-render the page
+    return render_template("forms/edit_venue.html", form=form, venue=venue_to_edit)
@@ -0,0 +1,71 @@
+import gc
+import os
+
+# ----------------------------------------------------------------------------#
+# Production entry point.
+# ----------------------------------------------------------------------------#
+
+# gunicorn loads "wsgi:application" (see gunicorn.conf.py), any other WSGI
+# server can too. The production profile of config.py is the default here.
+#
+# The app is loaded once in the master process before the workers are forked
+# (preload): the modules, the compiled templates and the Babel locale data
+# are then shared copy-on-write by the workers instead of being loaded by
+# each of them. The database connections must not be shared, so the pools
+# are reset in every forked child.
+
+os.environ.setdefault("FYYUR_ENV", "production")
+
+
+def _reset_pools_after_fork(app):
+    # The child keeps the parent's pooled connections as objects, but must
+    # never use or close the parent's sockets: drop them without closing
+    from database import db
+
+    with app.app_context():
+        db.engine.dispose(close=False)
+    for engine in app.extensions.get("fyyur_replicas", ()):
+        engine.dispose(close=False)
+
+
+def preload(app):
+    # Load what the first requests of every worker would otherwise load (the
+    # production profile already compiled the templates in create_app): the
+    # forms and Babel are imported lazily, see views/ and formatting.py
+    from datetime import datetime, timezone
+    import forms  # noqa: F401
+    from formatting import format_datetime
+
+    format_datetime(datetime.now(timezone.utc), "full")
+    format_datetime(datetime.now(timezone.utc))
+
+
+def load():
+    from app import create_app
+
+    app = create_app()
+    preload(app)
+    # Covers gunicorn, uWSGI and any server that forks after loading the app
+    os.register_at_fork(after_in_child=lambda: _reset_pools_after_fork(app))
+    # Keep the garbage collector from touching (and so copying) the preloaded
+    # objects in the workers
+    gc.freeze()
+    return app
+
+
+def private_memory_mb():
+    # Memory of this process not shared with the master (the preloaded pages
+    # count in its RSS too), for recycling the workers that grow
+    try:
+        with open("/proc/self/smaps_rollup") as smaps:
+            return sum(
+                int(line.split()[1]) for line in smaps if line.startswith(("Private_Clean:", "Private_Dirty:"))
+            ) / 1024
+    except OSError:
+        # No /proc (macOS): peak RSS, in bytes there
+        import resource
+
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024)
+
+
+application = load()